@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment, AppointmentService, AppointmentReview, WorkingHours, Holiday
+from .models import Appointment, AppointmentService, AppointmentReview, WorkingHours, Holiday, AppointmentDailyRollup, OccupancyHeatmap, AppointmentReminder
 from core.admin import admin_site  # Importa o site admin customizado
 
 
@@ -82,8 +82,59 @@ class HolidayAdmin(admin.ModelAdmin):
     ordering = ('data',)
 
 
+class AppointmentDailyRollupAdmin(admin.ModelAdmin):
+    """
+    Admin para métricas diárias de agendamentos (somente leitura)
+    """
+    list_display = ('data', 'dimensao', 'rotulo', 'agendamentos', 'concluidos', 'cancelamentos', 'receita', 'ticket_medio')
+    list_filter = ('dimensao', 'data')
+    search_fields = ('rotulo',)
+    ordering = ('-data', 'dimensao', 'rotulo')
+    date_hierarchy = 'data'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class AppointmentReminderAdmin(admin.ModelAdmin):
+    """
+    Admin para lembretes enviados (somente leitura)
+    """
+    list_display = ('agendamento', 'antecedencia_minutos', 'agendado_para', 'enviado_em')
+    list_filter = ('antecedencia_minutos', 'enviado_em')
+    date_hierarchy = 'enviado_em'
+    raw_id_fields = ('agendamento',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class OccupancyHeatmapAdmin(admin.ModelAdmin):
+    """
+    Admin para mapas de ocupação por trimestre (somente leitura)
+    """
+    list_display = ('ano', 'trimestre', 'intervalo_minutos', 'total_agendamentos', 'total_cancelamentos', 'gerado_em')
+    list_filter = ('ano',)
+    exclude = ('demanda', 'cancelamentos', 'utilizacao')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Registra no site admin customizado
 admin_site.register(Appointment, AppointmentAdmin)
 admin_site.register(AppointmentReview, AppointmentReviewAdmin)  
 admin_site.register(WorkingHours, WorkingHoursAdmin)
 admin_site.register(Holiday, HolidayAdmin)
+admin_site.register(AppointmentDailyRollup, AppointmentDailyRollupAdmin)
+admin_site.register(OccupancyHeatmap, OccupancyHeatmapAdmin)
+admin_site.register(AppointmentReminder, AppointmentReminderAdmin)
@@ -0,0 +1,258 @@
+"""
+Análises temporais de receita e ocupação
+
+Carrega em uma única consulta colunas compactas (data, receita, duração,
+status) dos agendamentos do período, incluindo o mesmo período do ano
+anterior, e deriva com NumPy as séries do painel: médias móveis, variação
+entre períodos, comparação ano a ano, sazonalidade e percentis de ticket.
+Os resultados ficam em cache por (período, granularidade) até a próxima
+alteração de agendamentos.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Appointment, WorkingHours, Holiday
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+
+# Janela da média móvel em períodos de cada granularidade
+JANELA_MEDIA_MOVEL = {'dia': 7, 'semana': 4, 'mes': 3}
+
+PERCENTIS_TICKET = (10, 25, 50, 75, 90)
+
+# Códigos numéricos de situação usados nos arrays
+CODIGOS_SITUACAO = {codigo: i for i, (codigo, _) in enumerate(Appointment.STATUS_CHOICES)}
+CODIGO_CANCELADO = CODIGOS_SITUACAO['cancelled']
+
+CACHE_VERSAO_KEY = 'appointments:analitico:versao'
+CACHE_TIMEOUT = 60 * 60
+
+
+def invalidar_analitico():
+    """Invalida as análises em cache (chamado quando agendamentos mudam)"""
+    try:
+        cache.incr(CACHE_VERSAO_KEY)
+    except ValueError:
+        cache.set(CACHE_VERSAO_KEY, 1, None)
+
+
+def _versao_atual():
+    versao = cache.get(CACHE_VERSAO_KEY)
+    if versao is None:
+        cache.add(CACHE_VERSAO_KEY, 1, None)
+        versao = cache.get(CACHE_VERSAO_KEY, 1)
+    return versao
+
+
+def calcular_analitico(inicio, fim, granularidade='dia'):
+    """
+    Séries analíticas de receita e ocupação do intervalo (inclusive).
+
+    O resultado fica em cache até a próxima alteração de agendamentos.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f'Granularidade inválida: {granularidade}')
+    chave = f'appointments:analitico:{_versao_atual()}:{inicio.isoformat()}:{fim.isoformat()}:{granularidade}'
+
+    analitico = cache.get(chave)
+    if analitico is None:
+        analitico = _calcular_analitico(inicio, fim, granularidade)
+        cache.set(chave, analitico, CACHE_TIMEOUT)
+    return analitico
+
+
+def carregar_colunas(inicio, fim):
+    """
+    Colunas (dia relativo a 'inicio', receita, duração em minutos, código da situação)
+    dos agendamentos do intervalo, lidas com um único values_list.
+    """
+    linhas = list(
+        Appointment.objects.filter(data_agendamento__range=(inicio, fim))
+        .annotate(duracao=Sum('appointment_services__servico__duracao_minutos'))
+        .values_list('data_agendamento', 'preco_total', 'duracao', 'situacao')
+        .order_by()
+    )
+    total = len(linhas)
+    dias = np.fromiter(((linha[0] - inicio).days for linha in linhas), dtype=np.int64, count=total)
+    receita = np.fromiter((float(linha[1]) for linha in linhas), dtype=np.float64, count=total)
+    duracao = np.fromiter((linha[2] or 0 for linha in linhas), dtype=np.float64, count=total)
+    situacao = np.fromiter((CODIGOS_SITUACAO.get(linha[3], -1) for linha in linhas), dtype=np.int8, count=total)
+    return dias, receita, duracao, situacao
+
+
+def _minutos_abertos(inicio, total_dias):
+    """Minutos de funcionamento de cada dia do intervalo (feriados fechados)"""
+    por_dia_semana = np.zeros(7, dtype=np.float64)
+    for horario in WorkingHours.objects.filter(aberto=True):
+        minutos = (horario.horario_fim.hour * 60 + horario.horario_fim.minute) - (
+            horario.horario_inicio.hour * 60 + horario.horario_inicio.minute
+        )
+        por_dia_semana[horario.dia_semana] = max(minutos, 0)
+
+    dias_semana = (np.arange(total_dias) + inicio.weekday()) % 7
+    minutos = por_dia_semana[dias_semana]
+
+    for feriado in feriados_no_periodo(inicio, inicio + timedelta(days=total_dias - 1)):
+        minutos[(feriado - inicio).days] = 0
+    return minutos
+
+
+def feriados_no_periodo(inicio, fim):
+    """Datas de feriado do intervalo, com os recorrentes repetidos em cada ano"""
+    feriados = set(Holiday.objects.filter(recorrente=False, data__range=(inicio, fim)).values_list('data', flat=True))
+    for feriado in Holiday.objects.filter(recorrente=True).values_list('data', flat=True):
+        for ano in range(inicio.year, fim.year + 1):
+            try:
+                dia = feriado.replace(year=ano)
+            except ValueError:
+                continue
+            if inicio <= dia <= fim:
+                feriados.add(dia)
+    return feriados
+
+
+def _rotulos_periodos(inicio, total_dias, granularidade):
+    """Índice do período de cada dia e a data inicial de cada período"""
+    datas = [inicio + timedelta(days=i) for i in range(total_dias)]
+    if granularidade == 'dia':
+        return np.arange(total_dias), datas
+    if granularidade == 'semana':
+        chaves = [d - timedelta(days=d.weekday()) for d in datas]
+    else:
+        chaves = [d.replace(day=1) for d in datas]
+    rotulos = sorted(set(chaves))
+    posicao = {rotulo: i for i, rotulo in enumerate(rotulos)}
+    return np.array([posicao[chave] for chave in chaves], dtype=np.int64), rotulos
+
+
+def _media_movel(valores, janela):
+    """Média móvel simples; os primeiros períodos usam a janela disponível"""
+    acumulado = np.cumsum(np.insert(valores, 0, 0.0))
+    fim = np.arange(1, len(valores) + 1)
+    comeco = np.maximum(fim - janela, 0)
+    return (acumulado[fim] - acumulado[comeco]) / (fim - comeco)
+
+
+def _variacao_percentual(atual, anterior):
+    """Variação percentual elemento a elemento (None quando a base é zero)"""
+    com_base = anterior != 0
+    variacao = np.divide(atual - anterior, anterior, out=np.zeros_like(atual), where=com_base) * 100
+    return [round(float(v), 1) if ok else None for v, ok in zip(variacao, com_base)]
+
+
+def _lista(valores, casas=2):
+    return np.round(valores, casas).tolist()
+
+
+def _calcular_analitico(inicio, fim, granularidade):
+    total_dias = (fim - inicio).days + 1
+    inicio_anterior = inicio - timedelta(days=364)  # mesmo dia da semana do ano anterior
+
+    # Uma consulta cobre o período e o mesmo intervalo do ano anterior
+    dias, receita, duracao, situacao = carregar_colunas(inicio_anterior, fim)
+    deslocamento = (inicio - inicio_anterior).days
+    valido = situacao != CODIGO_CANCELADO
+
+    no_periodo = dias >= deslocamento
+    indice = dias[no_periodo] - deslocamento
+    validos_periodo = valido[no_periodo]
+    indice_valido = indice[validos_periodo]
+
+    # Receita diária de todo o intervalo carregado; o ano e a semana anteriores são fatias dela
+    receita_carregada = np.bincount(dias[valido], weights=receita[valido], minlength=deslocamento + total_dias)
+    receita_dia = receita_carregada[deslocamento:]
+    receita_ano_anterior_dia = receita_carregada[:total_dias]
+    receita_semana_anterior_dia = receita_carregada[deslocamento - 7:deslocamento - 7 + total_dias]
+
+    agendamentos_dia = np.bincount(indice_valido, minlength=total_dias).astype(np.float64)
+    cancelamentos_dia = np.bincount(indice[~validos_periodo], minlength=total_dias).astype(np.float64)
+    minutos_dia = np.bincount(indice_valido, weights=duracao[no_periodo][validos_periodo], minlength=total_dias)
+
+    minutos_abertos_dia = _minutos_abertos(inicio, total_dias)
+
+    # Agrupa os dias em períodos da granularidade pedida
+    periodo_do_dia, rotulos = _rotulos_periodos(inicio, total_dias, granularidade)
+    total_periodos = len(rotulos)
+
+    def por_periodo(valores):
+        return np.bincount(periodo_do_dia, weights=valores, minlength=total_periodos)
+
+    receita_periodo = por_periodo(receita_dia)
+    agendamentos_periodo = por_periodo(agendamentos_dia)
+    minutos_periodo = por_periodo(minutos_dia)
+    abertos_periodo = por_periodo(minutos_abertos_dia)
+    receita_anterior_periodo = por_periodo(receita_ano_anterior_dia)
+    receita_semana_anterior_periodo = por_periodo(receita_semana_anterior_dia)
+
+    ocupacao = np.divide(minutos_periodo, abertos_periodo, out=np.zeros(total_periodos), where=abertos_periodo > 0) * 100
+    ticket_periodo = np.divide(
+        receita_periodo, agendamentos_periodo, out=np.zeros(total_periodos), where=agendamentos_periodo > 0
+    )
+    variacao_periodo = [None] + _variacao_percentual(receita_periodo[1:], receita_periodo[:-1])
+
+    # Sazonalidade: médias por dia da semana e por mês
+    dias_semana = (np.arange(total_dias) + inicio.weekday()) % 7
+    ocorrencias_semana = np.bincount(dias_semana, minlength=7)
+    receita_semana = np.bincount(dias_semana, weights=receita_dia, minlength=7)
+    datas = [inicio + timedelta(days=i) for i in range(total_dias)]
+    meses = np.fromiter((d.month - 1 for d in datas), dtype=np.int64, count=total_dias)
+    ocorrencias_mes = np.bincount(meses, minlength=12)
+    receita_mes = np.bincount(meses, weights=receita_dia, minlength=12)
+
+    tickets = receita[no_periodo][validos_periodo]
+    percentis = np.percentile(tickets, PERCENTIS_TICKET) if tickets.size else np.zeros(len(PERCENTIS_TICKET))
+
+    receita_total = float(receita_periodo.sum())
+    receita_anterior_total = float(receita_anterior_periodo.sum())
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'resumo': {
+            'receita': round(receita_total, 2),
+            'receita_ano_anterior': round(receita_anterior_total, 2),
+            'variacao_ano_anterior': _variacao_percentual(
+                np.array([receita_total]), np.array([receita_anterior_total])
+            )[0],
+            'agendamentos': int(agendamentos_dia.sum()),
+            'cancelamentos': int(cancelamentos_dia.sum()),
+            'ocupacao': round(float(
+                minutos_dia.sum() / minutos_abertos_dia.sum() * 100 if minutos_abertos_dia.sum() else 0
+            ), 1),
+            'ticket_percentis': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTIS_TICKET, percentis)},
+        },
+        'series': {
+            'periodos': [rotulo.isoformat() for rotulo in rotulos],
+            'receita': _lista(receita_periodo),
+            'receita_media_movel': _lista(_media_movel(receita_periodo, JANELA_MEDIA_MOVEL[granularidade])),
+            'receita_ano_anterior': _lista(receita_anterior_periodo),
+            'variacao_ano_anterior': _variacao_percentual(receita_periodo, receita_anterior_periodo),
+            'variacao_periodo_anterior': variacao_periodo,
+            'variacao_semana_anterior': _variacao_percentual(receita_periodo, receita_semana_anterior_periodo),
+            'agendamentos': agendamentos_periodo.astype(int).tolist(),
+            'ticket_medio': _lista(ticket_periodo),
+            'ocupacao': _lista(ocupacao, 1),
+        },
+        'sazonalidade': {
+            'dia_semana': [
+                {'dia': nome, 'receita_media': round(float(receita_semana[i] / ocorrencias_semana[i]), 2) if ocorrencias_semana[i] else 0}
+                for i, (_, nome) in enumerate(WorkingHours.WEEKDAY_CHOICES)
+            ],
+            'mes': [
+                {'mes': i + 1, 'receita_media_diaria': round(float(receita_mes[i] / ocorrencias_mes[i]), 2)}
+                for i in range(12) if ocorrencias_mes[i]
+            ],
+        },
+    }
+
+
+def periodo_padrao(granularidade='dia'):
+    """Intervalo padrão do painel para cada granularidade"""
+    hoje = timezone.localdate()
+    dias = {'dia': 90, 'semana': 182, 'mes': 365}[granularidade]
+    return hoje - timedelta(days=dias - 1), hoje
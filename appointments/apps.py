@@ -5,3 +5,7 @@ class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appointments'
     verbose_name = 'Sistema de Agendamentos'
+    
+    def ready(self):
+        # Registra a manutenção incremental das métricas diárias
+        from . import signals  # noqa: F401
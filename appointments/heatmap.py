@@ -0,0 +1,150 @@
+"""
+Mapa de ocupação por dia da semana e faixa de horário
+
+Monta, a partir de uma única consulta ao histórico de agendamentos do
+trimestre, as matrizes dia da semana x faixa de horário de demanda
+(agendamentos espalhados por todas as faixas que a duração dos serviços
+cobre), de cancelamentos e de utilização da capacidade aberta. O resultado é
+gravado em OccupancyHeatmap, uma linha por trimestre, para exibição imediata
+no painel.
+"""
+
+import calendar
+from datetime import date
+
+import numpy as np
+from django.db.models import Sum
+
+from .analytics import feriados_no_periodo
+from .models import Appointment, WorkingHours, OccupancyHeatmap
+
+MINUTOS_DIA = 24 * 60
+INTERVALO_PADRAO = 30
+
+# Mesma estimativa usada na validação de conflitos quando não há serviços
+DURACAO_PADRAO = 60
+
+
+def limites_trimestre(ano, trimestre):
+    """Primeiro e último dia do trimestre"""
+    mes_final = trimestre * 3
+    return date(ano, mes_final - 2, 1), date(ano, mes_final, calendar.monthrange(ano, mes_final)[1])
+
+
+def trimestre_de(data):
+    """(ano, trimestre) de uma data"""
+    return data.year, (data.month - 1) // 3 + 1
+
+
+def _cobertura(dia_semana, inicio, fim, intervalo):
+    """Faixas ocupadas por dia da semana: cada minuto coberto soma 1/intervalo na sua faixa"""
+    variacao = np.zeros((7, MINUTOS_DIA + 1), dtype=np.int64)
+    np.add.at(variacao, (dia_semana, inicio), 1)
+    np.add.at(variacao, (dia_semana, fim), -1)
+    ocupados = np.cumsum(variacao[:, :MINUTOS_DIA], axis=1)
+    return ocupados.reshape(7, MINUTOS_DIA // intervalo, intervalo).sum(axis=2) / intervalo
+
+
+def calcular_mapa_ocupacao(inicio, fim, intervalo=INTERVALO_PADRAO):
+    """
+    Matrizes 7 x (faixas do dia) de demanda, cancelamentos e utilização (%) do intervalo.
+    """
+    linhas = list(
+        Appointment.objects.filter(data_agendamento__range=(inicio, fim))
+        .annotate(duracao=Sum('appointment_services__servico__duracao_minutos'))
+        .values_list('data_agendamento', 'horario_agendamento', 'duracao', 'situacao')
+        .order_by()
+    )
+    total = len(linhas)
+    dia_semana = np.fromiter((linha[0].weekday() for linha in linhas), dtype=np.int64, count=total)
+    comeco = np.fromiter(
+        (linha[1].hour * 60 + linha[1].minute for linha in linhas), dtype=np.int64, count=total
+    )
+    duracao = np.fromiter((linha[2] or DURACAO_PADRAO for linha in linhas), dtype=np.int64, count=total)
+    cancelado = np.fromiter((linha[3] == 'cancelled' for linha in linhas), dtype=bool, count=total)
+    termino = np.minimum(comeco + duracao, MINUTOS_DIA)  # não atravessa a meia-noite
+
+    demanda = _cobertura(dia_semana[~cancelado], comeco[~cancelado], termino[~cancelado], intervalo)
+    cancelamentos = _cobertura(dia_semana[cancelado], comeco[cancelado], termino[cancelado], intervalo)
+
+    # Capacidade: fração aberta de cada faixa x dias daquele dia da semana no intervalo (sem feriados)
+    aberto = np.zeros((7, MINUTOS_DIA), dtype=np.float64)
+    for horario in WorkingHours.objects.filter(aberto=True):
+        abre = horario.horario_inicio.hour * 60 + horario.horario_inicio.minute
+        fecha = horario.horario_fim.hour * 60 + horario.horario_fim.minute
+        aberto[horario.dia_semana, abre:fecha] = 1
+    aberto_faixa = aberto.reshape(7, MINUTOS_DIA // intervalo, intervalo).mean(axis=2)
+
+    total_dias = (fim - inicio).days + 1
+    dias_semana = (np.arange(total_dias) + inicio.weekday()) % 7
+    fechados = [(feriado - inicio).days for feriado in feriados_no_periodo(inicio, fim)]
+    dias_abertos = np.bincount(np.delete(dias_semana, fechados), minlength=7)
+    capacidade = aberto_faixa * dias_abertos[:, None]
+
+    utilizacao = np.divide(demanda, capacidade, out=np.zeros_like(demanda), where=capacidade > 0) * 100
+
+    return {
+        'intervalo_minutos': intervalo,
+        'demanda': np.round(demanda, 2).tolist(),
+        'cancelamentos': np.round(cancelamentos, 2).tolist(),
+        'utilizacao': np.round(utilizacao, 1).tolist(),
+        'total_agendamentos': int((~cancelado).sum()),
+        'total_cancelamentos': int(cancelado.sum()),
+    }
+
+
+def gerar_mapa_ocupacao(ano, trimestre, intervalo=INTERVALO_PADRAO):
+    """Calcula e grava o mapa de ocupação do trimestre"""
+    inicio, fim = limites_trimestre(ano, trimestre)
+    mapa, _ = OccupancyHeatmap.objects.update_or_create(
+        ano=ano,
+        trimestre=trimestre,
+        defaults=calcular_mapa_ocupacao(inicio, fim, intervalo),
+    )
+    return mapa
+
+
+def faixas_exibicao(mapa):
+    """
+    Linhas do mapa prontas para o template, restritas às faixas com expediente ou movimento.
+    """
+    intervalo = mapa.intervalo_minutos
+    movimento = np.array(mapa.demanda) + np.array(mapa.cancelamentos)
+    if not movimento.size:
+        return {'horarios': [], 'dias': []}
+
+    colunas_usadas = list(np.flatnonzero(movimento.any(axis=0)))
+    for horario in WorkingHours.objects.filter(aberto=True):
+        colunas_usadas.append((horario.horario_inicio.hour * 60 + horario.horario_inicio.minute) // intervalo)
+        colunas_usadas.append((horario.horario_fim.hour * 60 + horario.horario_fim.minute - 1) // intervalo)
+    if not colunas_usadas:
+        return {'horarios': [], 'dias': []}
+    colunas = range(int(min(colunas_usadas)), int(max(colunas_usadas)) + 1)
+
+    horarios = [f'{(c * intervalo) // 60:02d}:{(c * intervalo) % 60:02d}' for c in colunas]
+    dias = []
+    for dia, nome in WorkingHours.WEEKDAY_CHOICES:
+        dias.append({
+            'nome': nome,
+            'faixas': [
+                {
+                    'horario': horarios[i],
+                    'demanda': mapa.demanda[dia][c],
+                    'cancelamentos': mapa.cancelamentos[dia][c],
+                    'utilizacao': mapa.utilizacao[dia][c],
+                    'opacidade': round(min(mapa.utilizacao[dia][c] / 100, 1), 2),
+                }
+                for i, c in enumerate(colunas)
+            ],
+        })
+    return {'horarios': horarios, 'dias': dias}
+
+
+def ultimos_trimestres(quantidade=4, referencia=None):
+    """(ano, trimestre) dos últimos trimestres, do mais recente para o mais antigo"""
+    ano, trimestre = trimestre_de(referencia or date.today())
+    resultado = []
+    for _ in range(quantidade):
+        resultado.append((ano, trimestre))
+        ano, trimestre = (ano - 1, 4) if trimestre == 1 else (ano, trimestre - 1)
+    return resultado
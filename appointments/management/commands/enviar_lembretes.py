@@ -0,0 +1,55 @@
+"""
+Comando que roda o agendador de lembretes de agendamentos
+
+Processo de longa duração (como o daphne): carrega os próximos agendamentos
+uma vez e dispara cada lembrete no horário, reprogramando apenas os
+agendamentos alterados. Com --uma-vez envia só os lembretes já vencidos e
+termina (uso via cron).
+"""
+import asyncio
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.reminders import ReminderScheduler, antecedencias_configuradas
+
+
+class Command(BaseCommand):
+    help = 'Envia lembretes de agendamentos nas antecedências configuradas (24h e 2h por padrão)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--antecedencias', type=str,
+            help='Antecedências em minutos separadas por vírgula (padrão: settings.LEMBRETES_ANTECEDENCIAS_MINUTOS)',
+        )
+        parser.add_argument(
+            '--intervalo-sincronizacao', type=int, default=60,
+            help='Segundos entre as buscas de agendamentos alterados, para quando o channel layer '
+                 'não alcança este processo (0 desativa, padrão: 60)',
+        )
+        parser.add_argument('--uma-vez', action='store_true', help='Envia os lembretes vencidos e termina')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO if options['verbosity'] > 1 else logging.WARNING)
+        if options.get('antecedencias'):
+            try:
+                antecedencias = [int(valor) for valor in options['antecedencias'].split(',') if valor.strip()]
+            except ValueError:
+                raise CommandError('Antecedências inválidas, use minutos separados por vírgula (ex.: 1440,120)')
+            if not antecedencias or min(antecedencias) <= 0:
+                raise CommandError('As antecedências devem ser positivas')
+        else:
+            antecedencias = antecedencias_configuradas()
+
+        agendador = ReminderScheduler(antecedencias, options['intervalo_sincronizacao'])
+        if options['uma_vez']:
+            enviados = asyncio.run(agendador.executar(uma_vez=True))
+            self.stdout.write(self.style.SUCCESS(f'{enviados} lembretes enviados'))
+            return
+
+        rotulos = ', '.join(f'{minutos} min' for minutos in agendador.antecedencias)
+        self.stdout.write(self.style.SUCCESS(f'Agendador de lembretes iniciado ({rotulos}); Ctrl+C para encerrar'))
+        try:
+            asyncio.run(agendador.executar())
+        except KeyboardInterrupt:
+            self.stdout.write(f'Agendador encerrado ({agendador.enviados} lembretes enviados)')
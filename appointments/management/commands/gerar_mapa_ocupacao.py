@@ -0,0 +1,51 @@
+"""
+Comando para pré-calcular o mapa de ocupação por trimestre
+
+Pode ser agendado diariamente: por padrão recalcula o trimestre atual e o
+anterior (agendamentos recentes ainda mudam de situação).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from appointments.models import Appointment
+from appointments.heatmap import gerar_mapa_ocupacao, trimestre_de, ultimos_trimestres
+
+
+class Command(BaseCommand):
+    help = 'Calcula o mapa de ocupação (dia da semana x horário) por trimestre'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, help='Ano do trimestre a calcular')
+        parser.add_argument('--trimestre', type=int, choices=[1, 2, 3, 4], help='Trimestre a calcular (exige --ano)')
+        parser.add_argument('--todos', action='store_true', help='Recalcula todos os trimestres com agendamentos')
+
+    def handle(self, *args, **options):
+        if options.get('trimestre'):
+            if not options.get('ano'):
+                raise CommandError('Informe --ano junto com --trimestre')
+            trimestres = [(options['ano'], options['trimestre'])]
+        elif options.get('todos'):
+            limites = Appointment.objects.aggregate(inicio=Min('data_agendamento'), fim=Max('data_agendamento'))
+            if not limites['inicio']:
+                self.stdout.write(self.style.WARNING('Nenhum agendamento encontrado'))
+                return
+            primeiro = trimestre_de(limites['inicio'])
+            trimestres = []
+            for ano, trimestre in ultimos_trimestres(400, limites['fim']):
+                trimestres.append((ano, trimestre))
+                if (ano, trimestre) == primeiro:
+                    break
+        else:
+            trimestres = ultimos_trimestres(2)
+        
+        cronometro = time.monotonic()
+        for ano, trimestre in trimestres:
+            mapa = gerar_mapa_ocupacao(ano, trimestre)
+            self.stdout.write(
+                f'{mapa}: {mapa.total_agendamentos} agendamentos, {mapa.total_cancelamentos} cancelamentos'
+            )
+        duracao = time.monotonic() - cronometro
+        
+        self.stdout.write(self.style.SUCCESS(f'{len(trimestres)} trimestre(s) calculado(s) em {duracao:.2f}s'))
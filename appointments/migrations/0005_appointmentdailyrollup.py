@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_alter_appointment_options_alter_holiday_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('dimensao', models.CharField(choices=[('total', 'Total do Dia'), ('servico', 'Serviço'), ('categoria', 'Categoria de Serviço'), ('veiculo', 'Categoria de Veículo')], max_length=20, verbose_name='Dimensão')),
+                ('chave', models.CharField(blank=True, default='', max_length=50, verbose_name='Chave')),
+                ('rotulo', models.CharField(blank=True, default='', max_length=100, verbose_name='Rótulo')),
+                ('agendamentos', models.IntegerField(default=0, verbose_name='Agendamentos')),
+                ('concluidos', models.IntegerField(default=0, verbose_name='Concluídos')),
+                ('cancelamentos', models.IntegerField(default=0, verbose_name='Cancelamentos')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Receita')),
+                ('ticket_medio', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Ticket Médio')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Métrica Diária de Agendamentos',
+                'verbose_name_plural': 'Métricas Diárias de Agendamentos',
+                'db_table': 'appointments_dailyrollup',
+                'ordering': ['-data', 'dimensao', 'chave'],
+                'indexes': [models.Index(fields=['dimensao', 'data'], name='appointments_rollup_dim_idx')],
+                'unique_together': {('data', 'dimensao', 'chave')},
+            },
+        ),
+    ]
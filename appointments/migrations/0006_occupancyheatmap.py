@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:52
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointmentdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyHeatmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('trimestre', models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(4)], verbose_name='Trimestre')),
+                ('intervalo_minutos', models.IntegerField(default=30, verbose_name='Intervalo (minutos)')),
+                ('demanda', models.JSONField(default=list, verbose_name='Demanda (faixas ocupadas)')),
+                ('cancelamentos', models.JSONField(default=list, verbose_name='Cancelamentos (faixas canceladas)')),
+                ('utilizacao', models.JSONField(default=list, verbose_name='Utilização (%)')),
+                ('total_agendamentos', models.IntegerField(default=0, verbose_name='Total de Agendamentos')),
+                ('total_cancelamentos', models.IntegerField(default=0, verbose_name='Total de Cancelamentos')),
+                ('gerado_em', models.DateTimeField(auto_now=True, verbose_name='Gerado em')),
+            ],
+            options={
+                'verbose_name': 'Mapa de Ocupação',
+                'verbose_name_plural': 'Mapas de Ocupação',
+                'db_table': 'appointments_occupancyheatmap',
+                'ordering': ['-ano', '-trimestre'],
+                'unique_together': {('ano', 'trimestre')},
+            },
+        ),
+    ]
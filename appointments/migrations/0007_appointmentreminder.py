@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_occupancyheatmap'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em'),
+        ),
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('antecedencia_minutos', models.PositiveIntegerField(verbose_name='Antecedência (minutos)')),
+                ('agendado_para', models.DateTimeField(verbose_name='Horário do Agendamento')),
+                ('enviado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Enviado em')),
+                ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='appointments.appointment', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Lembrete Enviado',
+                'verbose_name_plural': 'Lembretes Enviados',
+                'db_table': 'appointments_reminder',
+                'ordering': ['-enviado_em'],
+                'unique_together': {('agendamento', 'antecedencia_minutos', 'agendado_para')},
+            },
+        ),
+    ]
@@ -31,7 +31,7 @@ class Appointment(models.Model):
     
     # Timestamps
     criado_em = models.DateTimeField(default=timezone.now, verbose_name='Criado em')
-    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em')
     iniciado_em = models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')
     concluido_em = models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')
     
@@ -257,3 +257,91 @@ class Holiday(models.Model):
     
     def __str__(self):
         return f"{self.nome} - {self.data}"
+
+
+class AppointmentDailyRollup(models.Model):
+    """
+    Métricas diárias pré-agregadas de agendamentos (base dos relatórios)
+    """
+    DIMENSION_CHOICES = [
+        ('total', 'Total do Dia'),
+        ('servico', 'Serviço'),
+        ('categoria', 'Categoria de Serviço'),
+        ('veiculo', 'Categoria de Veículo'),
+    ]
+    
+    data = models.DateField(verbose_name='Data')
+    dimensao = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name='Dimensão')
+    chave = models.CharField(max_length=50, blank=True, default='', verbose_name='Chave')
+    rotulo = models.CharField(max_length=100, blank=True, default='', verbose_name='Rótulo')
+    agendamentos = models.IntegerField(default=0, verbose_name='Agendamentos')
+    concluidos = models.IntegerField(default=0, verbose_name='Concluídos')
+    cancelamentos = models.IntegerField(default=0, verbose_name='Cancelamentos')
+    receita = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Receita')
+    ticket_medio = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Ticket Médio')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+    
+    class Meta:
+        db_table = 'appointments_dailyrollup'
+        verbose_name = 'Métrica Diária de Agendamentos'
+        verbose_name_plural = 'Métricas Diárias de Agendamentos'
+        ordering = ['-data', 'dimensao', 'chave']
+        unique_together = ['data', 'dimensao', 'chave']
+        indexes = [
+            models.Index(fields=['dimensao', 'data'], name='appointments_rollup_dim_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.data} - {self.get_dimensao_display()} {self.rotulo}".strip()
+
+
+class OccupancyHeatmap(models.Model):
+    """
+    Mapa de ocupação (dia da semana x faixa de horário) pré-calculado por trimestre
+    
+    As matrizes têm 7 linhas (segunda a domingo) e uma coluna por faixa de
+    'intervalo_minutos' do dia.
+    """
+    ano = models.IntegerField(verbose_name='Ano')
+    trimestre = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(4)], verbose_name='Trimestre')
+    intervalo_minutos = models.IntegerField(default=30, verbose_name='Intervalo (minutos)')
+    demanda = models.JSONField(default=list, verbose_name='Demanda (faixas ocupadas)')
+    cancelamentos = models.JSONField(default=list, verbose_name='Cancelamentos (faixas canceladas)')
+    utilizacao = models.JSONField(default=list, verbose_name='Utilização (%)')
+    total_agendamentos = models.IntegerField(default=0, verbose_name='Total de Agendamentos')
+    total_cancelamentos = models.IntegerField(default=0, verbose_name='Total de Cancelamentos')
+    gerado_em = models.DateTimeField(auto_now=True, verbose_name='Gerado em')
+    
+    class Meta:
+        db_table = 'appointments_occupancyheatmap'
+        verbose_name = 'Mapa de Ocupação'
+        verbose_name_plural = 'Mapas de Ocupação'
+        ordering = ['-ano', '-trimestre']
+        unique_together = ['ano', 'trimestre']
+    
+    def __str__(self):
+        return f"Ocupação {self.trimestre}º trimestre de {self.ano}"
+
+
+class AppointmentReminder(models.Model):
+    """
+    Marca de lembrete enviado (um por agendamento, antecedência e horário)
+    
+    Garante que cada lembrete seja enviado uma única vez, mesmo com o agendador
+    reiniciado ou rodando em mais de um processo. 'agendado_para' entra na
+    chave para que uma remarcação gere novos lembretes.
+    """
+    agendamento = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='lembretes', verbose_name='Agendamento')
+    antecedencia_minutos = models.PositiveIntegerField(verbose_name='Antecedência (minutos)')
+    agendado_para = models.DateTimeField(verbose_name='Horário do Agendamento')
+    enviado_em = models.DateTimeField(default=timezone.now, verbose_name='Enviado em')
+    
+    class Meta:
+        db_table = 'appointments_reminder'
+        verbose_name = 'Lembrete Enviado'
+        verbose_name_plural = 'Lembretes Enviados'
+        ordering = ['-enviado_em']
+        unique_together = ['agendamento', 'antecedencia_minutos', 'agendado_para']
+    
+    def __str__(self):
+        return f"{self.agendamento} - {self.antecedencia_minutos} min antes"
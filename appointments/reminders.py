@@ -0,0 +1,264 @@
+"""
+Agendador de lembretes de agendamentos
+
+Mantém em um heap os próximos disparos (horário do agendamento menos cada
+antecedência configurada) e dorme até o primeiro deles: cada lembrete custa
+O(log n), sem varrer a tabela periodicamente. Alterações de agendamentos
+chegam pelo channel layer (grupo GRUPO_AGENDA, enviado pelos sinais do app) e
+reprogramam só o agendamento alterado; entradas antigas do heap são
+descartadas ao sair pela versão do agendamento.
+
+Cada envio grava antes uma marca em AppointmentReminder (única por
+agendamento, antecedência e horário), então reinícios e agendadores
+duplicados não repetem lembretes.
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Notification
+from core.websocket_dispatcher import dispatcher, enviar_evento
+from core.websocket_utils import notify_client_reminder
+from .models import Appointment, AppointmentReminder
+
+logger = logging.getLogger(__name__)
+
+# Antecedências padrão dos lembretes, em minutos (24h e 2h)
+ANTECEDENCIAS_PADRAO = (24 * 60, 2 * 60)
+
+# Grupo do channel layer que recebe as alterações de agendamentos
+GRUPO_AGENDA = 'lembretes_agenda'
+
+SITUACOES_ATIVAS = ('pending', 'confirmed')
+
+
+def antecedencias_configuradas():
+    """Antecedências (minutos) de settings.LEMBRETES_ANTECEDENCIAS_MINUTOS, da maior para a menor"""
+    return sorted(getattr(settings, 'LEMBRETES_ANTECEDENCIAS_MINUTOS', ANTECEDENCIAS_PADRAO), reverse=True)
+
+
+def horario_do_agendamento(data, horario):
+    """Data e horário (locais) do agendamento como datetime com fuso"""
+    return timezone.make_aware(datetime.combine(data, horario))
+
+
+def notificar_alteracao_agenda(appointment_id):
+    """Avisa o agendador (após o commit) que o agendamento mudou ou foi removido"""
+    enviar_evento(GRUPO_AGENDA, {'type': 'agenda.alterada', 'appointment_id': appointment_id})
+
+
+def descrever_antecedencia(minutos):
+    if minutos % (24 * 60) == 0:
+        dias = minutos // (24 * 60)
+        return '1 dia' if dias == 1 else f'{dias} dias'
+    if minutos % 60 == 0:
+        horas = minutos // 60
+        return '1 hora' if horas == 1 else f'{horas} horas'
+    return f'{minutos} minutos'
+
+
+def enviar_lembrete(appointment_id, antecedencia, agendado_para):
+    """
+    Envia o lembrete se o agendamento continua ativo no mesmo horário e o
+    lembrete ainda não foi enviado. Retorna True quando enviou.
+    """
+    agendamento = (
+        Appointment.objects.select_related('usuario')
+        .filter(pk=appointment_id, situacao__in=SITUACOES_ATIVAS)
+        .first()
+    )
+    if agendamento is None:
+        return False
+    if horario_do_agendamento(agendamento.data_agendamento, agendamento.horario_agendamento) != agendado_para:
+        return False
+
+    with transaction.atomic():
+        _, criado = AppointmentReminder.objects.get_or_create(
+            agendamento=agendamento,
+            antecedencia_minutos=antecedencia,
+            agendado_para=agendado_para,
+        )
+        if not criado:
+            return False
+
+        hoje = timezone.localdate()
+        if agendamento.data_agendamento == hoje:
+            quando = 'hoje'
+        elif (agendamento.data_agendamento - hoje).days == 1:
+            quando = 'amanhã'
+        else:
+            quando = f'em {agendamento.data_agendamento:%d/%m/%Y}'
+        mensagem = f'Seu agendamento é {quando} às {agendamento.horario_agendamento:%H:%M}.'
+
+        # A notificação fica salva para quem não estiver conectado agora
+        Notification.objects.create(
+            usuario=agendamento.usuario,
+            titulo='Lembrete de agendamento',
+            mensagem=mensagem,
+            tipo='reminder',
+        )
+        notify_client_reminder(
+            agendamento.usuario_id,
+            agendamento.id,
+            mensagem,
+            descrever_antecedencia(antecedencia),
+        )
+    return True
+
+
+class ReminderScheduler:
+    """
+    Heap de disparos de lembretes alimentado por alterações incrementais
+    """
+
+    def __init__(self, antecedencias=None, intervalo_sincronizacao=60):
+        self.antecedencias = sorted(antecedencias or antecedencias_configuradas(), reverse=True)
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self.heap = []            # (instante, appointment_id, antecedencia, versao, agendado_para)
+        self.versoes = {}         # appointment_id -> versão atual das entradas no heap
+        self.programados = {}     # appointment_id -> horário para o qual as entradas foram montadas
+        self.alteracoes = asyncio.Queue()
+        self.enviados = 0
+        self._ultima_sincronizacao = None
+
+    # Montagem do heap
+
+    def _programar(self, appointment_id, data, horario, enviados, agora):
+        """Empilha os lembretes pendentes de um agendamento com uma nova versão"""
+        agendado_para = horario_do_agendamento(data, horario)
+        if self.programados.get(appointment_id) == agendado_para:
+            return  # mesmo horário (ex.: só mudou o status): as entradas atuais continuam valendo
+        versao = self.versoes.get(appointment_id, 0) + 1
+        self.versoes[appointment_id] = versao
+        self.programados[appointment_id] = agendado_para
+        if agendado_para <= agora:
+            return
+
+        vencida = None
+        for antecedencia in self.antecedencias:
+            disparo = agendado_para - timedelta(minutes=antecedencia)
+            if disparo <= agora:
+                vencida = antecedencia
+            elif (antecedencia, agendado_para) not in enviados:
+                heapq.heappush(self.heap, (disparo, appointment_id, antecedencia, versao, agendado_para))
+
+        # Já vencidos (agendador parado ou agendamento recente): só o de menor antecedência, agora
+        if vencida is not None and (vencida, agendado_para) not in enviados:
+            heapq.heappush(self.heap, (agora, appointment_id, vencida, versao, agendado_para))
+
+    def _dados_agendamentos(self, filtro):
+        """Agendamentos ativos do filtro e os lembretes já enviados de cada um"""
+        linhas = list(
+            Appointment.objects.filter(filtro).filter(situacao__in=SITUACOES_ATIVAS)
+            .values_list('id', 'data_agendamento', 'horario_agendamento')
+        )
+        enviados = {}
+        for appointment_id, antecedencia, agendado_para in AppointmentReminder.objects.filter(
+            agendamento_id__in=[linha[0] for linha in linhas]
+        ).values_list('agendamento_id', 'antecedencia_minutos', 'agendado_para'):
+            enviados.setdefault(appointment_id, set()).add((antecedencia, agendado_para))
+        return linhas, enviados
+
+    def carregar(self):
+        """Carga inicial: uma leitura dos agendamentos futuros ativos"""
+        agora = timezone.now()
+        self._ultima_sincronizacao = agora
+        linhas, enviados = self._dados_agendamentos(Q(data_agendamento__gte=timezone.localdate()))
+        for appointment_id, data, horario in linhas:
+            self._programar(appointment_id, data, horario, enviados.get(appointment_id, set()), agora)
+        return len(linhas)
+
+    def reprogramar(self, ids):
+        """Reprograma apenas os agendamentos alterados (removidos/cancelados saem do heap)"""
+        agora = timezone.now()
+        linhas, enviados = self._dados_agendamentos(Q(id__in=ids))
+        ativos = set()
+        for appointment_id, data, horario in linhas:
+            ativos.add(appointment_id)
+            self._programar(appointment_id, data, horario, enviados.get(appointment_id, set()), agora)
+        for appointment_id in set(ids) - ativos:
+            # Nova versão sem entradas: as antigas são ignoradas quando chegarem ao topo
+            self.versoes[appointment_id] = self.versoes.get(appointment_id, 0) + 1
+            self.programados.pop(appointment_id, None)
+
+    def alterados_desde_ultima_sincronizacao(self):
+        """
+        Rede de segurança para quando o channel layer não alcança este processo
+        (InMemoryChannelLayer): só os agendamentos com atualizado_em recente (coluna indexada).
+        """
+        agora = timezone.now()
+        desde, self._ultima_sincronizacao = self._ultima_sincronizacao, agora
+        return list(Appointment.objects.filter(atualizado_em__gte=desde).values_list('id', flat=True))
+
+    # Disparo
+
+    def vencidos(self, agora):
+        """Retira do heap os lembretes vencidos e ainda válidos"""
+        prontos = []
+        while self.heap and self.heap[0][0] <= agora:
+            _, appointment_id, antecedencia, versao, agendado_para = heapq.heappop(self.heap)
+            if self.versoes.get(appointment_id) == versao:
+                prontos.append((appointment_id, antecedencia, agendado_para))
+        return prontos
+
+    async def executar(self, uma_vez=False):
+        """Laço principal: dorme até o próximo disparo ou até chegar uma alteração"""
+        total = await database_sync_to_async(self.carregar)()
+        logger.info('Agendador de lembretes: %s agendamentos, %s disparos programados', total, len(self.heap))
+
+        escuta = None if uma_vez else asyncio.create_task(self._escutar_alteracoes())
+        sincronizado_em = asyncio.get_running_loop().time()
+        try:
+            while True:
+                for appointment_id, antecedencia, agendado_para in self.vencidos(timezone.now()):
+                    if await database_sync_to_async(enviar_lembrete)(appointment_id, antecedencia, agendado_para):
+                        self.enviados += 1
+                if uma_vez:
+                    await dispatcher.esvaziar()  # o loop termina junto com o comando
+                    return self.enviados
+
+                espera = self.intervalo_sincronizacao or None
+                if self.heap:
+                    ate_proximo = (self.heap[0][0] - timezone.now()).total_seconds()
+                    espera = max(min(ate_proximo, espera or ate_proximo), 0)
+
+                ids = set()
+                try:
+                    ids.add(await asyncio.wait_for(self.alteracoes.get(), espera))
+                    while not self.alteracoes.empty():
+                        ids.add(self.alteracoes.get_nowait())
+                except asyncio.TimeoutError:
+                    pass
+
+                agora_loop = asyncio.get_running_loop().time()
+                if self.intervalo_sincronizacao and agora_loop - sincronizado_em >= self.intervalo_sincronizacao:
+                    sincronizado_em = agora_loop
+                    ids.update(await database_sync_to_async(self.alterados_desde_ultima_sincronizacao)())
+                if ids:
+                    await database_sync_to_async(self.reprogramar)(ids)
+        finally:
+            if escuta is not None:
+                escuta.cancel()
+
+    async def _escutar_alteracoes(self):
+        camada = get_channel_layer()
+        if camada is None:
+            return
+        canal = await camada.new_channel()
+        await camada.group_add(GRUPO_AGENDA, canal)
+        try:
+            while True:
+                mensagem = await camada.receive(canal)
+                if mensagem.get('type') == 'agenda.alterada':
+                    self.alteracoes.put_nowait(mensagem['appointment_id'])
+        finally:
+            await camada.group_discard(GRUPO_AGENDA, canal)
@@ -0,0 +1,162 @@
+"""
+Métricas diárias pré-agregadas de agendamentos
+
+Mantém a tabela AppointmentDailyRollup com, para cada dia, o total geral e os
+recortes por serviço, por categoria de serviço e por categoria de veículo.
+Somente os dias tocados por agendamentos alterados são recalculados, de modo
+que os relatórios leem poucas linhas já agregadas em vez de varrer
+Appointment/AppointmentService.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from vehicles.models import Vehicle
+from .models import Appointment, AppointmentService, AppointmentDailyRollup
+
+TAMANHO_LOTE = 1000
+
+# Cancelados contam como volume, mas não geram receita
+SITUACAO_CANCELADA = 'cancelled'
+SITUACAO_CONCLUIDA = 'completed'
+
+
+def _metricas(dimensao, data, chave, rotulo, linha):
+    agendamentos = linha['agendamentos'] or 0
+    cancelamentos = linha['cancelamentos'] or 0
+    receita = linha['receita'] or Decimal('0')
+    validos = agendamentos - cancelamentos
+    return AppointmentDailyRollup(
+        data=data,
+        dimensao=dimensao,
+        chave=str(chave),
+        rotulo=rotulo or '',
+        agendamentos=agendamentos,
+        concluidos=linha['concluidos'] or 0,
+        cancelamentos=cancelamentos,
+        receita=receita,
+        ticket_medio=(receita / validos).quantize(Decimal('0.01')) if validos else Decimal('0'),
+    )
+
+
+def recalcular_dias(datas):
+    """
+    Recalcula as métricas dos dias informados (iterável de datas).
+
+    Retorna a quantidade de linhas gravadas.
+    """
+    datas = sorted(set(datas))
+    if not datas:
+        return 0
+
+    nao_cancelado = ~Q(situacao=SITUACAO_CANCELADA)
+    agregados_agendamento = {
+        'agendamentos': Count('id'),
+        'cancelamentos': Count('id', filter=Q(situacao=SITUACAO_CANCELADA)),
+        'concluidos': Count('id', filter=Q(situacao=SITUACAO_CONCLUIDA)),
+        'receita': Sum('preco_total', filter=nao_cancelado),
+    }
+    agendamentos = Appointment.objects.filter(data_agendamento__in=datas)
+
+    # Recortes por serviço usam o preço de cada item do agendamento
+    cancelado_item = Q(agendamento__situacao=SITUACAO_CANCELADA)
+    agregados_item = {
+        'agendamentos': Count('agendamento_id', distinct=True),
+        'cancelamentos': Count('agendamento_id', distinct=True, filter=cancelado_item),
+        'concluidos': Count('agendamento_id', distinct=True, filter=Q(agendamento__situacao=SITUACAO_CONCLUIDA)),
+        'receita': Sum('preco', filter=~cancelado_item),
+    }
+    itens = AppointmentService.objects.filter(agendamento__data_agendamento__in=datas)
+
+    categorias_veiculo = dict(Vehicle.CATEGORY_CHOICES)
+    linhas = []
+
+    for linha in agendamentos.values('data_agendamento').annotate(**agregados_agendamento).order_by():
+        linhas.append(_metricas('total', linha['data_agendamento'], '', 'Total', linha))
+
+    por_veiculo = agendamentos.values('data_agendamento', 'veiculo__categoria').annotate(**agregados_agendamento).order_by()
+    for linha in por_veiculo:
+        categoria = linha['veiculo__categoria']
+        linhas.append(_metricas(
+            'veiculo', linha['data_agendamento'], categoria, categorias_veiculo.get(categoria, categoria), linha
+        ))
+
+    por_servico = itens.values(
+        'agendamento__data_agendamento', 'servico_id', 'servico__nome'
+    ).annotate(**agregados_item).order_by()
+    for linha in por_servico:
+        linhas.append(_metricas(
+            'servico', linha['agendamento__data_agendamento'], linha['servico_id'], linha['servico__nome'], linha
+        ))
+
+    por_categoria = itens.values(
+        'agendamento__data_agendamento', 'servico__categoria_id', 'servico__categoria__nome'
+    ).annotate(**agregados_item).order_by()
+    for linha in por_categoria:
+        linhas.append(_metricas(
+            'categoria', linha['agendamento__data_agendamento'], linha['servico__categoria_id'],
+            linha['servico__categoria__nome'], linha
+        ))
+
+    with transaction.atomic():
+        AppointmentDailyRollup.objects.filter(data__in=datas).delete()
+        AppointmentDailyRollup.objects.bulk_create(linhas, batch_size=TAMANHO_LOTE)
+    return len(linhas)
+
+
+def recalcular_periodo(inicio, fim):
+    """Recalcula todos os dias do intervalo (inclusive), em blocos de um mês"""
+    total = 0
+    atual = inicio
+    while atual <= fim:
+        bloco_fim = min(atual + timedelta(days=30), fim)
+        total += recalcular_dias(atual + timedelta(days=i) for i in range((bloco_fim - atual).days + 1))
+        atual = bloco_fim + timedelta(days=1)
+    return total
+
+
+def resumo_periodo(inicio, fim):
+    """Totais do intervalo lidos apenas das linhas diárias de total"""
+    totais = AppointmentDailyRollup.objects.filter(
+        dimensao='total', data__range=(inicio, fim)
+    ).aggregate(
+        agendamentos=Sum('agendamentos'),
+        concluidos=Sum('concluidos'),
+        cancelamentos=Sum('cancelamentos'),
+        receita=Sum('receita'),
+    )
+    agendamentos = totais['agendamentos'] or 0
+    cancelamentos = totais['cancelamentos'] or 0
+    receita = totais['receita'] or Decimal('0')
+    validos = agendamentos - cancelamentos
+    return {
+        'agendamentos': agendamentos,
+        'concluidos': totais['concluidos'] or 0,
+        'cancelamentos': cancelamentos,
+        'receita': receita,
+        'ticket_medio': (receita / validos).quantize(Decimal('0.01')) if validos else Decimal('0'),
+    }
+
+
+def serie_periodo(inicio, fim, dimensao='total', granularidade='dia'):
+    """
+    Série temporal de uma dimensão no intervalo.
+
+    Com granularidade 'mes' as linhas diárias são somadas por mês no banco.
+    """
+    periodo = TruncMonth('data') if granularidade == 'mes' else F('data')
+    consulta = AppointmentDailyRollup.objects.filter(
+        dimensao=dimensao, data__range=(inicio, fim)
+    ).annotate(periodo=periodo)
+    return list(
+        consulta.values('periodo', 'chave', 'rotulo').annotate(
+            agendamentos=Sum('agendamentos'),
+            concluidos=Sum('concluidos'),
+            cancelamentos=Sum('cancelamentos'),
+            receita=Sum('receita'),
+        ).order_by('periodo', 'chave')
+    )
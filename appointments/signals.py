@@ -0,0 +1,101 @@
+"""
+Sinais do app de agendamentos
+
+Marca os dias tocados por agendamentos alterados e recalcula as métricas
+diárias (AppointmentDailyRollup) desses dias uma única vez, ao final da
+transação. Também invalida as análises temporais em cache e avisa o
+agendador de lembretes dos agendamentos alterados.
+"""
+
+import weakref
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Appointment, AppointmentService
+from .rollups import recalcular_dias
+from .analytics import invalidar_analitico
+from .reminders import notificar_alteracao_agenda
+
+
+class _Recalculo:
+    """Callback de on_commit que recalcula e esvazia os dias pendentes da conexão"""
+    
+    def __init__(self, pendentes):
+        self.pendentes = pendentes
+    
+    def __call__(self):
+        dias = set(self.pendentes)
+        self.pendentes.clear()
+        if dias:
+            recalcular_dias(dias)
+
+
+def _marcar_dia(*datas):
+    """
+    Acumula os dias tocados e recalcula uma única vez no commit
+
+    Só vale para save()/delete() de instâncias: QuerySet.update(), bulk_create
+    e bulk_update não disparam sinais e deixam as métricas dos dias afetados
+    desatualizadas; depois deles rode recalcular_rollups --inicio --fim do
+    período (ou chame rollups.recalcular_dias).
+    """
+    datas = {data for data in datas if data}
+    if not datas:
+        return
+    conexao = transaction.get_connection()
+    if not conexao.in_atomic_block:
+        recalcular_dias(datas)
+        return
+
+    pendentes = getattr(conexao, '_rollup_dias_pendentes', None)
+    if pendentes is None:
+        pendentes = conexao._rollup_dias_pendentes = set()
+    pendentes.update(datas)
+    # Um callback por transação: a conexão guarda só uma referência fraca a
+    # ele. Depois de rodar no commit, ou de ser descartado num rollback (total
+    # ou do savepoint em que foi registrado), o Django o solta, a referência
+    # morre e a próxima marcação registra outro. Dias de um trecho desfeito
+    # ficam no conjunto e são só recalculados à toa no commit seguinte.
+    registrado = getattr(conexao, '_rollup_recalculo', None)
+    if registrado is None or registrado() is None:
+        recalculo = _Recalculo(pendentes)
+        conexao._rollup_recalculo = weakref.ref(recalculo)
+        transaction.on_commit(recalculo)
+
+
+@receiver(post_init, sender=Appointment)
+def guardar_data_original(sender, instance, **kwargs):
+    """Guarda a data carregada para detectar remarcações"""
+    instance._data_original = instance.__dict__.get('data_agendamento')
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def agendamento_alterado(sender, instance, **kwargs):
+    _marcar_dia(instance._data_original, instance.data_agendamento)
+    instance._data_original = instance.data_agendamento
+
+
+@receiver([post_save, post_delete], sender=AppointmentService)
+def servico_agendamento_alterado(sender, instance, **kwargs):
+    data = (
+        Appointment.objects.filter(pk=instance.agendamento_id)
+        .values_list('data_agendamento', flat=True).first()
+        if 'agendamento' not in instance._state.fields_cache
+        else instance.agendamento.data_agendamento
+    )
+    _marcar_dia(data)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=AppointmentService)
+def invalidar_analises(sender, **kwargs):
+    """Agenda mudou: as análises temporais em cache deixam de valer"""
+    invalidar_analitico()
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def reprogramar_lembretes(sender, instance, **kwargs):
+    """O agendador de lembretes reprograma só este agendamento (após o commit)"""
+    notificar_alteracao_agenda(instance.pk)
@@ -7,7 +7,6 @@ Configurado para suportar HTTP e WebSocket com Django Channels.
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autov7_backend.settings')
@@ -17,16 +16,19 @@ django_asgi_app = get_asgi_application()
 
 # Import routing after Django is initialized
 from autov7_backend import routing
+from core.websocket_admission import AdmissionControlMiddleware, CachedAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
     # HTTP requests
     "http": django_asgi_app,
     
-    # WebSocket requests
+    # WebSocket requests (admissão limitada antes de qualquer acesso ao banco)
     "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
-            URLRouter(
-                routing.websocket_urlpatterns
+        AdmissionControlMiddleware(
+            CachedAuthMiddlewareStack(
+                URLRouter(
+                    routing.websocket_urlpatterns
+                )
             )
         )
     ),
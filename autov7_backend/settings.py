@@ -141,6 +141,12 @@ STATICFILES_DIRS = [
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads gravados pelo hash do conteúdo, sem cópias repetidas (core/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -206,12 +212,14 @@ ASGI_APPLICATION = 'autov7_backend.asgi.application'
 
 # Channel Layers - Configuração com Fallback
 # PRODUÇÃO: Use Redis (descomente a primeira configuração)
+# VÁRIOS WORKERS SEM REDIS: broker local via socket Unix (python manage.py channel_broker)
 # DESENVOLVIMENTO: Use InMemory (já ativo)
 
 import os
 
 # Detectar se Redis está disponível
 USE_REDIS = os.environ.get('USE_REDIS', 'False') == 'True'
+USE_UNIX_BROKER = os.environ.get('USE_UNIX_BROKER', 'False') == 'True'
 
 if USE_REDIS:
     # Produção - Redis Channel Layer (Requer Redis rodando)
@@ -223,6 +231,30 @@ if USE_REDIS:
             },
         },
     }
+    # Cache compartilhado entre os processos (presença WebSocket, caches de relatórios)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+        },
+    }
+elif USE_UNIX_BROKER:
+    # Vários processos na mesma máquina - broker local (python manage.py channel_broker)
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+            'CONFIG': {
+                'path': os.environ.get('CHANNEL_BROKER_SOCKET', '/tmp/autov7-channels.sock'),
+            },
+        },
+    }
+    # Cache em disco compartilhado pelos workers da máquina (presença WebSocket, caches de relatórios)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', '/tmp/autov7-cache'),
+        },
+    }
 else:
     # Desenvolvimento - In-Memory Channel Layer
     # ⚠️ NÃO use em produção! Funciona apenas com 1 processo
@@ -235,3 +267,28 @@ else:
 # WebSocket Settings
 WEBSOCKET_ACCEPT_ALL = DEBUG
 WEBSOCKET_TIMEOUT = 60  # segundos
+WEBSOCKET_FILA_SAIDA_MAXIMA = 100  # eventos pendentes por conexão antes de descartar/desconectar
+WEBSOCKET_JANELA_ENVIO = 32  # quadros enviados sem confirmação do navegador
+PRESENCA_TTL = 90  # segundos sem heartbeat até a conexão ser considerada offline
+SSE_KEEPALIVE = 25  # segundos entre comentários de keepalive no /dashboard/eventos/
+WEBSOCKET_ADMISSAO_TAXA = 20  # novas conexões por segundo em cada processo
+WEBSOCKET_ADMISSAO_RAJADA = 40  # conexões aceitas de uma vez antes de limitar
+WEBSOCKET_SESSAO_CACHE_TTL = 60  # segundos com o usuário da sessão em cache para reconexões
+
+# Lembretes de agendamento (python manage.py enviar_lembretes): antecedências em minutos
+LEMBRETES_ANTECEDENCIAS_MINUTOS = [24 * 60, 2 * 60]
+
+# Retenção de notificações (python manage.py limpar_notificacoes): lidas há mais de N dias saem da caixa
+NOTIFICACOES_RETENCAO_DIAS = 90
+
+# Caixa de saída de mensagens (python manage.py enviar_mensagens): backend de envio plugável
+MENSAGENS_BACKEND = os.environ.get('MENSAGENS_BACKEND', 'core.messaging.FileBackend')
+MENSAGENS_ARQUIVO = os.environ.get('MENSAGENS_ARQUIVO', '/tmp/autov7-mensagens.jsonl')
+
+# Variantes responsivas das imagens do site (core/renditions.py, python manage.py gerar_variantes)
+VARIANTES_LARGURAS = [480, 960, 1920]
+VARIANTES_PROCESSOS = 2  # processos do pool de conversão
+
+# Miniaturas sob demanda das prévias do admin (core/thumbnails.py)
+MINIATURAS_TAMANHOS = [64, 150, 320]
+MINIATURAS_DIR = os.environ.get('MINIATURAS_DIR', str(BASE_DIR / 'cache' / 'miniaturas'))
@@ -8,6 +8,7 @@ from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 from core.home_views import home_view, sobre_view, api_status
 from core.favicon_view import favicon_view
+from core.thumbnail_view import miniatura_view
 from core.auth_views import custom_login_view, custom_logout_view
 from core.admin import admin_site  # Importa o site admin customizado
 
@@ -15,6 +16,7 @@ urlpatterns = [
     path('', home_view, name='home'),
     path('sobre/', sobre_view, name='sobre'),
     path('favicon.ico', favicon_view, name='favicon'),
+    path('miniaturas/<int:tamanho>/<path:nome>', miniatura_view, name='miniatura'),
     path('admin/', admin_site.urls),  # Usa o site admin customizado
     path('api/status/', api_status, name='api_status'),
     path('api/auth/', include('core.urls')),
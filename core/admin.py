@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
+from django.utils.safestring import mark_safe
 from django.urls import path, reverse
 from django.http import HttpResponseRedirect
-from .models import User, Notification, GalleryImage, ServiceImage, HeroImage, HeroBackground, ServiceIcon
+from .models import User, Notification, NotificationArchive, Campaign, OutboundMessage, MediaBlob, GalleryImage, ServiceImage, HeroImage, HeroBackground, ServiceIcon, CustomerSegment, CohortRetention
+from .thumbnails import url_miniatura
 
 # Importa views customizadas
 from .admin_custom_views import cadastrar_funcionario_view
@@ -156,7 +158,7 @@ class GalleryImageAdmin(admin.ModelAdmin):
         if obj.imagem:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
-                obj.imagem.url
+                url_miniatura(obj.imagem, 150)
             )
         return "Sem imagem"
     image_preview.short_description = "Preview"
@@ -193,7 +195,7 @@ class ServiceImageAdmin(admin.ModelAdmin):
         if obj.imagem:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
-                obj.imagem.url
+                url_miniatura(obj.imagem, 150)
             )
         return "Sem imagem"
     image_preview.short_description = "Preview"
@@ -230,7 +232,7 @@ class HeroImageAdmin(admin.ModelAdmin):
         if obj.imagem:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
-                obj.imagem.url
+                url_miniatura(obj.imagem, 150)
             )
         return "Sem imagem"
     image_preview.short_description = "Preview"
@@ -275,7 +277,7 @@ class HeroBackgroundAdmin(admin.ModelAdmin):
                 '<div style="position: absolute; bottom: 0; left: 0; background: rgba(0,0,0,0.7); color: white; padding: 2px 5px; font-size: 10px;">'
                 'Transparência: {}%</div>'
                 '</div>',
-                obj.imagem_fundo.url,
+                url_miniatura(obj.imagem_fundo, 150),
                 obj.css_opacity,
                 obj.css_blur,
                 int(obj.transparencia * 100)
@@ -335,13 +337,13 @@ class ServiceIconAdmin(admin.ModelAdmin):
     )
     
     def icon_preview(self, obj):
-        if obj.custom_icon:
+        if obj.icone_personalizado:
             return format_html(
                 '<div style="display: flex; align-items: center; gap: 10px;">'
                 '<img src="{}" style="width: 32px; height: 32px; object-fit: cover; border-radius: 4px;" />'
                 '<span>Ícone Personalizado</span>'
                 '</div>',
-                obj.custom_icon.url
+                url_miniatura(obj.icone_personalizado, 64)
             )
         else:
             return format_html(
@@ -349,7 +351,7 @@ class ServiceIconAdmin(admin.ModelAdmin):
                 '<div style="width: 32px; height: 32px; background: #e5e7eb; border-radius: 4px; display: flex; align-items: center; justify-content: center; font-size: 12px;">📷</div>'
                 '<span>Ícone padrão: {}</span>'
                 '</div>',
-                obj.fallback_icon
+                obj.icone_fallback
             )
     icon_preview.short_description = "Preview do Ícone"
     
@@ -373,10 +375,13 @@ class ServiceIconAdmin(admin.ModelAdmin):
             badge_html = f'<div style="position: absolute; top: -8px; left: 50%; transform: translateX(-50%); background: {obj.badge_config["color"].replace("bg-", "#").replace("blue-500", "#3b82f6").replace("yellow-500", "#eab308").replace("green-500", "#22c55e").replace("red-500", "#ef4444")}; color: white; padding: 4px 12px; border-radius: 20px; font-size: 10px; font-weight: bold;">{obj.badge_config["text"]}</div>'
         
         icon_html = ""
-        if obj.custom_icon:
-            icon_html = f'<img src="{obj.custom_icon.url}" style="width: 32px; height: 32px; object-fit: cover;" />'
+        if obj.icone_personalizado:
+            icon_html = format_html(
+                '<img src="{}" style="width: 32px; height: 32px; object-fit: cover;" />',
+                url_miniatura(obj.icone_personalizado, 64)
+            )
         else:
-            icon_html = f'<div style="width: 32px; height: 32px; background: #3b82f6; color: white; border-radius: 8px; display: flex; align-items: center; justify-content: center; font-size: 16px;">📷</div>'
+            icon_html = mark_safe('<div style="width: 32px; height: 32px; background: #3b82f6; color: white; border-radius: 8px; display: flex; align-items: center; justify-content: center; font-size: 16px;">📷</div>')
         
         return format_html(
             '<div style="position: relative; background: #f8fafc; border: 1px solid #e2e8f0; border-radius: 12px; padding: 20px; width: 250px; text-align: center;">'
@@ -388,13 +393,122 @@ class ServiceIconAdmin(admin.ModelAdmin):
             '</div>',
             badge_html,
             icon_html,
-            obj.title,
-            obj.description[:50] + "..." if len(obj.description) > 50 else obj.description,
+            obj.titulo,
+            obj.descricao[:50] + "..." if len(obj.descricao) > 50 else obj.descricao,
             obj.formatted_price
         )
     card_preview.short_description = "Preview do Card"
 
 
+@admin.register(CustomerSegment)
+class CustomerSegmentAdmin(admin.ModelAdmin):
+    """
+    Admin para segmentos RFM de clientes (somente leitura, gerados pelo comando calcular_segmentos)
+    """
+    list_display = ('usuario', 'segmento', 'rfm', 'recencia_dias', 'frequencia', 'valor_monetario', 'coorte', 'calculado_em')
+    list_filter = ('segmento', 'coorte')
+    search_fields = ('usuario__email', 'usuario__first_name', 'usuario__last_name')
+    list_select_related = ('usuario',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CohortRetention)
+class CohortRetentionAdmin(admin.ModelAdmin):
+    """
+    Admin para retenção mensal por coorte (somente leitura)
+    """
+    list_display = ('coorte', 'clientes', 'calculado_em')
+    ordering = ('-coorte',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    """
+    Admin para notificações arquivadas pela retenção (somente leitura)
+    """
+    list_display = ('titulo', 'usuario', 'tipo', 'lida', 'criada_em', 'arquivada_em')
+    list_filter = ('tipo', 'lida')
+    search_fields = ('titulo', 'usuario__email')
+    list_select_related = ('usuario',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    """
+    Admin para a caixa de saída de mensagens (somente leitura, enviada pelo comando enviar_mensagens)
+    """
+    list_display = ('telefone', 'usuario', 'modelo', 'situacao', 'tentativas', 'criada_em', 'enviada_em')
+    list_filter = ('situacao', 'modelo', 'canal')
+    search_fields = ('telefone', 'usuario__email', 'referencia')
+    list_select_related = ('usuario',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    """
+    Admin para os arquivos de mídia e suas referências (somente leitura, mantido pelos sinais)
+    """
+    list_display = ('nome', 'referencias', 'tamanho', 'criado_em')
+    list_filter = ('referencias',)
+    search_fields = ('nome',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    """
+    Admin para campanhas de marketing (envio pela ação ou pelo comando enviar_campanha)
+    """
+    list_display = ('titulo', 'situacao', 'enviados', 'total_destinatarios', 'progresso', 'criada_em', 'concluida_em')
+    list_filter = ('situacao',)
+    search_fields = ('titulo',)
+    readonly_fields = ('situacao', 'criada_por', 'total_destinatarios', 'enviados', 'ultimo_usuario_id', 'iniciada_em', 'concluida_em')
+    actions = ['enviar_campanhas']
+    
+    def save_model(self, request, obj, form, change):
+        if not obj.criada_por_id:
+            obj.criada_por = request.user
+        super().save_model(request, obj, form, change)
+    
+    def enviar_campanhas(self, request, queryset):
+        from .campaigns import enviar_campanha
+        for campanha in queryset.exclude(situacao='sent'):
+            campanha = enviar_campanha(campanha.id)
+            self.message_user(request, f"{campanha.titulo}: {campanha.enviados} notificações enviadas")
+    enviar_campanhas.short_description = "Enviar (ou retomar) as campanhas selecionadas"
+
+
 # Customiza o AdminSite para adicionar URLs personalizadas
 class AutoV7AdminSite(admin.AdminSite):
     site_header = "AutoV7 - Administração"
@@ -414,8 +528,14 @@ admin_site = AutoV7AdminSite(name='autov7_admin')
 # Re-registra todos os modelos no site customizado
 admin_site.register(User, UserAdmin)
 admin_site.register(Notification, NotificationAdmin)
+admin_site.register(NotificationArchive, NotificationArchiveAdmin)
+admin_site.register(Campaign, CampaignAdmin)
+admin_site.register(OutboundMessage, OutboundMessageAdmin)
+admin_site.register(MediaBlob, MediaBlobAdmin)
 admin_site.register(GalleryImage, GalleryImageAdmin)
 admin_site.register(ServiceImage, ServiceImageAdmin)
 admin_site.register(HeroImage, HeroImageAdmin)
 admin_site.register(HeroBackground, HeroBackgroundAdmin)
 admin_site.register(ServiceIcon, ServiceIconAdmin)
+admin_site.register(CustomerSegment, CustomerSegmentAdmin)
+admin_site.register(CohortRetention, CohortRetentionAdmin)
@@ -40,4 +40,13 @@ urlpatterns = [
     path('api/dashboard-stats/', admin_new_views.dashboard_stats_api, name='dashboard_stats'),
     path('api/clientes/', admin_new_views.clientes_api, name='clientes_api'),
     path('api/agendamentos/', admin_new_views.agendamentos_api, name='agendamentos_api'),
+    path('api/estoque/projecao/', admin_new_views.api_estoque_projecao, name='estoque_projecao'),
+    path('api/estoque/valor-historico/', admin_new_views.api_estoque_valor_historico, name='estoque_valor_historico'),
+    path('api/analitico/', admin_new_views.api_analitico, name='analitico'),
+    path('api/presenca/', admin_new_views.api_presenca, name='presenca'),
+    path('api/notifications/', admin_new_views.api_notificacoes, name='notificacoes'),
+    path('api/notifications/lidas/', admin_new_views.api_notificacoes_marcar_lidas, name='notificacoes_lidas'),
+    path('api/websocket/filas/', admin_new_views.api_websocket_filas, name='websocket_filas'),
+    path('api/relatorios/', admin_new_views.api_relatorios, name='relatorios_api'),
+    path('api/compras/<int:pedido_id>/receber/', admin_new_views.api_receber_pedido, name='receber_pedido'),
 ]
\ No newline at end of file
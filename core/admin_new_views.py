@@ -25,9 +25,29 @@ def is_admin_user(user):
 @user_passes_test(is_admin_user)
 def admin_dashboard(request):
     """Dashboard principal do administrador"""
+    from appointments.models import OccupancyHeatmap
+    from appointments.heatmap import faixas_exibicao
+    
+    # Mapa de ocupação pré-calculado (comando gerar_mapa_ocupacao)
+    trimestres = list(OccupancyHeatmap.objects.values_list('ano', 'trimestre'))
+    mapa = None
+    selecionado = request.GET.get('trimestre', '')
+    if selecionado:
+        try:
+            ano, trimestre = (int(parte) for parte in selecionado.split('-'))
+            mapa = OccupancyHeatmap.objects.filter(ano=ano, trimestre=trimestre).first()
+        except ValueError:
+            pass
+    if mapa is None:
+        mapa = OccupancyHeatmap.objects.first()
+    
     context = {
         'page_title': 'Dashboard Administrativo',
-        'active_page': 'dashboard'
+        'active_page': 'dashboard',
+        'mapa_ocupacao': mapa,
+        'mapa_ocupacao_faixas': faixas_exibicao(mapa) if mapa else None,
+        'trimestres_ocupacao': [f'{ano}-{trimestre}' for ano, trimestre in trimestres],
+        'trimestre_ocupacao_selecionado': f'{mapa.ano}-{mapa.trimestre}' if mapa else '',
     }
     return render(request, 'admin_new/dashboard.html', context)
 
@@ -35,10 +55,14 @@ def admin_dashboard(request):
 @user_passes_test(is_admin_user)
 def clientes_view(request):
     """View para listagem de clientes em cards"""
+    from .models import CustomerSegment
+    
     search_query = request.GET.get('search', '')
+    segmento = request.GET.get('segmento', '')
+    apenas_marketing = request.GET.get('marketing') == '1'
     
     # Buscar apenas clientes
-    clientes = User.objects.filter(funcao='client').prefetch_related('vehicles').order_by('-criado_em')
+    clientes = User.objects.filter(funcao='client').select_related('segmento').prefetch_related('vehicles').order_by('-criado_em')
     if search_query:
         clientes = clientes.filter(
             Q(username__icontains=search_query) |
@@ -46,6 +70,13 @@ def clientes_view(request):
             Q(last_name__icontains=search_query) |
             Q(email__icontains=search_query)
         )
+    # Segmento RFM pré-calculado (comando calcular_segmentos)
+    if segmento in dict(CustomerSegment.SEGMENT_CHOICES):
+        clientes = clientes.filter(segmento__segmento=segmento)
+    else:
+        segmento = ''
+    if apenas_marketing:
+        clientes = clientes.filter(aceita_marketing=True)
     
     # Paginação
     paginator = Paginator(clientes, 20)
@@ -57,6 +88,9 @@ def clientes_view(request):
         'active_page': 'clientes',
         'items': page_obj,
         'search_query': search_query,
+        'segmento_selecionado': segmento,
+        'apenas_marketing': apenas_marketing,
+        'segmentos': CustomerSegment.SEGMENT_CHOICES,
         'total_clientes': clientes.count(),
     }
     return render(request, 'admin_new/clientes.html', context)
@@ -158,7 +192,7 @@ def agendamentos_view(request):
 def alterar_status_agendamento(request, id):
     """API para alterar status de agendamento"""
     if request.method == 'POST':
-        agendamento = get_object_or_404(Appointment, id=id)
+        agendamento = get_object_or_404(Appointment.objects.select_related('usuario', 'veiculo'), id=id)
         data = json.loads(request.body)
         novo_status = data.get('status')
         status_anterior = agendamento.situacao
@@ -196,74 +230,18 @@ def alterar_status_agendamento(request, id):
                 message=status_messages.get(novo_status, 'Status do agendamento atualizado')
             )
             
-            # ============ WHATSAPP REDIRECT ============
+            # ============ WHATSAPP (CAIXA DE SAÍDA) ============
+            # A mensagem é enfileirada e assumida pelo atendente, que a envia
+            # na hora pelo link wa.me; assumida, ela não sai de novo pelo backend
+            from core.messaging import MODELOS_POR_SITUACAO, assumir_envio_manual, enfileirar_mudanca_situacao
+            
             whatsapp_url = None
             cliente_sem_telefone = False
-            
-            # Enviar WhatsApp para status concluído ou cancelado
-            if novo_status in ['completed', 'cancelled']:
-                # Debug log
-                status_label = 'concluído' if novo_status == 'completed' else 'cancelado'
-                print(f"[DEBUG WhatsApp] Agendamento #{agendamento.id} marcado como {status_label}")
-                print(f"[DEBUG WhatsApp] Cliente: {agendamento.usuario.username} ({agendamento.usuario.email})")
-                
-                # Obter telefone do cliente
-                telefone = agendamento.usuario.telefone
-                print(f"[DEBUG WhatsApp] Telefone original: {telefone}")
-                
-                if telefone and telefone.strip():
-                    # Limpar telefone (remover caracteres especiais)
-                    import re
-                    telefone_limpo = re.sub(r'\D', '', telefone)
-                    print(f"[DEBUG WhatsApp] Telefone limpo: {telefone_limpo}")
-                    
-                    # Validar se tem pelo menos 10 dígitos
-                    if len(telefone_limpo) >= 10:
-                        # Adicionar código do Brasil se necessário
-                        if len(telefone_limpo) == 11 and not telefone_limpo.startswith('55'):
-                            telefone_limpo = '55' + telefone_limpo
-                        elif len(telefone_limpo) == 10 and not telefone_limpo.startswith('55'):
-                            telefone_limpo = '55' + telefone_limpo
-                        
-                        print(f"[DEBUG WhatsApp] Telefone formatado: {telefone_limpo}")
-                        
-                        # Criar mensagem personalizada baseada no status
-                        cliente_nome = agendamento.usuario.first_name or 'Cliente'
-                        veiculo_info = f"{agendamento.veiculo.marca} {agendamento.veiculo.modelo}"
-                        placa = agendamento.veiculo.placa if hasattr(agendamento.veiculo, 'placa') else ''
-                        data_agendamento = agendamento.data_agendamento.strftime('%d/%m/%Y')
-                        horario_agendamento = agendamento.horario_agendamento.strftime('%H:%M')
-                        
-                        if novo_status == 'completed':
-                            # Mensagem para serviço concluído
-                            mensagem = f"Olá {cliente_nome}! 🚗✨\n\nSeu *{veiculo_info}*"
-                            if placa:
-                                mensagem += f" (placa: {placa})"
-                            mensagem += " está pronto! O serviço foi concluído com sucesso.\n\n"
-                            mensagem += "Você já pode retirar seu veículo. Obrigado pela preferência! 😊"
-                        else:
-                            # Mensagem para agendamento cancelado
-                            mensagem = f"Olá {cliente_nome}! ⚠️\n\n"
-                            mensagem += f"Informamos que seu agendamento para o dia *{data_agendamento}* às *{horario_agendamento}* foi cancelado.\n\n"
-                            mensagem += f"🚗 Veículo: *{veiculo_info}*"
-                            if placa:
-                                mensagem += f" (placa: {placa})"
-                            mensagem += "\n\n"
-                            mensagem += "Se desejar reagendar, entre em contato conosco. Estamos à disposição! 📞"
-                        
-                        print(f"[DEBUG WhatsApp] Mensagem criada: {mensagem[:50]}...")
-                        
-                        # Criar URL do WhatsApp
-                        import urllib.parse
-                        mensagem_encoded = urllib.parse.quote(mensagem)
-                        whatsapp_url = f"https://wa.me/{telefone_limpo}?text={mensagem_encoded}"
-                        
-                        print(f"[DEBUG WhatsApp] URL gerada: {whatsapp_url[:80]}...")
-                    else:
-                        print(f"[DEBUG WhatsApp] Telefone inválido - menos de 10 dígitos")
-                        cliente_sem_telefone = True
+            if novo_status in MODELOS_POR_SITUACAO and novo_status != status_anterior:
+                mensagem = enfileirar_mudanca_situacao(agendamento)
+                if mensagem is not None:
+                    whatsapp_url = assumir_envio_manual(mensagem)
                 else:
-                    print(f"[DEBUG WhatsApp] Cliente sem telefone cadastrado")
                     cliente_sem_telefone = True
             
             response_data = {
@@ -419,11 +397,18 @@ def estoque_view(request):
     # Categorias para select
     categorias = ProductCategory.objects.all().order_by('nome')
     
+    # Rupturas previstas pela agenda dos próximos 30 dias
+    from inventory.projections import calcular_projecao_estoque
+    projecao = calcular_projecao_estoque()
+    rupturas_previstas = projecao['rupturas']
+    
     context = {
         'page_title': 'Gestão de Estoque',
         'active_page': 'estoque',
         'produtos': produtos,
         'categorias': categorias,
+        'rupturas_previstas': rupturas_previstas,
+        'ids_ruptura_prevista': {item['id'] for item in rupturas_previstas},
         'estatisticas': {
             'total_produtos': total_produtos,
             'produtos_falta': produtos_falta,
@@ -616,10 +601,42 @@ def criar_produto_view(request):
 @login_required
 @user_passes_test(is_admin_user)
 def relatorios_view(request):
-    """View para relatórios"""
+    """View para relatórios (métricas lidas das agregações diárias)"""
+    from datetime import datetime
+    from django.db.models import Avg
+    from appointments.models import AppointmentReview, AppointmentDailyRollup
+    from appointments.rollups import resumo_periodo
+    from .models import CohortRetention
+    
+    hoje = timezone.localdate()
+    try:
+        inicio = datetime.strptime(request.GET['inicio'], '%Y-%m-%d').date() if request.GET.get('inicio') else hoje.replace(day=1)
+        fim = datetime.strptime(request.GET['fim'], '%Y-%m-%d').date() if request.GET.get('fim') else hoje
+    except ValueError:
+        messages.error(request, 'Período inválido, exibindo o mês atual.')
+        inicio, fim = hoje.replace(day=1), hoje
+    
+    servicos_mais_solicitados = list(
+        AppointmentDailyRollup.objects.filter(dimensao='servico', data__range=(inicio, fim))
+        .values('chave', 'rotulo')
+        .annotate(agendamentos=Sum('agendamentos'), receita=Sum('receita'))
+        .order_by('-agendamentos')[:10]
+    )
+    
     context = {
         'page_title': 'Relatórios',
-        'active_page': 'relatorios'
+        'active_page': 'relatorios',
+        'inicio': inicio,
+        'fim': fim,
+        'resumo': resumo_periodo(inicio, fim),
+        'novos_clientes': User.objects.filter(
+            funcao='client', date_joined__date__range=(inicio, fim)
+        ).count(),
+        'satisfacao_media': AppointmentReview.objects.filter(
+            agendamento__data_agendamento__range=(inicio, fim)
+        ).aggregate(media=Avg('avaliacao'))['media'],
+        'servicos_mais_solicitados': servicos_mais_solicitados,
+        'coortes': CohortRetention.objects.all()[:12],
     }
     return render(request, 'admin_new/relatorios.html', context)
 
@@ -889,6 +906,267 @@ def api_estoque_movimentacao(request):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_estoque_projecao(request):
+    """Retorna o saldo projetado de cada produto para a janela de agendamento"""
+    from inventory.projections import calcular_projecao_estoque, JANELA_PROJECAO_DIAS
+    
+    try:
+        dias = min(max(int(request.GET.get('dias', JANELA_PROJECAO_DIAS)), 1), JANELA_PROJECAO_DIAS)
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetro "dias" inválido'}, status=400)
+    
+    return JsonResponse(calcular_projecao_estoque(dias=dias))
+
+
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_estoque_valor_historico(request):
+    """
+    Valor do estoque no fechamento de cada mês (lê apenas os snapshots diários)
+    
+    Parâmetros: inicio=YYYY-MM, fim=YYYY-MM (padrão: últimos 12 meses)
+    """
+    from datetime import datetime, date
+    from inventory.snapshots import valor_estoque_fim_de_mes
+    
+    hoje = timezone.localdate()
+    try:
+        if request.GET.get('inicio'):
+            inicio = datetime.strptime(request.GET['inicio'], '%Y-%m').date()
+        else:
+            inicio = date(hoje.year - 1, hoje.month, 1)
+        fim = datetime.strptime(request.GET['fim'], '%Y-%m').date() if request.GET.get('fim') else hoje
+    except ValueError:
+        return JsonResponse({'error': 'Use o formato YYYY-MM'}, status=400)
+    
+    meses = valor_estoque_fim_de_mes(inicio, fim)
+    return JsonResponse({
+        'meses': [
+            {
+                'data': item['data'].isoformat(),
+                'valor': float(item['valor']),
+                'quantidade': item['quantidade'],
+                'itens_sem_custo': item['sem_custo'],
+            }
+            for item in meses
+        ]
+    })
+
+
+@login_required
+@user_passes_test(is_admin_user)
+def api_relatorios(request):
+    """
+    Receita e volume de agendamentos lidos das métricas diárias pré-agregadas
+    
+    Parâmetros: inicio/fim=YYYY-MM-DD (padrão: últimos 12 meses),
+    dimensao=total|servico|categoria|veiculo, granularidade=dia|mes
+    """
+    from datetime import datetime, date
+    from appointments.models import AppointmentDailyRollup
+    from appointments.rollups import resumo_periodo, serie_periodo
+    
+    hoje = timezone.localdate()
+    try:
+        if request.GET.get('inicio'):
+            inicio = datetime.strptime(request.GET['inicio'], '%Y-%m-%d').date()
+        else:
+            inicio = date(hoje.year - 1, hoje.month, 1)
+        fim = datetime.strptime(request.GET['fim'], '%Y-%m-%d').date() if request.GET.get('fim') else hoje
+    except ValueError:
+        return JsonResponse({'error': 'Use o formato YYYY-MM-DD'}, status=400)
+    
+    dimensao = request.GET.get('dimensao', 'total')
+    if dimensao not in dict(AppointmentDailyRollup.DIMENSION_CHOICES):
+        return JsonResponse({'error': 'Dimensão inválida'}, status=400)
+    granularidade = request.GET.get('granularidade', 'mes')
+    if granularidade not in ('dia', 'mes'):
+        return JsonResponse({'error': 'Granularidade inválida'}, status=400)
+    
+    resumo = resumo_periodo(inicio, fim)
+    serie = serie_periodo(inicio, fim, dimensao=dimensao, granularidade=granularidade)
+    return JsonResponse({
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'dimensao': dimensao,
+        'granularidade': granularidade,
+        'resumo': {**resumo, 'receita': float(resumo['receita']), 'ticket_medio': float(resumo['ticket_medio'])},
+        'serie': [
+            {
+                'periodo': item['periodo'].isoformat(),
+                'chave': item['chave'],
+                'rotulo': item['rotulo'],
+                'agendamentos': item['agendamentos'],
+                'concluidos': item['concluidos'],
+                'cancelamentos': item['cancelamentos'],
+                'receita': float(item['receita']),
+            }
+            for item in serie
+        ],
+    })
+
+
+@login_required
+@user_passes_test(is_admin_user)
+def api_analitico(request):
+    """
+    Séries analíticas de receita e ocupação para os gráficos do painel (uma chamada)
+    
+    Parâmetros: granularidade=dia|semana|mes, inicio/fim=YYYY-MM-DD (padrão conforme a granularidade)
+    """
+    from datetime import datetime
+    from appointments.analytics import GRANULARIDADES, calcular_analitico, periodo_padrao
+    
+    granularidade = request.GET.get('granularidade', 'dia')
+    if granularidade not in GRANULARIDADES:
+        return JsonResponse({'error': 'Granularidade inválida'}, status=400)
+    
+    inicio, fim = periodo_padrao(granularidade)
+    try:
+        if request.GET.get('inicio'):
+            inicio = datetime.strptime(request.GET['inicio'], '%Y-%m-%d').date()
+        if request.GET.get('fim'):
+            fim = datetime.strptime(request.GET['fim'], '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Use o formato YYYY-MM-DD'}, status=400)
+    if inicio > fim or (fim - inicio).days > 366 * 3:
+        return JsonResponse({'error': 'Período inválido (máximo de 3 anos)'}, status=400)
+    
+    return JsonResponse(calcular_analitico(inicio, fim, granularidade))
+
+
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_websocket_filas(request):
+    """Profundidade das filas de saída WebSocket deste processo e eventos coalescidos/descartados"""
+    from .websocket_backpressure import metricas_filas
+    
+    return JsonResponse(metricas_filas())
+
+
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_presenca(request):
+    """Usuários conectados agora via WebSocket (registro de presença em cache)"""
+    from datetime import datetime
+    from .presence import usuarios_online
+    
+    online = usuarios_online(request.GET.get('funcao') or None)
+    nomes = {
+        usuario_id: f'{first_name} {last_name}'.strip() or email
+        for usuario_id, first_name, last_name, email in User.objects.filter(id__in=online).values_list(
+            'id', 'first_name', 'last_name', 'email'
+        )
+    }
+    usuarios = [
+        {
+            'id': usuario_id,
+            'nome': nomes.get(usuario_id, ''),
+            'funcao': dados['funcao'],
+            'conexoes': dados['conexoes'],
+            'online_desde': datetime.fromtimestamp(dados['desde'], tz=timezone.get_current_timezone()).strftime('%H:%M'),
+        }
+        for usuario_id, dados in sorted(online.items(), key=lambda item: item[1]['desde'])
+        if usuario_id in nomes
+    ]
+    return JsonResponse({'total': len(usuarios), 'usuarios': usuarios})
+
+
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_notificacoes(request):
+    """
+    Caixa de entrada do usuário logado
+    
+    ?since=<id> devolve só as criadas depois desse id (polling); sem ele, uma página
+    por chave (?cursor=, ?nao_lidas=1, ?limite=). 'unread' vem do contador do usuário.
+    """
+    from .notifications import (
+        nao_lidas, notificacoes_desde, pagina_caixa, serializar_notificacao, tamanho_pagina,
+    )
+    
+    limite = tamanho_pagina(request.GET.get('limite'))
+    proximo = None
+    if request.GET.get('since') not in (None, ''):
+        try:
+            desde_id = int(request.GET['since'])
+        except ValueError:
+            return JsonResponse({'error': 'since inválido'}, status=400)
+        notificacoes = notificacoes_desde(request.user.pk, desde_id, limite)
+        ultimo_id = notificacoes[-1].id if notificacoes else desde_id
+    else:
+        notificacoes, proximo = pagina_caixa(
+            request.user.pk,
+            cursor=request.GET.get('cursor'),
+            apenas_nao_lidas=request.GET.get('nao_lidas') == '1',
+            limite=limite,
+        )
+        ultimo_id = max((notificacao.id for notificacao in notificacoes), default=0)
+    
+    return JsonResponse({
+        'notifications': [serializar_notificacao(notificacao) for notificacao in notificacoes],
+        'last_id': ultimo_id,
+        'next_cursor': proximo,
+        'unread': nao_lidas(request.user.pk),
+    })
+
+
+@require_http_methods(["POST"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_notificacoes_marcar_lidas(request):
+    """Marca como lidas as notificações informadas ({"ids": [...]}) ou, sem ids, todas"""
+    from .notifications import marcar_lidas, nao_lidas
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        ids = data.get('ids')
+        ids = None if ids is None else [int(notificacao_id) for notificacao_id in ids]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Dados inválidos'}, status=400)
+    
+    alteradas = marcar_lidas(request.user.pk, ids)
+    return JsonResponse({'success': True, 'marcadas': alteradas, 'unread': nao_lidas(request.user.pk)})
+
+
+@require_http_methods(["POST"])
+@login_required
+@user_passes_test(is_admin_user)
+def api_receber_pedido(request, pedido_id):
+    """
+    Recebe itens de uma ordem de compra
+    
+    Corpo JSON opcional: {"itens": {"<item_id>": quantidade}}. Sem itens, recebe o saldo pendente.
+    """
+    from inventory.models import PurchaseOrder
+    from django.core.exceptions import ValidationError
+    
+    pedido = get_object_or_404(PurchaseOrder, pk=pedido_id)
+    try:
+        data = json.loads(request.body) if request.body else {}
+        if not isinstance(data, dict) or not isinstance(data.get('itens', {}), (dict, type(None))):
+            raise ValueError('itens deve ser um objeto {item_id: quantidade}')
+        movimentos = pedido.receber(data.get('itens'), usuario=request.user)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Dados inválidos'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    return JsonResponse({
+        'message': f'{len(movimentos)} itens recebidos com sucesso!',
+        'situacao': pedido.situacao,
+        'valor_total': float(pedido.valor_total),
+        'recebido_em': pedido.recebido_em.isoformat() if pedido.recebido_em else None,
+    })
+
+
 @require_http_methods(["GET"])
 @login_required
 @user_passes_test(is_admin_user)
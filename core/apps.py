@@ -5,3 +5,8 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Sistema Principal'
+    
+    def ready(self):
+        # Registra os sinais (não lidas, variantes de imagem e referências de mídia)
+        # e as verificações de configuração
+        from . import checks, signals  # noqa: F401
@@ -224,10 +224,10 @@ def create_welcome_notification(user):
     Cria notificação de boas-vindas
     """
     Notification.objects.create(
-        user=user,
-        title="Bem-vindo ao AutoV7!",
-        message=f"Olá {user.first_name}! Sua conta foi criada com sucesso. Agora você pode agendar serviços, gerenciar seus veículos e muito mais.",
-        type='system'
+        usuario=user,
+        titulo="Bem-vindo ao AutoV7!",
+        mensagem=f"Olá {user.first_name}! Sua conta foi criada com sucesso. Agora você pode agendar serviços, gerenciar seus veículos e muito mais.",
+        tipo='system'
     )
 
 
@@ -0,0 +1,112 @@
+"""
+Envio de campanhas de marketing
+
+Os destinatários (clientes ativos que aceitam marketing) são lidos pelo
+índice parcial core_user_marketing_idx, em lotes ordenados por id a partir do
+último processado. Cada lote é uma transação: um bulk_create das
+notificações, um único UPDATE somando 1 ao contador de não lidas de todos os
+destinatários do lote e o avanço de Campaign.ultimo_usuario_id. Se o envio
+parar no meio, o próximo continua do lote seguinte, sem repetir nem pular
+ninguém.
+
+O evento WebSocket da campanha é serializado uma vez e enviado, após o commit
+de cada lote, só aos clientes que estão online no registro de presença; os
+demais veem a notificação na caixa de entrada. O evento não entra no log de
+reenvio (a notificação já fica salva).
+"""
+
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Campaign, Notification, User
+from .notifications import incrementar_nao_lidas
+from .presence import conectados
+from .websocket_dispatcher import enviar_evento
+from .websocket_events import envelope_texto, serializar_evento
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+
+
+def destinatarios():
+    """Clientes que recebem campanhas (mesma condição do índice parcial de User)"""
+    return User.objects.filter(funcao='client', aceita_marketing=True, ativo=True, is_active=True)
+
+
+def _enviar_lote(campanha_id, texto, tamanho_lote):
+    """Grava as notificações do próximo lote; retorna (campanha, quantidade)"""
+    with transaction.atomic():
+        campanha = Campaign.objects.select_for_update().get(pk=campanha_id)
+        ids = list(
+            destinatarios().filter(id__gt=campanha.ultimo_usuario_id)
+            .order_by('id').values_list('id', flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            return campanha, 0
+
+        agora = timezone.now()
+        Notification.objects.bulk_create([
+            Notification(
+                usuario_id=usuario_id,
+                titulo=campanha.titulo,
+                mensagem=campanha.mensagem,
+                tipo='promotion',
+                criada_em=agora,
+            )
+            for usuario_id in ids
+        ])
+        incrementar_nao_lidas(dict.fromkeys(ids, 1))
+        Campaign.objects.filter(pk=campanha_id).update(
+            ultimo_usuario_id=ids[-1],
+            enviados=F('enviados') + len(ids),
+        )
+
+        mensagem = envelope_texto(texto)
+        for usuario_id in conectados(ids):
+            enviar_evento(f'client_{usuario_id}', mensagem)
+    return campanha, len(ids)
+
+
+def enviar_campanha(campanha_id, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Envia (ou retoma) a campanha até o último destinatário
+
+    progresso(enviados, total, duracao_lote) é chamado após cada lote.
+    Retorna a campanha atualizada.
+    """
+    with transaction.atomic():
+        campanha = Campaign.objects.select_for_update().get(pk=campanha_id)
+        if campanha.situacao == 'sent':
+            return campanha
+        if campanha.situacao == 'draft':
+            campanha.situacao = 'sending'
+            campanha.iniciada_em = timezone.now()
+        # Destinatários ainda não processados somados aos já enviados (novos opt-ins entram)
+        campanha.total_destinatarios = campanha.enviados + destinatarios().filter(
+            id__gt=campanha.ultimo_usuario_id
+        ).count()
+        campanha.save(update_fields=['situacao', 'iniciada_em', 'total_destinatarios'])
+
+    texto = serializar_evento('campaign', {
+        'campaign_id': campanha.id,
+        'title': campanha.titulo,
+        'message': campanha.mensagem,
+    })
+
+    while True:
+        inicio = time.monotonic()
+        campanha, quantidade = _enviar_lote(campanha_id, texto, tamanho_lote)
+        if not quantidade:
+            break
+        if progresso is not None:
+            progresso(campanha.enviados + quantidade, campanha.total_destinatarios, time.monotonic() - inicio)
+
+    Campaign.objects.filter(pk=campanha_id).update(situacao='sent', concluida_em=timezone.now())
+    campanha.refresh_from_db()
+    logger.info('Campanha %s enviada a %s clientes', campanha.id, campanha.enviados)
+    return campanha
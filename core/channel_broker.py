@@ -0,0 +1,200 @@
+"""
+Broker local do channel layer sobre socket Unix
+
+Alternativa ao Redis para rodar vários workers daphne na mesma máquina: um
+processo broker (comando channel_broker) guarda os grupos e as filas dos
+canais, e cada worker conversa com ele por um socket Unix usando
+UnixSocketChannelLayer (core/channel_layers.py).
+
+Protocolo: quadros com 4 bytes de tamanho (big-endian) seguidos de um objeto
+JSON. O worker envia operações ('send', 'group_add', 'group_discard',
+'group_send', 'subscribe', 'unsubscribe', 'flush') sem esperar resposta; o
+broker empurra ao worker as mensagens dos canais que ele assinou. Mensagens
+de canais sem assinante ficam na fila do canal até expirar.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CABECALHO = struct.Struct('!I')
+
+# Quadros maiores que isso derrubam a conexão (proteção contra lixo no socket)
+TAMANHO_MAXIMO_QUADRO = 16 * 1024 * 1024
+
+# Bytes pendentes de escrita para um worker acima dos quais novas mensagens são descartadas
+LIMITE_BUFFER_ESCRITA = 8 * 1024 * 1024
+
+# Intervalo (s) da limpeza de mensagens e participações em grupos expiradas
+INTERVALO_LIMPEZA = 10
+
+
+def codificar_quadro(dados):
+    corpo = json.dumps(dados, separators=(',', ':')).encode()
+    return CABECALHO.pack(len(corpo)) + corpo
+
+
+def _quadro_mensagem(canal, mensagem_json):
+    """Quadro 'message' montado a partir da mensagem já serializada (sem reserializar por canal)"""
+    corpo = b'{"op":"message","channel":' + json.dumps(canal).encode() + b',"message":' + mensagem_json + b'}'
+    return CABECALHO.pack(len(corpo)) + corpo
+
+
+async def ler_quadro(reader):
+    """Lê um quadro do stream; levanta IncompleteReadError quando a conexão fecha"""
+    (tamanho,) = CABECALHO.unpack(await reader.readexactly(CABECALHO.size))
+    if tamanho > TAMANHO_MAXIMO_QUADRO:
+        raise ValueError(f'Quadro de {tamanho} bytes excede o limite')
+    return json.loads(await reader.readexactly(tamanho))
+
+
+class ChannelBroker:
+    """
+    Estado compartilhado do channel layer: grupos, filas e assinaturas de canais
+    """
+
+    def __init__(self, caminho, expiry=60, group_expiry=86400, capacity=100):
+        self.caminho = caminho
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+        self.capacity = capacity
+        self.grupos = {}        # grupo -> {canal: expira_em}
+        self.filas = {}         # canal -> deque[(expira_em, mensagem_json)]
+        self.assinantes = {}    # canal -> writer do worker que recebe o canal
+        self.entregues = 0
+        self.descartados = 0
+        self._servidor = None
+
+    async def iniciar(self):
+        """Abre o socket Unix (recusa se outro broker já estiver atendendo no caminho)"""
+        if os.path.exists(self.caminho):
+            if socket_ativo(self.caminho):
+                raise RuntimeError(f'Já existe um broker ativo em {self.caminho}')
+            os.unlink(self.caminho)
+
+        self._servidor = await asyncio.start_unix_server(self._atender, path=self.caminho)
+        os.chmod(self.caminho, 0o600)
+        asyncio.get_running_loop().create_task(self._limpar_periodicamente())
+        logger.info('Broker do channel layer ouvindo em %s', self.caminho)
+
+    async def servir(self):
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                self._processar(await ler_quadro(reader), writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, KeyError, TypeError) as erro:
+            logger.warning('Conexão com worker encerrada por quadro inválido: %s', erro)
+        finally:
+            for canal in [canal for canal, dono in self.assinantes.items() if dono is writer]:
+                del self.assinantes[canal]
+            writer.close()
+
+    def _processar(self, quadro, writer):
+        op = quadro['op']
+        agora = time.monotonic()
+
+        if op == 'send':
+            self._entregar(quadro['channel'], json.dumps(quadro['message']).encode(), agora)
+
+        elif op == 'group_send':
+            membros = self.grupos.get(quadro['group'])
+            if membros:
+                mensagem_json = json.dumps(quadro['message']).encode()  # uma vez para todo o grupo
+                for canal, expira_em in list(membros.items()):
+                    if expira_em < agora:
+                        del membros[canal]
+                    else:
+                        self._entregar(canal, mensagem_json, agora)
+
+        elif op == 'group_add':
+            self.grupos.setdefault(quadro['group'], {})[quadro['channel']] = agora + self.group_expiry
+
+        elif op == 'group_discard':
+            membros = self.grupos.get(quadro['group'])
+            if membros is not None:
+                membros.pop(quadro['channel'], None)
+                if not membros:
+                    del self.grupos[quadro['group']]
+
+        elif op == 'subscribe':
+            canal = quadro['channel']
+            self.assinantes[canal] = writer
+            for expira_em, mensagem_json in self.filas.pop(canal, ()):
+                if expira_em >= agora:
+                    self._escrever(writer, canal, mensagem_json)
+
+        elif op == 'unsubscribe':
+            if self.assinantes.get(quadro['channel']) is writer:
+                del self.assinantes[quadro['channel']]
+
+        elif op == 'flush':
+            self.grupos.clear()
+            self.filas.clear()
+
+        else:
+            raise ValueError(f'Operação desconhecida: {op}')
+
+    def _entregar(self, canal, mensagem_json, agora):
+        writer = self.assinantes.get(canal)
+        if writer is not None and not writer.is_closing():
+            self._escrever(writer, canal, mensagem_json)
+            return
+
+        fila = self.filas.setdefault(canal, deque())
+        while fila and fila[0][0] < agora:
+            fila.popleft()
+        if len(fila) >= self.capacity:
+            self.descartados += 1
+            return
+        fila.append((agora + self.expiry, mensagem_json))
+
+    def _escrever(self, writer, canal, mensagem_json):
+        if writer.transport.get_write_buffer_size() > LIMITE_BUFFER_ESCRITA:
+            self.descartados += 1
+            return
+        writer.write(_quadro_mensagem(canal, mensagem_json))
+        self.entregues += 1
+
+    async def _limpar_periodicamente(self):
+        while True:
+            await asyncio.sleep(INTERVALO_LIMPEZA)
+            self.limpar_expirados(time.monotonic())
+
+    def limpar_expirados(self, agora):
+        for canal in list(self.filas):
+            fila = self.filas[canal]
+            while fila and fila[0][0] < agora:
+                fila.popleft()
+            if not fila:
+                del self.filas[canal]
+        for grupo in list(self.grupos):
+            membros = self.grupos[grupo]
+            for canal in [canal for canal, expira_em in membros.items() if expira_em < agora]:
+                del membros[canal]
+            if not membros:
+                del self.grupos[grupo]
+
+
+def socket_ativo(caminho):
+    """Indica se há um processo aceitando conexões no socket Unix"""
+    cliente = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        cliente.connect(caminho)
+        return True
+    except OSError:
+        return False
+    finally:
+        cliente.close()
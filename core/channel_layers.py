@@ -0,0 +1,162 @@
+"""
+Channel layer multi-processo sem Redis
+
+UnixSocketChannelLayer fala com o broker local (core/channel_broker.py,
+comando channel_broker) por um socket Unix, permitindo vários workers daphne
+na mesma máquina com group_add, group_send e expiração compartilhados.
+
+Cada event loop do processo mantém sua própria conexão com o broker. Envios
+não esperam resposta; o broker empurra as mensagens dos canais que o worker
+assinou ao chamar receive(). Se a conexão cair, os receive() pendentes
+levantam ConnectionError (o consumer encerra e o navegador reconecta) e o
+próximo envio abre uma conexão nova. As mensagens precisam ser serializáveis
+em JSON, como todos os eventos do sistema.
+"""
+
+import asyncio
+import uuid
+
+from channels.layers import BaseChannelLayer
+
+from .channel_broker import codificar_quadro, ler_quadro
+
+CAMINHO_PADRAO = '/tmp/autov7-channels.sock'
+
+
+class _ConexaoPerdida:
+    """Sentinela colocada nas filas locais quando a conexão com o broker cai"""
+
+
+class _ConexaoBroker:
+    """Conexão de um event loop com o broker e as filas locais dos canais assinados"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.filas = {}
+        self.ativa = True
+        self.leitor = asyncio.get_running_loop().create_task(self._ler())
+
+    def enviar(self, dados):
+        if not self.ativa:
+            raise ConnectionError('Conexão com o broker do channel layer perdida')
+        self.writer.write(codificar_quadro(dados))
+
+    async def _ler(self):
+        try:
+            while True:
+                quadro = await ler_quadro(self.reader)
+                fila = self.filas.get(quadro['channel'])
+                if fila is not None:
+                    fila.put_nowait(quadro['message'])
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.ativa = False
+            for fila in self.filas.values():
+                fila.put_nowait(_ConexaoPerdida)
+            self.writer.close()
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    """
+    Channel layer apoiado no broker local via socket Unix
+
+    CONFIG: path (socket do broker), expiry, group_expiry e capacity (os três
+    usados pelo comando channel_broker ao iniciar o broker).
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=CAMINHO_PADRAO, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.path = path
+        self.group_expiry = group_expiry
+        self.client_prefix = uuid.uuid4().hex
+        self._conexoes = {}
+        self._travas = {}
+
+    async def _conexao(self):
+        loop = asyncio.get_running_loop()
+        conexao = self._conexoes.get(loop)
+        if conexao is not None and conexao.ativa:
+            return conexao
+
+        trava = self._travas.setdefault(loop, asyncio.Lock())
+        async with trava:
+            conexao = self._conexoes.get(loop)
+            if conexao is None or not conexao.ativa:
+                # Esquece conexões de loops já encerrados (ex.: loops temporários de async_to_sync)
+                for encerrado in [outro for outro in self._conexoes if outro.is_closed()]:
+                    del self._conexoes[encerrado]
+                    self._travas.pop(encerrado, None)
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                conexao = self._conexoes[loop] = _ConexaoBroker(reader, writer)
+        return conexao
+
+    async def _enviar(self, dados):
+        conexao = await self._conexao()
+        conexao.enviar(dados)
+        await conexao.writer.drain()
+
+    # Canais
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        await self._enviar({'op': 'send', 'channel': channel, 'message': message})
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        conexao = await self._conexao()
+        fila = conexao.filas.get(channel)
+        if fila is None:
+            fila = conexao.filas[channel] = asyncio.Queue()
+            conexao.enviar({'op': 'subscribe', 'channel': channel})
+
+        try:
+            mensagem = await fila.get()
+        except asyncio.CancelledError:
+            # Consumer encerrado: deixa de receber o canal neste worker
+            if fila.empty() and conexao.filas.get(channel) is fila:
+                del conexao.filas[channel]
+                if conexao.ativa:
+                    conexao.enviar({'op': 'unsubscribe', 'channel': channel})
+            raise
+
+        if mensagem is _ConexaoPerdida:
+            conexao.filas.pop(channel, None)
+            raise ConnectionError('Conexão com o broker do channel layer perdida')
+        return mensagem
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}{self.client_prefix}!{uuid.uuid4().hex}'
+
+    # Grupos
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._enviar({'op': 'group_add', 'group': group, 'channel': channel})
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._enviar({'op': 'group_discard', 'group': group, 'channel': channel})
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        await self._enviar({'op': 'group_send', 'group': group, 'message': message})
+
+    # Manutenção
+
+    async def flush(self):
+        await self._enviar({'op': 'flush'})
+
+    async def close(self):
+        conexao = self._conexoes.pop(asyncio.get_running_loop(), None)
+        if conexao is not None:
+            conexao.leitor.cancel()
+            conexao.writer.close()
+
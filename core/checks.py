@@ -0,0 +1,30 @@
+"""
+Verificações de configuração (python manage.py check)
+
+core.E001: a presença WebSocket (core/presence.py) fica no cache padrão. Com
+uma camada de canais compartilhada entre processos, um cache local ao processo
+faria os comandos (enviar_lembretes, enviar_campanha) verem todos offline e
+descartarem os eventos.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def verificar_cache_presenca(app_configs, **kwargs):
+    camada = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND')
+    cache = settings.CACHES.get('default', {}).get('BACKEND')
+    if camada in (None, 'channels.layers.InMemoryChannelLayer') or cache not in CACHES_LOCAIS:
+        return []
+    return [Error(
+        'A camada de canais é compartilhada entre processos, mas o cache padrão é local ao processo.',
+        hint='Configure em CACHES um cache compartilhado (Redis, Memcached ou FileBasedCache) para o registro de presença.',
+        obj=cache,
+        id='core.E001',
+    )]
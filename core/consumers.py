@@ -4,20 +4,102 @@ WebSocket Consumers para o AutoV7
 Gerencia conexões WebSocket em tempo real para clientes e administradores
 """
 
+import asyncio
 import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 
+from .websocket_backpressure import DESCONECTAR, OutboundQueueMixin
+from .presence import registrar_conexao, remover_conexao, ttl_presenca
+from .websocket_log import eventos_desde, mensagem_resync, sequencia_atual
+from .websocket_utils import role_group_name
+
 User = get_user_model()
 
+# Confirmações de leitura são acumuladas por esta janela (s) e gravadas em um único UPDATE
+JANELA_CONFIRMACAO_LEITURA = 0.5
+
+# Acima disso as confirmações pendentes são gravadas sem esperar a janela
+MAXIMO_LEITURAS_PENDENTES = 500
+
+
+class ForwardEventMixin(OutboundQueueMixin):
+    """
+    Repassa ao navegador os eventos já serializados pelo remetente
+    
+    Os eventos chegam do channel layer no envelope {'type': 'ws.forward', 'text': ...}
+    (ver core/websocket_events.py) e são enviados sem reserialização, uma vez por conexão,
+    pela fila de saída limitada da conexão (ver core/websocket_backpressure.py).
+    """
+    
+    async def ws_forward(self, event):
+        await self.queue_outbound(event['text'], event.get('coalesce'))
+
 
-class ClientConsumer(AsyncWebsocketConsumer):
+class ResumableStreamMixin:
+    """
+    Reenvio dos eventos perdidos do grupo individual após uma reconexão
+    
+    O navegador envia {'type': 'resume', 'last_seq': N} com a última sequência
+    recebida; os eventos posteriores são reenviados do log (core/websocket_log.py)
+    ou, se já saíram do buffer, é enviado 'resync_required'.
+    """
+    
+    async def resume_stream(self, data):
+        try:
+            last_seq = int(data.get('last_seq') or 0)
+        except (TypeError, ValueError):
+            last_seq = 0
+        
+        texts, current_seq = await database_sync_to_async(eventos_desde)(self.room_group_name, last_seq)
+        if texts is None:
+            await self.send(text_data=mensagem_resync(current_seq))
+            return
+        for text in texts:
+            await self.send(text_data=text)
+
+
+class PresenceMixin:
+    """
+    Presença da conexão no registro em cache (core/presence.py)
+    
+    Registrada ao conectar, renovada por qualquer mensagem do navegador (ping,
+    ack) no máximo uma vez a cada terço do TTL e removida ao desconectar.
+    """
+    
+    def presence_groups(self):
+        return [self.room_group_name]
+    
+    async def join_presence(self, user):
+        self.presence_user = user
+        self.presence_renewed_at = asyncio.get_running_loop().time()
+        await sync_to_async(registrar_conexao)(user.id, self.presence_groups(), self.channel_name)
+    
+    async def renew_presence(self):
+        if not hasattr(self, 'presence_user'):
+            return
+        now = asyncio.get_running_loop().time()
+        if now - self.presence_renewed_at < ttl_presenca() / 3:
+            return
+        self.presence_renewed_at = now
+        await sync_to_async(registrar_conexao)(self.presence_user.id, self.presence_groups(), self.channel_name)
+    
+    async def leave_presence(self):
+        if hasattr(self, 'presence_user'):
+            await sync_to_async(remover_conexao)(self.presence_user.id, self.presence_groups(), self.channel_name)
+
+
+class ClientConsumer(PresenceMixin, ForwardEventMixin, ResumableStreamMixin, AsyncWebsocketConsumer):
     """
     Consumer para clientes
     Gerencia notificações e atualizações de agendamentos em tempo real
     """
     
+    # Eventos perdidos são recuperados pelo 'resume' ao reconectar
+    outbound_overflow = DESCONECTAR
+    
     async def connect(self):
         """Quando um cliente se conecta"""
         self.user_id = self.scope['url_route']['kwargs']['user_id']
@@ -41,16 +123,19 @@ class ClientConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        await self.join_presence(user)
         
-        # Enviar mensagem de boas-vindas
+        # Enviar mensagem de boas-vindas (com a sequência atual, base para o 'resume')
         await self.send(text_data=json.dumps({
             'type': 'connection_established',
             'message': 'Conectado ao sistema AutoV7',
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'seq': await database_sync_to_async(sequencia_atual)(self.room_group_name)
         }))
     
     async def disconnect(self, close_code):
         """Quando um cliente se desconecta"""
+        await self.leave_presence()
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -59,6 +144,7 @@ class ClientConsumer(AsyncWebsocketConsumer):
     
     async def receive(self, text_data):
         """Recebe mensagens do WebSocket"""
+        await self.renew_presence()
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
@@ -70,63 +156,20 @@ class ClientConsumer(AsyncWebsocketConsumer):
                     'timestamp': data.get('timestamp')
                 }))
             
+            elif message_type == 'resume':
+                await self.resume_stream(data)
+            
+            elif message_type == 'ack':
+                self.acknowledge(data)
+            
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid JSON format'
             }))
-    
-    # Handlers para mensagens do channel layer
-    async def appointment_status_changed(self, event):
-        """Envia notificação de mudança de status de agendamento"""
-        await self.send(text_data=json.dumps({
-            'type': 'appointment_status_changed',
-            'appointment_id': event['appointment_id'],
-            'new_status': event['new_status'],
-            'status_display': event['status_display'],
-            'message': event['message']
-        }))
-    
-    async def appointment_confirmed(self, event):
-        """Notifica confirmação de agendamento"""
-        await self.send(text_data=json.dumps({
-            'type': 'appointment_confirmed',
-            'appointment_id': event['appointment_id'],
-            'date': event['date'],
-            'time': event['time'],
-            'message': event['message']
-        }))
-    
-    async def appointment_cancelled(self, event):
-        """Notifica cancelamento de agendamento"""
-        await self.send(text_data=json.dumps({
-            'type': 'appointment_cancelled',
-            'appointment_id': event['appointment_id'],
-            'reason': event.get('reason', ''),
-            'message': event['message']
-        }))
-    
-    async def new_notification(self, event):
-        """Envia nova notificação"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_notification',
-            'notification_id': event['notification_id'],
-            'title': event['title'],
-            'message': event['message'],
-            'notification_type': event['notification_type']
-        }))
-    
-    async def reminder(self, event):
-        """Envia lembrete"""
-        await self.send(text_data=json.dumps({
-            'type': 'reminder',
-            'appointment_id': event['appointment_id'],
-            'message': event['message'],
-            'time_until': event['time_until']
-        }))
 
 
-class AdminConsumer(AsyncWebsocketConsumer):
+class AdminConsumer(PresenceMixin, ForwardEventMixin, AsyncWebsocketConsumer):
     """
     Consumer para administradores
     Recebe todas as atualizações do sistema em tempo real
@@ -150,6 +193,7 @@ class AdminConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        await self.join_presence(user)
         
         # Enviar mensagem de conexão
         await self.send(text_data=json.dumps({
@@ -160,6 +204,7 @@ class AdminConsumer(AsyncWebsocketConsumer):
     
     async def disconnect(self, close_code):
         """Quando um admin se desconecta"""
+        await self.leave_presence()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -167,6 +212,7 @@ class AdminConsumer(AsyncWebsocketConsumer):
     
     async def receive(self, text_data):
         """Recebe mensagens do WebSocket"""
+        await self.renew_presence()
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
@@ -177,71 +223,24 @@ class AdminConsumer(AsyncWebsocketConsumer):
                     'timestamp': data.get('timestamp')
                 }))
             
+            elif message_type == 'ack':
+                self.acknowledge(data)
+            
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid JSON format'
             }))
-    
-    # Handlers para eventos do sistema
-    async def new_appointment(self, event):
-        """Notifica novo agendamento"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_appointment',
-            'appointment_id': event['appointment_id'],
-            'client_name': event['client_name'],
-            'client_email': event['client_email'],
-            'vehicle': event['vehicle'],
-            'service': event['service'],
-            'date': event['date'],
-            'time': event['time'],
-            'total_price': event['total_price'],
-            'created_at': event['created_at']
-        }))
-    
-    async def appointment_cancelled_by_client(self, event):
-        """Notifica cancelamento pelo cliente"""
-        await self.send(text_data=json.dumps({
-            'type': 'appointment_cancelled_by_client',
-            'appointment_id': event['appointment_id'],
-            'client_name': event['client_name'],
-            'reason': event.get('reason', 'Não informado')
-        }))
-    
-    async def new_customer(self, event):
-        """Notifica novo cliente"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_customer',
-            'customer_id': event['customer_id'],
-            'name': event['name'],
-            'email': event['email'],
-            'joined_at': event['joined_at']
-        }))
-    
-    async def new_vehicle(self, event):
-        """Notifica novo veículo cadastrado"""
-        await self.send(text_data=json.dumps({
-            'type': 'new_vehicle',
-            'vehicle_id': event['vehicle_id'],
-            'owner_name': event['owner_name'],
-            'vehicle': event['vehicle'],
-            'plate': event['plate']
-        }))
-    
-    async def stats_update(self, event):
-        """Atualiza estatísticas em tempo real"""
-        await self.send(text_data=json.dumps({
-            'type': 'stats_update',
-            'stats': event['stats']
-        }))
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(PresenceMixin, ForwardEventMixin, ResumableStreamMixin, AsyncWebsocketConsumer):
     """
     Consumer para notificações gerais
     Usado por todos os tipos de usuários
     """
     
+    outbound_overflow = DESCONECTAR
+    
     async def connect(self):
         """Quando um usuário se conecta"""
         self.user_id = self.scope['url_route']['kwargs']['user_id']
@@ -256,69 +255,109 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
-        # Join room group
+        # Confirmações de leitura aguardando a gravação em lote
+        self.pending_reads = set()
+        self.flush_task = None
+        
+        # Grupo individual + grupo da função (alertas para todos os admins/funcionários)
+        self.role_group_name = role_group_name(user.funcao)
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_add(
+            self.role_group_name,
+            self.channel_name
+        )
         
         await self.accept()
+        await self.join_presence(user)
+    
+    def presence_groups(self):
+        return [self.room_group_name, self.role_group_name]
     
     async def disconnect(self, close_code):
         """Quando um usuário se desconecta"""
+        if not hasattr(self, 'role_group_name'):
+            return
+        await self.leave_presence()
+        await self.flush_read_receipts()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_discard(
+            self.role_group_name,
+            self.channel_name
+        )
     
     async def receive(self, text_data):
         """Recebe mensagens do WebSocket"""
+        await self.renew_presence()
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
             
             if message_type == 'mark_read':
-                notification_id = data.get('notification_id')
-                await self.mark_notification_read(notification_id)
+                notification_ids = data.get('notification_ids')
+                if not isinstance(notification_ids, list):
+                    notification_ids = [data.get('notification_id')]
+                await self.queue_read_receipts(notification_ids)
+            
+            elif message_type == 'mark_all_read':
+                await self.mark_all_notifications_read()
+            
+            elif message_type == 'resume':
+                await self.resume_stream(data)
+            
+            elif message_type == 'ack':
+                self.acknowledge(data)
             
         except json.JSONDecodeError:
             pass
     
-    async def notification(self, event):
-        """Envia notificação"""
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'id': event['id'],
-            'title': event['title'],
-            'message': event['message'],
-            'notification_type': event['notification_type'],
-            'created_at': event['created_at']
-        }))
+    async def queue_read_receipts(self, notification_ids):
+        """Acumula confirmações de leitura para gravá-las juntas ao fim da janela"""
+        for notification_id in notification_ids:
+            try:
+                self.pending_reads.add(int(notification_id))
+            except (TypeError, ValueError):
+                continue
+        
+        if len(self.pending_reads) >= MAXIMO_LEITURAS_PENDENTES:
+            await self.flush_read_receipts()
+        elif self.pending_reads and self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_after_window())
     
-    async def alert(self, event):
-        """Envia alerta"""
-        await self.send(text_data=json.dumps({
-            'type': 'alert',
-            'level': event['level'],  # info, warning, error, success
-            'title': event['title'],
-            'message': event['message']
-        }))
+    async def flush_after_window(self):
+        await asyncio.sleep(JANELA_CONFIRMACAO_LEITURA)
+        self.flush_task = None
+        await self.flush_read_receipts()
     
-    async def message(self, event):
-        """Envia mensagem do sistema"""
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'message': event['message'],
-            'sender': event.get('sender', 'Sistema')
-        }))
+    async def flush_read_receipts(self):
+        """Grava de uma vez as confirmações de leitura pendentes"""
+        self.cancel_flush()
+        notification_ids, self.pending_reads = self.pending_reads, set()
+        if notification_ids:
+            await self.mark_notifications_read(notification_ids)
+    
+    def cancel_flush(self):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None
+    
+    async def mark_all_notifications_read(self):
+        """Marca todas as notificações do usuário como lidas (cobre as pendentes)"""
+        self.cancel_flush()
+        self.pending_reads = set()
+        await self.mark_notifications_read(None)
     
     @database_sync_to_async
-    def mark_notification_read(self, notification_id):
-        """Marca notificação como lida"""
-        from core.models import Notification
-        try:
-            notification = Notification.objects.get(id=notification_id)
-            notification.lida = True
-            notification.save()
-        except Notification.DoesNotExist:
-            pass
+    def mark_notifications_read(self, notification_ids):
+        """
+        Marca notificações como lidas em um único UPDATE (e ajusta o contador), restrito às do próprio usuário
+        
+        notification_ids=None marca todas as não lidas do usuário.
+        """
+        from core.notifications import marcar_lidas
+        return marcar_lidas(int(self.user_id), notification_ids)
@@ -1,6 +1,6 @@
 # core/dashboard_urls.py
 from django.urls import path
-from . import dashboard_views
+from . import dashboard_views, sse_views
 
 urlpatterns = [
     # Dashboard principal
@@ -14,6 +14,9 @@ urlpatterns = [
     path('profile/', dashboard_views.profile_page, name='profile_page'),
     path('change-password/', dashboard_views.change_password, name='change_password'),
     
+    # Eventos em tempo real via Server-Sent Events (alternativa ao WebSocket)
+    path('eventos/', sse_views.client_event_stream, name='client_event_stream'),
+    
     # APIs AJAX
     path('api/time-slots/', dashboard_views.get_time_slots, name='get_time_slots'),
     path('api/calendar-availability/', dashboard_views.get_calendar_availability, name='get_calendar_availability'),
@@ -0,0 +1,249 @@
+"""
+Comando para medir a vazão do channel layer local (socket Unix) contra o InMemory
+
+Cenários, para cada layer:
+- envio direto: N send() para um canal com um receptor;
+- grupo: group_send para um grupo com R receptores no mesmo processo
+  (N entregas no total);
+- multiprocesso (somente socket Unix): receptores em P processos separados,
+  como em vários workers daphne.
+
+Se nenhum broker estiver ouvindo no socket informado, um broker temporário é
+iniciado para a medição e encerrado no final. O envio respeita uma janela de
+mensagens ainda não recebidas (controle de fluxo), como um produtor real
+precisaria fazer: sem ela, um receptor atrasado perde mensagens em ambos os
+layers.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.channel_broker import socket_ativo
+from core.channel_layers import CAMINHO_PADRAO, UnixSocketChannelLayer
+
+# Mensagem com o tamanho típico de um evento do sistema (ver core/websocket_events.py)
+MENSAGEM = {
+    'type': 'ws.forward',
+    'text': '{"type": "appointment_status_changed", "appointment_id": 123, "new_status": "confirmed", '
+            '"status_display": "Confirmado", "message": "Seu agendamento foi confirmado", "seq": 42}',
+}
+
+# Mensagens enviadas e ainda não recebidas pelo receptor mais lento
+JANELA = 2000
+
+# Os receptores informam o progresso a cada tantas mensagens
+PASSO_PROGRESSO = 500
+
+
+class _Janela:
+    """Controle de fluxo: o envio k espera até todos os receptores terem recebido k - JANELA"""
+
+    def __init__(self, receptores):
+        self.recebidas = [0] * receptores
+        self.condicao = asyncio.Condition()
+
+    async def registrar(self, receptor, recebidas):
+        async with self.condicao:
+            self.recebidas[receptor] = recebidas
+            self.condicao.notify_all()
+
+    async def aguardar(self, enviadas):
+        if enviadas % PASSO_PROGRESSO or min(self.recebidas) >= enviadas - JANELA:
+            return
+        async with self.condicao:
+            await self.condicao.wait_for(lambda: min(self.recebidas) >= enviadas - JANELA)
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão do channel layer via socket Unix com a do InMemoryChannelLayer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensagens', type=int, default=20000, help='Entregas por cenário (padrão: 20000)')
+        parser.add_argument('--receptores', type=int, default=10, help='Receptores no grupo (padrão: 10)')
+        parser.add_argument('--processos', type=int, default=4, help='Processos receptores no cenário multiprocesso (padrão: 4)')
+        parser.add_argument('--socket', help='Socket de um broker já em execução (padrão: inicia um temporário)')
+        # Uso interno: processo receptor do cenário multiprocesso
+        parser.add_argument('--receptor', help='(interno) grupo a receber')
+        parser.add_argument('--esperadas', type=int, default=0, help='(interno) mensagens a receber')
+        parser.add_argument('--retorno', help='(interno) canal para informar o progresso')
+        parser.add_argument('--indice', type=int, default=0, help='(interno) índice do receptor')
+
+    def handle(self, *args, **options):
+        if options['receptor']:
+            asyncio.run(self._receptor(
+                options['socket'], options['receptor'], options['esperadas'], options['retorno'], options['indice']
+            ))
+            return
+
+        mensagens, receptores = options['mensagens'], options['receptores']
+        if mensagens < 1 or receptores < 1 or options['processos'] < 1:
+            raise CommandError('Mensagens, receptores e processos devem ser positivos')
+
+        caminho, broker = options['socket'], None
+        if caminho:
+            if not socket_ativo(caminho):
+                raise CommandError(f'Nenhum broker ouvindo em {caminho}')
+        else:
+            caminho = os.path.join(tempfile.mkdtemp(prefix='autov7-bench-'), 'channels.sock')
+            broker = self._iniciar_broker(caminho, mensagens)
+
+        try:
+            resultados = {
+                'memoria': asyncio.run(self._medir(InMemoryChannelLayer(capacity=mensagens + 1), mensagens, receptores)),
+                'socket_unix': asyncio.run(self._medir(UnixSocketChannelLayer(path=caminho), mensagens, receptores)),
+            }
+            multiprocesso = self._medir_multiprocesso(caminho, mensagens, options['processos'])
+        finally:
+            if broker is not None:
+                broker.terminate()
+                broker.wait()
+
+        self.stdout.write(f'{mensagens} entregas por cenário, {receptores} receptores no grupo\n')
+        self.stdout.write(f'{"Cenário":<16}{"memoria (msg/s)":>18}{"socket_unix (msg/s)":>22}')
+        for cenario in ('envio_direto', 'grupo'):
+            self.stdout.write(
+                f'{cenario:<16}{resultados["memoria"][cenario]:>18,.0f}{resultados["socket_unix"][cenario]:>22,.0f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'multiprocesso ({options["processos"]} processos): {multiprocesso:,.0f} msg/s via socket Unix '
+            f'(InMemory não entrega entre processos)'
+        ))
+
+    def _iniciar_broker(self, caminho, mensagens):
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        broker = subprocess.Popen(
+            [sys.executable, manage, 'channel_broker', '--socket', caminho, '--capacity', str(mensagens + 1), '-v', '0'],
+            stdout=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 10
+        while not socket_ativo(caminho):
+            if broker.poll() is not None or time.monotonic() > limite:
+                broker.kill()
+                raise CommandError('Não foi possível iniciar o broker temporário')
+            time.sleep(0.05)
+        return broker
+
+    async def _medir(self, camada, mensagens, receptores):
+        """Mensagens entregues por segundo em cada cenário"""
+        resultado = {}
+
+        canal = await camada.new_channel()
+        grupo_aquecimento = f'benchmark_{uuid.uuid4().hex}'
+        await camada.group_add(grupo_aquecimento, canal)  # abre a conexão antes de medir
+        janela = _Janela(1)
+        recepcao = asyncio.create_task(self._receber(camada, canal, mensagens, janela.registrar, 0))
+        await asyncio.sleep(0)
+        inicio = time.perf_counter()
+        for enviadas in range(mensagens):
+            await janela.aguardar(enviadas)
+            await camada.send(canal, MENSAGEM)
+        await recepcao
+        resultado['envio_direto'] = mensagens / (time.perf_counter() - inicio)
+        await camada.group_discard(grupo_aquecimento, canal)
+
+        grupo = f'benchmark_{uuid.uuid4().hex}'
+        envios = max(mensagens // receptores, 1)
+        canais = [await camada.new_channel() for _ in range(receptores)]
+        for canal in canais:
+            await camada.group_add(grupo, canal)
+        janela = _Janela(receptores)
+        recepcoes = [
+            asyncio.create_task(self._receber(camada, canal, envios, janela.registrar, i))
+            for i, canal in enumerate(canais)
+        ]
+        await asyncio.sleep(0)
+        inicio = time.perf_counter()
+        for enviadas in range(envios):
+            await janela.aguardar(enviadas)
+            await camada.group_send(grupo, MENSAGEM)
+        await asyncio.gather(*recepcoes)
+        resultado['grupo'] = envios * receptores / (time.perf_counter() - inicio)
+        for canal in canais:
+            await camada.group_discard(grupo, canal)
+
+        if hasattr(camada, 'close'):
+            await camada.close()
+        return resultado
+
+    async def _receber(self, camada, canal, quantidade, informar=None, receptor=0):
+        for recebidas in range(1, quantidade + 1):
+            await camada.receive(canal)
+            if informar is not None and (recebidas % PASSO_PROGRESSO == 0 or recebidas == quantidade):
+                await informar(receptor, recebidas)
+
+    def _medir_multiprocesso(self, caminho, mensagens, processos):
+        """group_send de um processo para receptores em outros processos (como workers daphne)"""
+        grupo = f'benchmark_{uuid.uuid4().hex}'
+        retorno = f'benchmark_retorno_{uuid.uuid4().hex}'
+        envios = max(mensagens // processos, 1)
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        filhos = [
+            subprocess.Popen(
+                [sys.executable, manage, 'benchmark_channel_layer', '--socket', caminho,
+                 '--receptor', grupo, '--esperadas', str(envios), '--retorno', retorno, '--indice', str(i)],
+                stdout=subprocess.PIPE, text=True,
+            )
+            for i in range(processos)
+        ]
+        try:
+            for filho in filhos:
+                if filho.stdout.readline().strip() != 'pronto':
+                    raise CommandError('Processo receptor não iniciou')
+
+            async def enviar():
+                camada = UnixSocketChannelLayer(path=caminho)
+                janela = _Janela(processos)
+
+                async def acompanhar():
+                    # Progresso informado pelos receptores pelo próprio broker
+                    while min(janela.recebidas) < envios:
+                        progresso = await camada.receive(retorno)
+                        await janela.registrar(progresso['receptor'], progresso['recebidas'])
+
+                acompanhamento = asyncio.create_task(acompanhar())
+                for enviadas in range(envios):
+                    await janela.aguardar(enviadas)
+                    await camada.group_send(grupo, MENSAGEM)
+                await acompanhamento
+                await camada.close()
+
+            # Relógio de parede: comparável entre processos
+            inicio = time.time()
+            asyncio.run(enviar())
+            fins = []
+            for filho in filhos:
+                saida, _ = filho.communicate(timeout=120)
+                if filho.returncode != 0:
+                    raise CommandError('Processo receptor falhou')
+                fins.append(float(saida.strip()))
+            return envios * processos / (max(fins) - inicio)
+        finally:
+            for filho in filhos:
+                if filho.poll() is None:
+                    filho.kill()
+
+    async def _receptor(self, caminho, grupo, esperadas, retorno, indice):
+        camada = UnixSocketChannelLayer(path=caminho or CAMINHO_PADRAO)
+        canal = await camada.new_channel()
+        await camada.group_add(grupo, canal)
+        # Ida e volta pelo broker na mesma conexão: o group_add já foi processado
+        await camada.send(canal, {'type': 'benchmark.pronto'})
+        await camada.receive(canal)
+        self.stdout.write('pronto')
+        self.stdout.flush()
+        async def informar(receptor, recebidas):
+            await camada.send(retorno, {'type': 'benchmark.progresso', 'receptor': receptor, 'recebidas': recebidas})
+
+        await self._receber(camada, canal, esperadas, informar, indice)
+        # Momento da última entrega, para o processo principal calcular a vazão
+        self.stdout.write(repr(time.time()))
+        await camada.group_discard(grupo, canal)
+        await camada.close()
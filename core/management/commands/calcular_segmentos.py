@@ -0,0 +1,39 @@
+"""
+Comando para recalcular os segmentos RFM e a retenção por coorte
+
+Deve ser agendado (cron / agendador de tarefas) para rodar uma vez por dia.
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import CustomerSegment
+from core.segmentation import calcular_segmentos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os segmentos RFM dos clientes e a retenção por coorte'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--referencia', type=str, help='Data de referência (YYYY-MM-DD, padrão: hoje)')
+
+    def handle(self, *args, **options):
+        referencia = None
+        if options.get('referencia'):
+            try:
+                referencia = datetime.strptime(options['referencia'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida, use o formato YYYY-MM-DD')
+        
+        inicio = time.monotonic()
+        contagem = calcular_segmentos(referencia)
+        duracao = time.monotonic() - inicio
+        
+        nomes = dict(CustomerSegment.SEGMENT_CHOICES)
+        for segmento, total in contagem.items():
+            if total:
+                self.stdout.write(f'{nomes[segmento]}: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(contagem.values())} clientes segmentados em {duracao:.2f}s'
+        ))
@@ -0,0 +1,45 @@
+"""
+Comando para rodar o broker local do channel layer (socket Unix)
+
+Necessário quando CHANNEL_LAYERS usa core.channel_layers.UnixSocketChannelLayer
+(USE_UNIX_BROKER=True): inicie o broker antes dos workers daphne, por exemplo
+
+    python manage.py channel_broker &
+    daphne -u /tmp/daphne0.sock autov7_backend.asgi:application &
+    daphne -u /tmp/daphne1.sock autov7_backend.asgi:application &
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.channel_broker import ChannelBroker
+from core.channel_layers import CAMINHO_PADRAO
+
+
+class Command(BaseCommand):
+    help = 'Roda o broker do channel layer local (socket Unix) para vários workers daphne'
+
+    def add_arguments(self, parser):
+        config = settings.CHANNEL_LAYERS.get('default', {}).get('CONFIG', {})
+        parser.add_argument('--socket', default=config.get('path', CAMINHO_PADRAO), help='Caminho do socket Unix')
+        parser.add_argument('--expiry', type=int, default=config.get('expiry', 60), help='Segundos até uma mensagem sem receptor expirar')
+        parser.add_argument('--group-expiry', type=int, default=config.get('group_expiry', 86400), help='Segundos até uma participação em grupo expirar')
+        parser.add_argument('--capacity', type=int, default=config.get('capacity', 100), help='Mensagens guardadas por canal sem receptor')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO if options['verbosity'] else logging.WARNING)
+        broker = ChannelBroker(
+            options['socket'],
+            expiry=options['expiry'],
+            group_expiry=options['group_expiry'],
+            capacity=options['capacity'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Broker do channel layer em {options["socket"]} (Ctrl+C para encerrar)'))
+        try:
+            asyncio.run(broker.servir())
+        except RuntimeError as erro:
+            raise CommandError(str(erro))
+        except KeyboardInterrupt:
+            self.stdout.write(f'Broker encerrado ({broker.entregues} mensagens entregues, {broker.descartados} descartadas)')
@@ -0,0 +1,40 @@
+"""
+Comando que converte o MEDIA_ROOT existente para o storage por conteúdo
+
+Renomeia cada arquivo usado por algum registro para o nome pelo hash do
+conteúdo (core/storage.py), reescreve os campos de arquivo, apaga os nomes
+antigos e as cópias idênticas que sobraram de reenvios (BACK_HERO1_LtVEjV6.jpg)
+e refaz a contagem de referências. As variantes responsivas das imagens
+movidas são geradas de novo no fim.
+"""
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.media import deduplicar
+
+
+class Command(BaseCommand):
+    help = 'Renomeia a mídia existente pelo hash do conteúdo e apaga as cópias repetidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Só mostra o que seria feito, sem alterar arquivos nem registros')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        resultado = deduplicar(simular=options['simular'])
+
+        prefixo = 'Simulação: ' if options['simular'] else ''
+        self.stdout.write(f'{resultado["arquivos"]} arquivos usados por registros, {resultado["movidos"]} com nome a converter')
+        if resultado['ausentes']:
+            self.stdout.write(self.style.WARNING(f'{resultado["ausentes"]} arquivos referenciados não existem no disco'))
+        if resultado['soltos']:
+            self.stdout.write(f'{resultado["soltos"]} arquivos sem registro e sem cópia mantida foram deixados como estão')
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefixo}{resultado["registros"]} registros reescritos, {resultado["duplicados"]} cópias repetidas removidas, '
+            f'{resultado["bytes"] / 1024 / 1024:.1f} MB liberados em {time.monotonic() - inicio:.2f}s'
+        ))
+
+        if resultado['movidos'] and not options['simular']:
+            call_command('gerar_variantes', stdout=self.stdout, verbosity=options['verbosity'])
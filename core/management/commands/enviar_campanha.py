@@ -0,0 +1,58 @@
+"""
+Comando para enviar (ou retomar) uma campanha de marketing
+
+Cria a campanha com --titulo/--mensagem ou envia uma existente pelo id. Um
+envio interrompido continua do último lote gravado; --pendentes retoma todas
+as campanhas que ficaram em andamento.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.campaigns import TAMANHO_LOTE, enviar_campanha
+from core.models import Campaign
+from core.websocket_dispatcher import dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Envia uma campanha de marketing como notificação aos clientes que aceitam marketing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campanha_id', nargs='?', type=int, help='Id da campanha a enviar ou retomar')
+        parser.add_argument('--titulo', type=str, help='Cria uma nova campanha com este título')
+        parser.add_argument('--mensagem', type=str, help='Mensagem da nova campanha')
+        parser.add_argument('--pendentes', action='store_true', help='Retoma todas as campanhas em andamento')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help=f'Destinatários por lote (padrão: {TAMANHO_LOTE})')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['lote'] <= 0:
+            raise CommandError('O tamanho do lote deve ser positivo')
+
+        if options.get('titulo'):
+            if not options.get('mensagem'):
+                raise CommandError('Informe --mensagem junto com --titulo')
+            ids = [Campaign.objects.create(titulo=options['titulo'], mensagem=options['mensagem']).id]
+        elif options.get('campanha_id'):
+            if not Campaign.objects.filter(pk=options['campanha_id']).exists():
+                raise CommandError(f'Campanha {options["campanha_id"]} não encontrada')
+            ids = [options['campanha_id']]
+        elif options['pendentes']:
+            ids = list(Campaign.objects.filter(situacao='sending').order_by('id').values_list('id', flat=True))
+        else:
+            raise CommandError('Informe o id da campanha, --titulo/--mensagem ou --pendentes')
+
+        for campanha_id in ids:
+            inicio = time.monotonic()
+            campanha = enviar_campanha(campanha_id, options['lote'], self._progresso)
+            duracao = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'Campanha {campanha.id} ({campanha.titulo}): {campanha.enviados} notificações em {duracao:.2f}s'
+            ))
+
+        # Entrega os avisos WebSocket ainda na fila antes de o processo terminar
+        dispatcher.aguardar_entrega(5)
+
+    def _progresso(self, enviados, total, duracao_lote):
+        if self.verbosity > 1:
+            self.stdout.write(f'  {enviados}/{total} ({duracao_lote * 1000:.0f} ms no lote)')
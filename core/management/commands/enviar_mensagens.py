@@ -0,0 +1,47 @@
+"""
+Comando que envia as mensagens pendentes da caixa de saída
+
+Deve ser agendado (cron / agendador de tarefas) a intervalos curtos. Com
+--confirmacoes gera antes, de uma vez, as confirmações dos agendamentos do
+dia informado (padrão: amanhã).
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.messaging import TAMANHO_LOTE, enviar_pendentes, gerar_confirmacoes
+
+
+class Command(BaseCommand):
+    help = 'Envia as mensagens pendentes (WhatsApp) pelo backend de MENSAGENS_BACKEND'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--confirmacoes', action='store_true', help='Gera as confirmações dos agendamentos do dia antes de enviar')
+        parser.add_argument('--data', type=str, help='Dia das confirmações (YYYY-MM-DD, padrão: amanhã)')
+        parser.add_argument('--somente-gerar', action='store_true', help='Gera as confirmações sem enviar')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help=f'Mensagens por lote (padrão: {TAMANHO_LOTE})')
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('O tamanho do lote deve ser positivo')
+
+        if options['confirmacoes'] or options['somente_gerar']:
+            if options.get('data'):
+                try:
+                    data = datetime.strptime(options['data'], '%Y-%m-%d').date()
+                except ValueError:
+                    raise CommandError('Data inválida, use o formato YYYY-MM-DD')
+            else:
+                data = timezone.localdate() + timedelta(days=1)
+            geradas, sem_telefone = gerar_confirmacoes(data)
+            self.stdout.write(f'{geradas} confirmações geradas para {data:%d/%m/%Y} ({sem_telefone} clientes sem telefone válido)')
+            if options['somente_gerar']:
+                return
+
+        inicio = time.monotonic()
+        enviadas, falhas = enviar_pendentes(options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{enviadas} mensagens enviadas, {falhas} falhas em {time.monotonic() - inicio:.2f}s'
+        ))
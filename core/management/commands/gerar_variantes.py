@@ -0,0 +1,41 @@
+"""
+Comando para gerar as variantes responsivas (WebP/AVIF) das imagens do site
+
+Novos uploads são convertidos em segundo plano (ver core/renditions.py); este
+comando serve para as imagens já existentes e para refazer tudo depois de
+mudar VARIANTES_LARGURAS.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import GalleryImage, HeroBackground, HeroImage
+from core.renditions import formatos_disponiveis, gerar_variantes, larguras_configuradas
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes redimensionadas em WebP/AVIF das imagens do hero e da galeria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Refaz também as imagens que já têm variantes, regravando os arquivos')
+
+    def handle(self, *args, **options):
+        larguras = ', '.join(str(largura) for largura in larguras_configuradas())
+        self.stdout.write(f'Larguras: {larguras} px; formatos: {", ".join(formatos_disponiveis())}')
+
+        inicio = time.monotonic()
+        total = 0
+        for modelo in (HeroBackground, HeroImage, GalleryImage):
+            imagens = modelo.objects.exclude(**{modelo.CAMPO_IMAGEM: ''})
+            if not options['todas']:
+                imagens = imagens.filter(variantes=[])
+            for imagem in imagens:
+                try:
+                    variantes = gerar_variantes(imagem, sobrescrever=options['todas'])
+                except (OSError, ValueError) as e:
+                    self.stdout.write(self.style.WARNING(f'{modelo._meta.verbose_name} {imagem.pk}: {e}'))
+                    continue
+                total += 1
+                self.stdout.write(f'  {modelo._meta.verbose_name} {imagem.pk}: {len(variantes)} variantes')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} imagens convertidas em {time.monotonic() - inicio:.2f}s'))
@@ -0,0 +1,53 @@
+"""
+Comando que aplica a política de retenção das notificações
+
+Deve ser agendado (cron / agendador de tarefas) para rodar uma vez por dia.
+Remove as notificações lidas mais antigas que --dias (padrão:
+settings.NOTIFICACOES_RETENCAO_DIAS) em lotes por faixa de id e,
+com --limite-por-usuario, mantém só as N mais recentes de cada usuário.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.retention import TAMANHO_LOTE, limitar_por_usuario, remover_antigas, retencao_dias
+
+
+class Command(BaseCommand):
+    help = 'Remove ou arquiva notificações lidas antigas, em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Idade mínima das notificações lidas removidas (padrão: settings.NOTIFICACOES_RETENCAO_DIAS)')
+        parser.add_argument('--limite-por-usuario', type=int, help='Mantém só as N notificações mais recentes de cada usuário')
+        parser.add_argument('--arquivar', action='store_true', help='Copia para core_notification_archive antes de remover')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help=f'Ids por lote (padrão: {TAMANHO_LOTE})')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes, para liberar o banco')
+
+    def handle(self, *args, **options):
+        dias = options['dias'] if options['dias'] is not None else retencao_dias()
+        if dias < 0:
+            raise CommandError('O número de dias não pode ser negativo')
+        if options['lote'] <= 0:
+            raise CommandError('O tamanho do lote deve ser positivo')
+        if options['limite_por_usuario'] is not None and options['limite_por_usuario'] < 0:
+            raise CommandError('O limite por usuário não pode ser negativo')
+
+        acao = 'arquivadas' if options['arquivar'] else 'removidas'
+        parametros = {'arquivar': options['arquivar'], 'lote': options['lote'], 'pausa': options['pausa'], 'relatorio': self._relatorio}
+
+        inicio = time.monotonic()
+        total = remover_antigas(dias, **parametros)
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} notificações lidas com mais de {dias} dias {acao} em {time.monotonic() - inicio:.2f}s'
+        ))
+
+        if options['limite_por_usuario'] is not None:
+            inicio = time.monotonic()
+            total = limitar_por_usuario(options['limite_por_usuario'], **parametros)
+            self.stdout.write(self.style.SUCCESS(
+                f'{total} notificações além das {options["limite_por_usuario"]} mais recentes por usuário {acao} '
+                f'em {time.monotonic() - inicio:.2f}s'
+            ))
+
+    def _relatorio(self, descricao, linhas, duracao):
+        self.stdout.write(f'  {descricao}: {linhas} linhas em {duracao * 1000:.0f} ms')
@@ -0,0 +1,231 @@
+"""
+Contagem de referências dos arquivos de mídia
+
+Com o storage por conteúdo (core/storage.py) vários registros podem apontar
+para o mesmo arquivo, então apagar um registro não pode apagar o arquivo.
+MediaBlob guarda quantos campos de arquivo usam cada nome: o storage soma ao
+receber um envio, os sinais de core/signals.py somam quando um registro passa
+a usar um nome já gravado e descontam ao trocar ou apagar; quando a contagem
+zera, o arquivo e suas variantes (core/renditions.py) saem do disco depois do
+commit. Um envio que falha fora de transação deixa a contagem alta (o arquivo
+só sobra em disco); recalcular_referencias() corrige.
+
+Arquivos sem MediaBlob (anteriores à contagem) nunca são apagados por aqui;
+recalcular_referencias() ou o comando deduplicar_midia os registram.
+"""
+
+import os
+import shutil
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from .models import MediaBlob
+from .renditions import e_variante
+from .storage import ContentAddressedStorage, e_nome_por_conteudo, nome_por_resumo, resumo_arquivo
+from .thumbnails import remover_miniaturas
+
+
+def campos_de_arquivo():
+    """{modelo: [campos]} dos campos de arquivo gravados pelo storage por conteúdo"""
+    campos = defaultdict(list)
+    for modelo in apps.get_models():
+        for campo in modelo._meta.get_fields():
+            if isinstance(campo, models.FileField) and isinstance(campo.storage, ContentAddressedStorage):
+                campos[modelo].append(campo.name)
+    return dict(campos)
+
+
+def _nomes_referenciados(modelo, campo):
+    return (
+        modelo._default_manager.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+        .values_list(campo, flat=True)
+    )
+
+
+def _tamanho(nome):
+    try:
+        return default_storage.size(nome)
+    except OSError:
+        return 0
+
+
+def referenciar(nome):
+    if MediaBlob.objects.filter(nome=nome).update(referencias=F('referencias') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(nome=nome, referencias=1, tamanho=_tamanho(nome))
+    except IntegrityError:
+        MediaBlob.objects.filter(nome=nome).update(referencias=F('referencias') + 1)
+
+
+def liberar(nome):
+    MediaBlob.objects.filter(nome=nome, referencias__gt=0).update(referencias=F('referencias') - 1)
+    transaction.on_commit(lambda: _apagar_se_livre(nome))
+
+
+def _apagar_se_livre(nome):
+    # A contagem pode ter voltado a subir (mesmo arquivo reenviado) antes do
+    # commit. O arquivo sai dentro da transação que apaga o MediaBlob: um envio
+    # simultâneo do mesmo conteúdo espera a trava para somar a referência e só
+    # depois confere se o arquivo existe (ContentAddressedStorage._save)
+    with transaction.atomic():
+        if MediaBlob.objects.filter(nome=nome, referencias=0).delete()[0]:
+            apagar_arquivo(nome)
+
+
+def apagar_arquivo(nome):
+    """Apaga o arquivo, as variantes geradas ao lado dele e as miniaturas em cache"""
+    default_storage.delete(nome)
+    remover_miniaturas(nome)
+    diretorio, arquivo = os.path.split(default_storage.path(nome))
+    raiz = os.path.splitext(arquivo)[0]
+    try:
+        vizinhos = os.listdir(diretorio)
+    except FileNotFoundError:
+        return
+    for vizinho in vizinhos:
+        if e_variante(vizinho, raiz):
+            os.remove(os.path.join(diretorio, vizinho))
+
+
+def recalcular_referencias():
+    """Refaz a contagem a partir dos campos de arquivo de todos os modelos; retorna quantos nomes corrigiu"""
+    contagem = Counter()
+    for modelo, campos in campos_de_arquivo().items():
+        for campo in campos:
+            contagem.update(_nomes_referenciados(modelo, campo).iterator())
+
+    atuais = dict(MediaBlob.objects.values_list('nome', 'referencias'))
+    corrigidos = 0
+    with transaction.atomic():
+        sobras = [nome for nome in atuais if nome not in contagem]
+        MediaBlob.objects.filter(nome__in=sobras).delete()
+        corrigidos += len(sobras)
+        novos = []
+        for nome, total in contagem.items():
+            if nome not in atuais:
+                novos.append(MediaBlob(nome=nome, referencias=total, tamanho=_tamanho(nome)))
+            elif atuais[nome] != total:
+                MediaBlob.objects.filter(nome=nome).update(referencias=total)
+                corrigidos += 1
+        MediaBlob.objects.bulk_create(novos)
+        corrigidos += len(novos)
+    return corrigidos
+
+
+def _arquivos_soltos(raiz, referenciados):
+    """Arquivos do MEDIA_ROOT que nenhum registro usa (sem contar variantes e temporários)"""
+    for diretorio, _, arquivos in os.walk(raiz):
+        for arquivo in arquivos:
+            if arquivo.startswith('.') or e_variante(arquivo):
+                continue
+            nome = os.path.relpath(os.path.join(diretorio, arquivo), raiz).replace(os.sep, '/')
+            if nome not in referenciados:
+                yield nome
+
+
+def deduplicar(simular=False):
+    """
+    Move a mídia existente para nomes por conteúdo e apaga as cópias repetidas
+
+    Cada arquivo usado por algum registro ganha o nome por conteúdo (um hard
+    link, ou cópia se o sistema de arquivos não permitir) e os campos são
+    reescritos numa transação; só então os nomes antigos e as cópias repetidas
+    são apagados. Entre arquivos sem registro, cada grupo de cópias idênticas
+    fica com um exemplar (o de nome mais curto, renomeado pelo conteúdo);
+    arquivos sem registro e sem cópia ficam onde estão. As imagens com
+    variantes têm a lista zerada para serem geradas de novo sob o novo nome.
+
+    Retorna {'arquivos', 'movidos', 'registros', 'duplicados', 'ausentes', 'soltos', 'bytes'}.
+    """
+    campos = campos_de_arquivo()
+    usos = defaultdict(list)
+    for modelo, nomes_campos in campos.items():
+        for campo in nomes_campos:
+            for nome in _nomes_referenciados(modelo, campo).distinct():
+                usos[nome].append((modelo, campo))
+
+    destinos = {}
+    mantidos = {}  # resumo -> nome mantido
+    tamanhos = set()
+    ausentes = 0
+    for nome in usos:
+        if not default_storage.exists(nome):
+            ausentes += 1
+            continue
+        caminho = default_storage.path(nome)
+        resumo = resumo_arquivo(caminho)
+        tamanhos.add(os.path.getsize(caminho))
+        destino = nome if e_nome_por_conteudo(nome) else nome_por_resumo(nome, resumo)
+        mantidos.setdefault(resumo, destino)
+        if destino != nome:
+            destinos[nome] = destino
+
+    # Arquivos sem registro: cópias de um arquivo mantido saem; grupos de
+    # cópias entre si ficam com um exemplar, também renomeado pelo conteúdo.
+    # Só vale calcular o hash de quem tem o tamanho de algum outro arquivo.
+    soltos = {
+        nome: default_storage.size(nome)
+        for nome in _arquivos_soltos(str(default_storage.location), usos.keys() | set(destinos.values()))
+    }
+    repetidos = Counter(soltos.values())
+    grupos = defaultdict(list)
+    for nome, tamanho in soltos.items():
+        if tamanho in tamanhos or repetidos[tamanho] > 1:
+            grupos[resumo_arquivo(default_storage.path(nome))].append(nome)
+
+    duplicados = []
+    for resumo, nomes in grupos.items():
+        if resumo not in mantidos:
+            if len(nomes) == 1:
+                continue
+            nomes.sort(key=lambda nome: (not e_nome_por_conteudo(nome), len(nome), nome))
+            exemplar = nomes.pop(0)
+            mantidos[resumo] = exemplar if e_nome_por_conteudo(exemplar) else nome_por_resumo(exemplar, resumo)
+            if mantidos[resumo] != exemplar:
+                destinos[exemplar] = mantidos[resumo]
+        duplicados.extend(nomes)
+    intactos = len(soltos) - len(duplicados) - sum(1 for nome in soltos if nome in destinos)
+
+    # Saem os nomes antigos e as cópias; cada nome por conteúdo novo entra uma vez
+    apagados = list(destinos) + duplicados
+    novos = {}
+    for nome, destino in destinos.items():
+        if not default_storage.exists(destino):
+            novos.setdefault(destino, default_storage.size(nome))
+    liberados = sum(default_storage.size(nome) for nome in apagados) - sum(novos.values())
+
+    resultado = {
+        'arquivos': len(usos), 'movidos': len(destinos), 'registros': 0, 'duplicados': len(duplicados),
+        'ausentes': ausentes, 'soltos': intactos, 'bytes': liberados,
+    }
+    if simular:
+        return resultado
+
+    for nome, destino in destinos.items():
+        caminho = default_storage.path(destino)
+        if os.path.exists(caminho):
+            continue
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        try:
+            os.link(default_storage.path(nome), caminho)
+        except OSError:
+            shutil.copyfile(default_storage.path(nome), caminho)
+
+    with transaction.atomic():
+        for nome, destino in destinos.items():
+            for modelo, campo in usos[nome]:
+                alteracoes = {campo: destino}
+                if getattr(modelo, 'CAMPO_IMAGEM', None) == campo:
+                    alteracoes['variantes'] = []
+                resultado['registros'] += modelo._default_manager.filter(**{campo: nome}).update(**alteracoes)
+        recalcular_referencias()
+
+    for nome in apagados:
+        apagar_arquivo(nome)
+    return resultado
@@ -0,0 +1,233 @@
+"""
+Caixa de saída de mensagens (WhatsApp)
+
+As mensagens são geradas a partir de modelos compilados uma vez na
+importação (string.Template) e gravadas em OutboundMessage com o telefone já
+em E.164 (User.telefone_e164). A requisição só enfileira; o envio é feito em
+lote pelo comando enviar_mensagens, com o backend de MENSAGENS_BACKEND:
+
+- core.messaging.FileBackend (padrão): acrescenta cada mensagem como uma linha
+  JSON em MENSAGENS_ARQUIVO, substituto local de um provedor real;
+- core.messaging.ConsoleBackend: escreve as mensagens no log.
+
+Um backend é uma classe com enviar(mensagens) que retorna {id: erro} das
+mensagens que falharam.
+
+Quando o painel devolve o link wa.me para o atendente enviar na hora, a
+mensagem é assumida antes (assumir_envio_manual) e sai da fila, para o
+cliente não recebê-la duas vezes.
+"""
+
+import json
+import logging
+from string import Template
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+BACKEND_PADRAO = 'core.messaging.FileBackend'
+ARQUIVO_PADRAO = '/tmp/autov7-mensagens.jsonl'
+MAXIMO_TENTATIVAS = 3
+TAMANHO_LOTE = 100
+
+# Situações do agendamento que geram mensagem ao cliente -> modelo
+MODELOS_POR_SITUACAO = {
+    'completed': 'agendamento_concluido',
+    'cancelled': 'agendamento_cancelado',
+}
+
+MODELOS = {
+    'agendamento_concluido': Template(
+        'Olá $nome! 🚗✨\n\n'
+        'Seu *$veiculo*$placa está pronto! O serviço foi concluído com sucesso.\n\n'
+        'Você já pode retirar seu veículo. Obrigado pela preferência! 😊'
+    ),
+    'agendamento_cancelado': Template(
+        'Olá $nome! ⚠️\n\n'
+        'Informamos que seu agendamento para o dia *$data* às *$horario* foi cancelado.\n\n'
+        '🚗 Veículo: *$veiculo*$placa\n\n'
+        'Se desejar reagendar, entre em contato conosco. Estamos à disposição! 📞'
+    ),
+    'confirmacao_agendamento': Template(
+        'Olá $nome! 📅\n\n'
+        'Lembramos do seu agendamento para o dia *$data* às *$horario*.\n\n'
+        '🚗 Veículo: *$veiculo*$placa\n\n'
+        'Responda esta mensagem para confirmar ou, se precisar, reagendar. Até lá! 😊'
+    ),
+}
+
+
+def renderizar(modelo, contexto):
+    return MODELOS[modelo].substitute(contexto)
+
+
+def contexto_agendamento(agendamento):
+    """Variáveis dos modelos a partir do agendamento (com usuario e veiculo carregados)"""
+    veiculo = agendamento.veiculo
+    return {
+        'nome': agendamento.usuario.first_name or 'Cliente',
+        'veiculo': f'{veiculo.marca} {veiculo.modelo}',
+        'placa': f' (placa: {veiculo.placa})' if veiculo.placa else '',
+        'data': agendamento.data_agendamento.strftime('%d/%m/%Y'),
+        'horario': agendamento.horario_agendamento.strftime('%H:%M'),
+    }
+
+
+def _mensagem_agendamento(modelo, agendamento, referencia):
+    return OutboundMessage(
+        usuario_id=agendamento.usuario_id,
+        telefone=agendamento.usuario.telefone_e164,
+        modelo=modelo,
+        texto=renderizar(modelo, contexto_agendamento(agendamento)),
+        referencia=referencia,
+    )
+
+
+def enfileirar_mudanca_situacao(agendamento):
+    """
+    Enfileira a mensagem da situação atual do agendamento (concluído/cancelado)
+
+    Chamar logo após o save que mudou a situação: a referência leva o
+    atualizado_em desse save, então cancelar, reativar e cancelar de novo gera
+    um segundo aviso, e repetir a chamada para a mesma mudança não duplica.
+    Retorna a mensagem (a já existente, se esta mudança foi enfileirada antes)
+    ou None quando a situação não gera mensagem ou o cliente não tem telefone válido.
+    """
+    modelo = MODELOS_POR_SITUACAO.get(agendamento.situacao)
+    if modelo is None or not agendamento.usuario.telefone_e164:
+        return None
+    referencia = f'{modelo}:{agendamento.id}:{agendamento.atualizado_em:%Y%m%d%H%M%S%f}'
+    existente = OutboundMessage.objects.filter(referencia=referencia).first()
+    if existente is not None:
+        return existente
+    try:
+        with transaction.atomic():
+            mensagem = _mensagem_agendamento(modelo, agendamento, referencia)
+            mensagem.save()
+            return mensagem
+    except IntegrityError:
+        return OutboundMessage.objects.get(referencia=referencia)
+
+
+def assumir_envio_manual(mensagem):
+    """
+    Marca a mensagem pendente como enviada pelo atendente (link wa.me)
+
+    Retorna o link, ou None se a mensagem já saiu pelo backend ou foi assumida antes.
+    """
+    assumida = OutboundMessage.objects.filter(pk=mensagem.pk, situacao='pending').update(
+        situacao='sent', enviada_em=timezone.now(),
+    )
+    return mensagem.whatsapp_url if assumida else None
+
+
+def gerar_confirmacoes(data):
+    """
+    Enfileira a confirmação de todos os agendamentos ativos do dia (uma consulta)
+
+    Repetir a geração não duplica mensagens. Retorna (geradas, sem_telefone).
+    """
+    from appointments.models import Appointment
+
+    agendamentos = list(
+        Appointment.objects.filter(data_agendamento=data, situacao__in=('pending', 'confirmed'))
+        .select_related('usuario', 'veiculo')
+    )
+    com_telefone = [agendamento for agendamento in agendamentos if agendamento.usuario.telefone_e164]
+    referencias = {
+        agendamento.id: f'confirmacao_agendamento:{agendamento.id}:{data:%Y-%m-%d}'
+        for agendamento in com_telefone
+    }
+    existentes = set(
+        OutboundMessage.objects.filter(referencia__in=referencias.values()).values_list('referencia', flat=True)
+    )
+    novas = [
+        _mensagem_agendamento('confirmacao_agendamento', agendamento, referencias[agendamento.id])
+        for agendamento in com_telefone
+        if referencias[agendamento.id] not in existentes
+    ]
+    OutboundMessage.objects.bulk_create(novas, ignore_conflicts=True)
+    return len(novas), len(agendamentos) - len(com_telefone)
+
+
+# Backends de envio
+
+class ConsoleBackend:
+    """Escreve as mensagens no log em vez de enviá-las"""
+
+    def enviar(self, mensagens):
+        for mensagem in mensagens:
+            logger.info('Mensagem %s para %s:\n%s', mensagem.id, mensagem.telefone, mensagem.texto)
+        return {}
+
+
+class FileBackend:
+    """Acrescenta as mensagens, uma linha JSON cada, em settings.MENSAGENS_ARQUIVO"""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or getattr(settings, 'MENSAGENS_ARQUIVO', ARQUIVO_PADRAO)
+
+    def enviar(self, mensagens):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            for mensagem in mensagens:
+                arquivo.write(json.dumps({
+                    'id': mensagem.id,
+                    'canal': mensagem.canal,
+                    'telefone': mensagem.telefone,
+                    'modelo': mensagem.modelo,
+                    'texto': mensagem.texto,
+                    'enviada_em': timezone.now().isoformat(),
+                }, ensure_ascii=False) + '\n')
+        return {}
+
+
+def obter_backend():
+    return import_string(getattr(settings, 'MENSAGENS_BACKEND', BACKEND_PADRAO))()
+
+
+def enviar_pendentes(lote=TAMANHO_LOTE, backend=None, maximo_tentativas=MAXIMO_TENTATIVAS):
+    """
+    Envia as mensagens pendentes em lotes, na ordem de chegada
+
+    As que falham continuam pendentes até esgotar as tentativas (e então
+    ficam como 'failed'); nesta execução cada mensagem é tentada uma vez.
+    Retorna (enviadas, falhas).
+    """
+    backend = backend or obter_backend()
+    enviadas = falhas = 0
+    ultimo_id = 0
+    while True:
+        mensagens = list(
+            OutboundMessage.objects.filter(situacao='pending', id__gt=ultimo_id).order_by('id')[:lote]
+        )
+        if not mensagens:
+            break
+        ultimo_id = mensagens[-1].id
+
+        try:
+            erros = backend.enviar(mensagens)
+        except Exception as e:
+            logger.exception('Falha no backend de mensagens')
+            erros = {mensagem.id: str(e) for mensagem in mensagens}
+
+        sucesso = [mensagem.id for mensagem in mensagens if mensagem.id not in erros]
+        OutboundMessage.objects.filter(id__in=sucesso).update(
+            situacao='sent', enviada_em=timezone.now(), tentativas=F('tentativas') + 1, erro='',
+        )
+        for mensagem in mensagens:
+            if mensagem.id in erros:
+                OutboundMessage.objects.filter(id=mensagem.id).update(
+                    tentativas=F('tentativas') + 1,
+                    erro=erros[mensagem.id],
+                    situacao='failed' if mensagem.tentativas + 1 >= maximo_tentativas else 'pending',
+                )
+        enviadas += len(sucesso)
+        falhas += len(erros)
+    return enviadas, falhas
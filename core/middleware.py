@@ -1,6 +1,6 @@
 # core/middleware.py
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.auth.signals import user_logged_in
+from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.shortcuts import redirect
 
@@ -48,4 +48,15 @@ def update_last_login_ip(sender, request, user, **kwargs):
     """
     if hasattr(request, 'user_ip'):
         user.ultimo_ip_login = request.user_ip
-        user.save(update_fields=['ultimo_ip_login'])
\ No newline at end of file
+        user.save(update_fields=['ultimo_ip_login'])
+
+
+@receiver(user_logged_out)
+def invalidate_websocket_session_cache(sender, request, user, **kwargs):
+    """
+    Remove o usuário da sessão encerrada do cache de autenticação dos WebSockets
+    """
+    from .websocket_admission import invalidar_sessao
+    
+    if request is not None and hasattr(request, 'session'):
+        invalidar_sessao(request.session.session_key)
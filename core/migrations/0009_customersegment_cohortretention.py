@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_alter_galleryimage_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortRetention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coorte', models.DateField(unique=True, verbose_name='Coorte')),
+                ('clientes', models.IntegerField(default=0, verbose_name='Clientes na Coorte')),
+                ('retencao', models.JSONField(default=list, verbose_name='Retenção Mensal (%)')),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Retenção por Coorte',
+                'verbose_name_plural': 'Retenção por Coorte',
+                'db_table': 'core_cohort_retention',
+                'ordering': ['-coorte'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerSegment',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='segmento', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Cliente')),
+                ('segmento', models.CharField(choices=[('campeoes', 'Campeões'), ('fieis', 'Fiéis'), ('promissores', 'Promissores'), ('novos', 'Novos'), ('atencao', 'Precisam de Atenção'), ('em_risco', 'Em Risco'), ('hibernando', 'Hibernando'), ('perdidos', 'Perdidos'), ('sem_compras', 'Sem Compras')], db_index=True, max_length=20, verbose_name='Segmento')),
+                ('recencia_dias', models.IntegerField(blank=True, null=True, verbose_name='Dias desde o último serviço')),
+                ('frequencia', models.IntegerField(default=0, verbose_name='Frequência')),
+                ('valor_monetario', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor Gasto')),
+                ('score_recencia', models.PositiveSmallIntegerField(default=0, verbose_name='Score R')),
+                ('score_frequencia', models.PositiveSmallIntegerField(default=0, verbose_name='Score F')),
+                ('score_monetario', models.PositiveSmallIntegerField(default=0, verbose_name='Score M')),
+                ('coorte', models.DateField(blank=True, null=True, verbose_name='Coorte (mês do primeiro serviço)')),
+                ('ultimo_servico', models.DateField(blank=True, null=True, verbose_name='Último serviço')),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Segmento de Cliente',
+                'verbose_name_plural': 'Segmentos de Clientes',
+                'db_table': 'core_customer_segment',
+            },
+        ),
+    ]
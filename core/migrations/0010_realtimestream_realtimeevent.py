@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_customersegment_cohortretention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealtimeStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grupo', models.CharField(max_length=100, unique=True, verbose_name='Grupo')),
+                ('ultima_sequencia', models.PositiveBigIntegerField(default=0, verbose_name='Última Sequência')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fluxos_tempo_real', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Fluxo em Tempo Real',
+                'verbose_name_plural': 'Fluxos em Tempo Real',
+                'db_table': 'core_realtime_stream',
+            },
+        ),
+        migrations.CreateModel(
+            name='RealtimeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveIntegerField(verbose_name='Posição no Buffer')),
+                ('sequencia', models.PositiveBigIntegerField(verbose_name='Sequência')),
+                ('texto', models.TextField(verbose_name='Evento (JSON)')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('fluxo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='core.realtimestream', verbose_name='Fluxo')),
+            ],
+            options={
+                'verbose_name': 'Evento em Tempo Real',
+                'verbose_name_plural': 'Eventos em Tempo Real',
+                'db_table': 'core_realtime_event',
+                'ordering': ['sequencia'],
+                'indexes': [models.Index(fields=['fluxo', 'sequencia'], name='core_realtime_event_seq_idx')],
+                'unique_together': {('fluxo', 'posicao')},
+            },
+        ),
+    ]
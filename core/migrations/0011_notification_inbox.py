@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_nao_lidas(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Notification = apps.get_model('core', 'Notification')
+    totais = (
+        Notification.objects.filter(lida=False)
+        .values('usuario').annotate(total=Count('id')).values_list('usuario', 'total')
+    )
+    for usuario_id, total in totais:
+        User.objects.filter(pk=usuario_id).update(notificacoes_nao_lidas=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_realtimestream_realtimeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notificacoes_nao_lidas',
+            field=models.PositiveIntegerField(default=0, verbose_name='Notificações não lidas'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['usuario', 'lida', 'criada_em'], name='core_notif_usuario_lida_idx'),
+        ),
+        migrations.RunPython(preencher_nao_lidas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0011_notification_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulo', models.CharField(max_length=200, verbose_name='Título')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('situacao', models.CharField(choices=[('draft', 'Rascunho'), ('sending', 'Enviando'), ('sent', 'Enviada')], default='draft', max_length=20, verbose_name='Situação')),
+                ('total_destinatarios', models.PositiveIntegerField(default=0, verbose_name='Destinatários')),
+                ('enviados', models.PositiveIntegerField(default=0, verbose_name='Enviados')),
+                ('ultimo_usuario_id', models.PositiveBigIntegerField(default=0, verbose_name='Último destinatário processado')),
+                ('criada_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criada em')),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')),
+                ('concluida_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluída em')),
+            ],
+            options={
+                'verbose_name': 'Campanha',
+                'verbose_name_plural': 'Campanhas',
+                'db_table': 'core_campaign',
+                'ordering': ['-criada_em'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('aceita_marketing', True), ('funcao', 'client'), ('is_active', True)), fields=['id'], name='core_user_marketing_idx'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='criada_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campanhas', to=settings.AUTH_USER_MODEL, verbose_name='Criada por'),
+        ),
+    ]
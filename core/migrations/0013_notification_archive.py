@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_campaign'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulo', models.CharField(max_length=200, verbose_name='Título')),
+                ('mensagem', models.TextField(verbose_name='Mensagem')),
+                ('tipo', models.CharField(choices=[('appointment', 'Agendamento'), ('reminder', 'Lembrete'), ('promotion', 'Promoção'), ('system', 'Sistema')], max_length=20, verbose_name='Tipo')),
+                ('lida', models.BooleanField(default=False, verbose_name='Lida')),
+                ('criada_em', models.DateTimeField(verbose_name='Criada em')),
+                ('arquivada_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Arquivada em')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_arquivadas', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Notificação Arquivada',
+                'verbose_name_plural': 'Notificações Arquivadas',
+                'db_table': 'core_notification_archive',
+                'ordering': ['-criada_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+from core.telefones import normalizar_telefone
+
+
+def preencher_telefone_e164(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    for usuario_id, telefone in User.objects.exclude(telefone__isnull=True).exclude(telefone='').values_list('id', 'telefone'):
+        User.objects.filter(pk=usuario_id).update(telefone_e164=normalizar_telefone(telefone))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='telefone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, verbose_name='Telefone (E.164)'),
+        ),
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('whatsapp', 'WhatsApp')], default='whatsapp', max_length=20, verbose_name='Canal')),
+                ('telefone', models.CharField(max_length=16, verbose_name='Telefone (E.164)')),
+                ('modelo', models.CharField(max_length=50, verbose_name='Modelo')),
+                ('texto', models.TextField(verbose_name='Texto')),
+                ('referencia', models.CharField(max_length=100, unique=True, verbose_name='Referência')),
+                ('situacao', models.CharField(choices=[('pending', 'Pendente'), ('sent', 'Enviada'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Situação')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('erro', models.TextField(blank=True, verbose_name='Último erro')),
+                ('criada_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criada em')),
+                ('enviada_em', models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mensagens_saida', to=settings.AUTH_USER_MODEL, verbose_name='Destinatário')),
+            ],
+            options={
+                'verbose_name': 'Mensagem de Saída',
+                'verbose_name_plural': 'Mensagens de Saída',
+                'db_table': 'core_outbound_message',
+                'ordering': ['-criada_em'],
+                'indexes': [models.Index(fields=['situacao', 'id'], name='core_outbound_situacao_idx')],
+            },
+        ),
+        migrations.RunPython(preencher_telefone_e164, migrations.RunPython.noop),
+    ]
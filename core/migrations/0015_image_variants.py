@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_outbound_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryimage',
+            name='variantes',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Variantes responsivas'),
+        ),
+        migrations.AddField(
+            model_name='herobackground',
+            name='variantes',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Variantes responsivas'),
+        ),
+        migrations.AddField(
+            model_name='heroimage',
+            name='variantes',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Variantes responsivas'),
+        ),
+    ]
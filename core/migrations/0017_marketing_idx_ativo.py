@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0016_media_blob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='core_user_marketing_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('aceita_marketing', True), ('ativo', True), ('funcao', 'client'), ('is_active', True)), fields=['id'], name='core_user_marketing_idx'),
+        ),
+    ]
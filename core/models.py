@@ -2,6 +2,10 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
 from decimal import Decimal
+from urllib.parse import quote
+
+from .renditions import fontes
+from .telefones import normalizar_telefone
 
 
 class User(AbstractUser):
@@ -16,6 +20,7 @@ class User(AbstractUser):
     
     email = models.EmailField(unique=True, verbose_name='E-mail')
     telefone = models.CharField(max_length=20, blank=True, null=True, verbose_name='Telefone')
+    telefone_e164 = models.CharField(max_length=16, blank=True, null=True, editable=False, verbose_name='Telefone (E.164)')
     funcao = models.CharField(max_length=20, choices=ROLE_CHOICES, default='client', verbose_name='Função')
     criado_em = models.DateTimeField(default=timezone.now, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
@@ -34,6 +39,9 @@ class User(AbstractUser):
     email_verificado = models.BooleanField(default=False, verbose_name='E-mail verificado')
     ultimo_ip_login = models.GenericIPAddressField(blank=True, null=True, verbose_name='Último IP de login')
     
+    # Mantido com F() a cada notificação criada/lida (ver core/notifications.py), sem COUNT(*)
+    notificacoes_nao_lidas = models.PositiveIntegerField(default=0, verbose_name='Notificações não lidas')
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
@@ -41,10 +49,26 @@ class User(AbstractUser):
         db_table = 'core_user'
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
+        indexes = [
+            # Destinatários de campanhas (core/campaigns.py), percorridos por id
+            models.Index(
+                fields=['id'],
+                condition=models.Q(funcao='client', aceita_marketing=True, ativo=True, is_active=True),
+                name='core_user_marketing_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
     
+    def save(self, *args, **kwargs):
+        # E.164 calculado uma vez aqui, e não a cada mensagem enviada
+        self.telefone_e164 = normalizar_telefone(self.telefone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'telefone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'telefone_e164'}
+        super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
@@ -80,6 +104,10 @@ class Notification(models.Model):
     class Meta:
         db_table = 'core_notification'
         ordering = ['-criada_em']
+        indexes = [
+            # Caixa de entrada: não lidas/todas do usuário, da mais recente para a mais antiga
+            models.Index(fields=['usuario', 'lida', 'criada_em'], name='core_notif_usuario_lida_idx'),
+        ]
         verbose_name = 'Notificação'
         verbose_name_plural = 'Notificações'
     
@@ -87,10 +115,151 @@ class Notification(models.Model):
         return f"{self.titulo} - {self.usuario.full_name}"
 
 
+class NotificationArchive(models.Model):
+    """
+    Notificação retirada da caixa de entrada pela política de retenção (comando limpar_notificacoes --arquivar)
+    
+    Mantém o id original da notificação.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notificacoes_arquivadas', verbose_name='Usuário')
+    titulo = models.CharField(max_length=200, verbose_name='Título')
+    mensagem = models.TextField(verbose_name='Mensagem')
+    tipo = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES, verbose_name='Tipo')
+    lida = models.BooleanField(default=False, verbose_name='Lida')
+    criada_em = models.DateTimeField(verbose_name='Criada em')
+    arquivada_em = models.DateTimeField(default=timezone.now, verbose_name='Arquivada em')
+    
+    class Meta:
+        db_table = 'core_notification_archive'
+        ordering = ['-criada_em']
+        verbose_name = 'Notificação Arquivada'
+        verbose_name_plural = 'Notificações Arquivadas'
+    
+    def __str__(self):
+        return f"{self.titulo} ({self.criada_em:%d/%m/%Y})"
+
+
+class OutboundMessage(models.Model):
+    """
+    Mensagem na caixa de saída (WhatsApp), gerada pelo renderizador de core/messaging.py
+    
+    A requisição só grava a mensagem; o envio fica com o comando enviar_mensagens
+    e o backend configurado em MENSAGENS_BACKEND. 'referencia' identifica o
+    motivo da mensagem (ex.: confirmacao:<agendamento>:<data>) e impede duplicatas
+    quando a geração em lote é repetida.
+    """
+    CHANNEL_CHOICES = [
+        ('whatsapp', 'WhatsApp'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('sent', 'Enviada'),
+        ('failed', 'Falhou'),
+    ]
+    
+    canal = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default='whatsapp', verbose_name='Canal')
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='mensagens_saida', verbose_name='Destinatário')
+    telefone = models.CharField(max_length=16, verbose_name='Telefone (E.164)')
+    modelo = models.CharField(max_length=50, verbose_name='Modelo')
+    texto = models.TextField(verbose_name='Texto')
+    referencia = models.CharField(max_length=100, unique=True, verbose_name='Referência')
+    situacao = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='Situação')
+    tentativas = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+    erro = models.TextField(blank=True, verbose_name='Último erro')
+    criada_em = models.DateTimeField(default=timezone.now, verbose_name='Criada em')
+    enviada_em = models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')
+    
+    class Meta:
+        db_table = 'core_outbound_message'
+        ordering = ['-criada_em']
+        indexes = [
+            # Fila do enviador: pendentes na ordem de chegada
+            models.Index(fields=['situacao', 'id'], name='core_outbound_situacao_idx'),
+        ]
+        verbose_name = 'Mensagem de Saída'
+        verbose_name_plural = 'Mensagens de Saída'
+    
+    def __str__(self):
+        return f"{self.modelo} para {self.telefone} ({self.get_situacao_display()})"
+    
+    @property
+    def whatsapp_url(self):
+        """Link wa.me com o texto da mensagem (o número vai sem o '+')"""
+        return f"https://wa.me/{self.telefone.lstrip('+')}?text={quote(self.texto)}"
+
+
+class Campaign(models.Model):
+    """
+    Campanha de marketing entregue como notificação 'promotion' aos clientes que aceitam marketing
+    
+    O envio percorre os destinatários em lotes por id; ultimo_usuario_id guarda
+    até onde chegou, então um envio interrompido continua de onde parou.
+    """
+    STATUS_CHOICES = [
+        ('draft', 'Rascunho'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviada'),
+    ]
+    
+    titulo = models.CharField(max_length=200, verbose_name='Título')
+    mensagem = models.TextField(verbose_name='Mensagem')
+    situacao = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name='Situação')
+    criada_por = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='campanhas', verbose_name='Criada por')
+    total_destinatarios = models.PositiveIntegerField(default=0, verbose_name='Destinatários')
+    enviados = models.PositiveIntegerField(default=0, verbose_name='Enviados')
+    ultimo_usuario_id = models.PositiveBigIntegerField(default=0, verbose_name='Último destinatário processado')
+    criada_em = models.DateTimeField(default=timezone.now, verbose_name='Criada em')
+    iniciada_em = models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')
+    concluida_em = models.DateTimeField(blank=True, null=True, verbose_name='Concluída em')
+    
+    class Meta:
+        db_table = 'core_campaign'
+        ordering = ['-criada_em']
+        verbose_name = 'Campanha'
+        verbose_name_plural = 'Campanhas'
+    
+    def __str__(self):
+        return f"{self.titulo} ({self.get_situacao_display()})"
+    
+    @property
+    def progresso(self):
+        """Percentual enviado"""
+        if not self.total_destinatarios:
+            return 100 if self.situacao == 'sent' else 0
+        return round(self.enviados * 100 / self.total_destinatarios, 1)
+
+
+class MediaBlob(models.Model):
+    """
+    Arquivo de mídia gravado pelo storage por conteúdo (core/storage.py)
+    
+    Arquivos iguais viram um só, compartilhado pelos registros que o usam;
+    'referencias' conta esses registros e o arquivo (com suas variantes) só é
+    apagado quando a contagem zera. Mantido pelos sinais de core/signals.py.
+    """
+    nome = models.CharField(max_length=255, unique=True, verbose_name='Arquivo')
+    referencias = models.PositiveIntegerField(default=0, verbose_name='Referências')
+    tamanho = models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    
+    class Meta:
+        db_table = 'core_media_blob'
+        ordering = ['nome']
+        verbose_name = 'Arquivo de Mídia'
+        verbose_name_plural = 'Arquivos de Mídia'
+    
+    def __str__(self):
+        return f"{self.nome} ({self.referencias} referências)"
+
+
 class GalleryImage(models.Model):
     """
     Modelo para gerenciar imagens da galeria
     """
+    # Imagem com variantes WebP/AVIF geradas em segundo plano (core/renditions.py)
+    CAMPO_IMAGEM = 'imagem'
+    
     CATEGORY_CHOICES = [
         ('work', 'Trabalho Realizado'),
         ('before_after', 'Antes e Depois'),
@@ -101,6 +270,7 @@ class GalleryImage(models.Model):
     titulo = models.CharField(max_length=200, verbose_name='Título')
     descricao = models.TextField(blank=True, null=True, verbose_name='Descrição')
     imagem = models.ImageField(upload_to='gallery/', verbose_name='Imagem')
+    variantes = models.JSONField(default=list, blank=True, editable=False, verbose_name='Variantes responsivas')
     categoria = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='work', verbose_name='Categoria')
     texto_alternativo = models.CharField(max_length=200, verbose_name='Texto alternativo')
     destacada = models.BooleanField(default=False, verbose_name='Destacada')
@@ -117,6 +287,11 @@ class GalleryImage(models.Model):
     
     def __str__(self):
         return self.titulo
+    
+    @property
+    def fontes(self):
+        """<source> responsivos (srcset por formato) das variantes já geradas"""
+        return fontes(self.variantes)
 
 
 class ServiceImage(models.Model):
@@ -158,9 +333,13 @@ class HeroImage(models.Model):
     """
     Modelo para gerenciar imagens do hero/banner principal
     """
+    # Imagem com variantes WebP/AVIF geradas em segundo plano (core/renditions.py)
+    CAMPO_IMAGEM = 'imagem'
+    
     titulo = models.CharField(max_length=200, verbose_name='Título')
     descricao = models.TextField(blank=True, null=True, verbose_name='Descrição')
     imagem = models.ImageField(upload_to='hero/', verbose_name='Imagem')
+    variantes = models.JSONField(default=list, blank=True, editable=False, verbose_name='Variantes responsivas')
     texto_alternativo = models.CharField(max_length=200, verbose_name='Texto alternativo')
     ativa = models.BooleanField(default=True, verbose_name='Ativa')
     ordem = models.PositiveIntegerField(default=0, verbose_name='Ordem de exibição')
@@ -175,12 +354,20 @@ class HeroImage(models.Model):
     
     def __str__(self):
         return self.titulo
+    
+    @property
+    def fontes(self):
+        """<source> responsivos (srcset por formato) das variantes já geradas"""
+        return fontes(self.variantes)
 
 
 class HeroBackground(models.Model):
     """
     Modelo para gerenciar imagem de background do hero com transparência
     """
+    # Imagem com variantes WebP/AVIF geradas em segundo plano (core/renditions.py)
+    CAMPO_IMAGEM = 'imagem_fundo'
+    
     TRANSPARENCY_CHOICES = [
         (0.1, '10% - Muito sutil'),
         (0.2, '20% - Sutil'),
@@ -197,6 +384,7 @@ class HeroBackground(models.Model):
     titulo = models.CharField(max_length=200, verbose_name='Título')
     descricao = models.TextField(blank=True, null=True, verbose_name='Descrição')
     imagem_fundo = models.ImageField(upload_to='hero/backgrounds/', verbose_name='Imagem de Background')
+    variantes = models.JSONField(default=list, blank=True, editable=False, verbose_name='Variantes responsivas')
     texto_alternativo = models.CharField(max_length=200, verbose_name='Texto alternativo')
     transparencia = models.FloatField(
         choices=TRANSPARENCY_CHOICES, 
@@ -219,6 +407,11 @@ class HeroBackground(models.Model):
     def __str__(self):
         return f"{self.titulo} (Transparência: {int(self.transparencia * 100)}%)"
     
+    @property
+    def fontes(self):
+        """<source> responsivos (srcset por formato) das variantes já geradas"""
+        return fontes(self.variantes)
+    
     @property
     def css_opacity(self):
         """Retorna o valor de opacidade para CSS"""
@@ -347,3 +540,120 @@ class ServiceIcon(models.Model):
         if self.preco_apartir:
             return f"A partir de R$ {self.preco_apartir:.0f}"
         return "Preço sob consulta"
+
+
+class CustomerSegment(models.Model):
+    """
+    Segmento RFM (recência, frequência, valor) de cada cliente, calculado em lote
+    """
+    SEGMENT_CHOICES = [
+        ('campeoes', 'Campeões'),
+        ('fieis', 'Fiéis'),
+        ('promissores', 'Promissores'),
+        ('novos', 'Novos'),
+        ('atencao', 'Precisam de Atenção'),
+        ('em_risco', 'Em Risco'),
+        ('hibernando', 'Hibernando'),
+        ('perdidos', 'Perdidos'),
+        ('sem_compras', 'Sem Compras'),
+    ]
+    
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='segmento', verbose_name='Cliente')
+    segmento = models.CharField(max_length=20, choices=SEGMENT_CHOICES, db_index=True, verbose_name='Segmento')
+    recencia_dias = models.IntegerField(blank=True, null=True, verbose_name='Dias desde o último serviço')
+    frequencia = models.IntegerField(default=0, verbose_name='Frequência')
+    valor_monetario = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Valor Gasto')
+    score_recencia = models.PositiveSmallIntegerField(default=0, verbose_name='Score R')
+    score_frequencia = models.PositiveSmallIntegerField(default=0, verbose_name='Score F')
+    score_monetario = models.PositiveSmallIntegerField(default=0, verbose_name='Score M')
+    coorte = models.DateField(blank=True, null=True, verbose_name='Coorte (mês do primeiro serviço)')
+    ultimo_servico = models.DateField(blank=True, null=True, verbose_name='Último serviço')
+    calculado_em = models.DateTimeField(default=timezone.now, verbose_name='Calculado em')
+    
+    class Meta:
+        db_table = 'core_customer_segment'
+        verbose_name = 'Segmento de Cliente'
+        verbose_name_plural = 'Segmentos de Clientes'
+    
+    def __str__(self):
+        return f"{self.usuario.full_name} - {self.get_segmento_display()}"
+    
+    @property
+    def rfm(self):
+        """Código RFM no formato '545'"""
+        return f"{self.score_recencia}{self.score_frequencia}{self.score_monetario}"
+
+
+class CohortRetention(models.Model):
+    """
+    Retenção mensal de uma coorte de clientes (mês do primeiro serviço)
+    
+    'retencao' guarda o percentual da coorte ativo em cada mês desde a entrada.
+    """
+    coorte = models.DateField(unique=True, verbose_name='Coorte')
+    clientes = models.IntegerField(default=0, verbose_name='Clientes na Coorte')
+    retencao = models.JSONField(default=list, verbose_name='Retenção Mensal (%)')
+    calculado_em = models.DateTimeField(default=timezone.now, verbose_name='Calculado em')
+    
+    class Meta:
+        db_table = 'core_cohort_retention'
+        ordering = ['-coorte']
+        verbose_name = 'Retenção por Coorte'
+        verbose_name_plural = 'Retenção por Coorte'
+    
+    def __str__(self):
+        return f"Coorte {self.coorte:%m/%Y} ({self.clientes} clientes)"
+    
+    @property
+    def retencao_exibicao(self):
+        """Primeiros 12 meses com a opacidade usada no mapa de calor"""
+        return [
+            {'percentual': percentual, 'opacidade': min(percentual / 100, 1)}
+            for percentual in self.retencao[:12]
+        ]
+
+
+class RealtimeStream(models.Model):
+    """
+    Fluxo de eventos em tempo real de um grupo individual (ex.: client_5)
+    
+    Guarda o último número de sequência atribuído aos eventos do grupo.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='fluxos_tempo_real', verbose_name='Usuário')
+    grupo = models.CharField(max_length=100, unique=True, verbose_name='Grupo')
+    ultima_sequencia = models.PositiveBigIntegerField(default=0, verbose_name='Última Sequência')
+    
+    class Meta:
+        db_table = 'core_realtime_stream'
+        verbose_name = 'Fluxo em Tempo Real'
+        verbose_name_plural = 'Fluxos em Tempo Real'
+    
+    def __str__(self):
+        return f"{self.grupo} (#{self.ultima_sequencia})"
+
+
+class RealtimeEvent(models.Model):
+    """
+    Evento já serializado de um fluxo, guardado em buffer circular
+    
+    Cada fluxo ocupa no máximo TAMANHO_BUFFER_EVENTOS posições: o evento de
+    sequência N sobrescreve a posição N % TAMANHO_BUFFER_EVENTOS.
+    """
+    fluxo = models.ForeignKey(RealtimeStream, on_delete=models.CASCADE, related_name='eventos', verbose_name='Fluxo')
+    posicao = models.PositiveIntegerField(verbose_name='Posição no Buffer')
+    sequencia = models.PositiveBigIntegerField(verbose_name='Sequência')
+    texto = models.TextField(verbose_name='Evento (JSON)')
+    criado_em = models.DateTimeField(default=timezone.now, verbose_name='Criado em')
+    
+    class Meta:
+        db_table = 'core_realtime_event'
+        ordering = ['sequencia']
+        verbose_name = 'Evento em Tempo Real'
+        verbose_name_plural = 'Eventos em Tempo Real'
+        unique_together = ['fluxo', 'posicao']
+        indexes = [
+            models.Index(fields=['fluxo', 'sequencia'], name='core_realtime_event_seq_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fluxo.grupo} #{self.sequencia}"
@@ -0,0 +1,165 @@
+"""
+Caixa de entrada de notificações
+
+A caixa de um usuário é lida pelo índice (usuario, lida, criada_em): a página
+seguinte parte do último item visto (criada_em, id), sem OFFSET, e o polling
+pede só o que chegou depois do maior id conhecido. O total de não lidas fica
+em User.notificacoes_nao_lidas e é ajustado com F() sempre que uma notificação
+é criada, lida ou removida (sinais em core/signals.py para operações por
+instância, funções abaixo para operações em lote), então o contador do sino
+não precisa de COUNT(*).
+
+Atualizações em lote feitas fora destas funções (QuerySet.update,
+bulk_create) não passam pelos sinais; nesses casos use incrementar_nao_lidas,
+descontar_nao_lidas ou recalcular_nao_lidas.
+"""
+
+import base64
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Notification, User
+
+TAMANHO_PAGINA = 20
+TAMANHO_MAXIMO_PAGINA = 100
+
+
+def ajustar_nao_lidas(usuario_id, delta):
+    """Soma delta ao contador do usuário (nunca abaixo de zero)"""
+    if not delta:
+        return
+    if delta > 0:
+        valor = F('notificacoes_nao_lidas') + delta
+    else:
+        valor = Greatest(F('notificacoes_nao_lidas') + delta, Value(0))
+    User.objects.filter(pk=usuario_id).update(notificacoes_nao_lidas=valor)
+
+
+def _por_quantidade(quantidades):
+    """{usuario_id: n} -> {n: [usuario_id, ...]}, para um UPDATE por valor distinto de n"""
+    agrupados = defaultdict(list)
+    for usuario_id, quantidade in quantidades.items():
+        if quantidade:
+            agrupados[quantidade].append(usuario_id)
+    return agrupados.items()
+
+
+def incrementar_nao_lidas(quantidades):
+    """
+    Soma as novas não lidas de vários usuários ({usuario_id: n}) depois de um bulk_create
+
+    Um UPDATE por valor distinto de n, e não um por usuário.
+    """
+    for quantidade, usuarios in _por_quantidade(quantidades):
+        User.objects.filter(pk__in=usuarios).update(
+            notificacoes_nao_lidas=F('notificacoes_nao_lidas') + quantidade
+        )
+
+
+def descontar_nao_lidas(quantidades):
+    """Subtrai as não lidas de vários usuários ({usuario_id: n}) depois de uma remoção em lote"""
+    for quantidade, usuarios in _por_quantidade(quantidades):
+        User.objects.filter(pk__in=usuarios).update(
+            notificacoes_nao_lidas=Greatest(F('notificacoes_nao_lidas') - quantidade, Value(0))
+        )
+
+
+def marcar_lidas(usuario_id, ids=None):
+    """
+    Marca como lidas as notificações do usuário (todas, com ids=None) e ajusta o contador
+
+    Só as que ainda estavam não lidas entram na conta; retorna quantas mudaram.
+    """
+    with transaction.atomic():
+        notificacoes = Notification.objects.filter(usuario_id=usuario_id, lida=False)
+        if ids is not None:
+            notificacoes = notificacoes.filter(id__in=ids)
+        alteradas = notificacoes.update(lida=True)
+        ajustar_nao_lidas(usuario_id, -alteradas)
+    return alteradas
+
+
+def recalcular_nao_lidas(usuario_ids=None):
+    """Refaz o contador a partir da tabela (correção ou após alterações em lote)"""
+    usuarios = User.objects.all()
+    if usuario_ids is not None:
+        usuarios = usuarios.filter(pk__in=usuario_ids)
+    totais = dict(
+        Notification.objects.filter(lida=False, usuario__in=usuarios)
+        .values('usuario').annotate(total=Count('id')).values_list('usuario', 'total')
+    )
+    corrigidos = 0
+    for usuario_id, atual in usuarios.values_list('id', 'notificacoes_nao_lidas').iterator():
+        if totais.get(usuario_id, 0) != atual:
+            User.objects.filter(pk=usuario_id).update(notificacoes_nao_lidas=totais.get(usuario_id, 0))
+            corrigidos += 1
+    return corrigidos
+
+
+def nao_lidas(usuario_id):
+    return User.objects.filter(pk=usuario_id).values_list('notificacoes_nao_lidas', flat=True).first() or 0
+
+
+# Paginação por chave
+
+def codificar_cursor(notificacao):
+    texto = f'{notificacao.criada_em.isoformat()}|{notificacao.id}'
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """(criada_em, id) do cursor, ou None se for inválido"""
+    try:
+        criada_em, notificacao_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(criada_em), int(notificacao_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def tamanho_pagina(valor):
+    try:
+        return max(1, min(int(valor), TAMANHO_MAXIMO_PAGINA))
+    except (TypeError, ValueError):
+        return TAMANHO_PAGINA
+
+
+def pagina_caixa(usuario_id, cursor=None, apenas_nao_lidas=False, limite=TAMANHO_PAGINA):
+    """
+    Uma página da caixa de entrada, da mais recente para a mais antiga
+
+    Retorna (notificações, cursor da próxima página ou None).
+    """
+    notificacoes = Notification.objects.filter(usuario_id=usuario_id)
+    if apenas_nao_lidas:
+        notificacoes = notificacoes.filter(lida=False)
+    posicao = decodificar_cursor(cursor) if cursor else None
+    if posicao is not None:
+        criada_em, notificacao_id = posicao
+        notificacoes = notificacoes.filter(
+            Q(criada_em__lt=criada_em) | Q(criada_em=criada_em, id__lt=notificacao_id)
+        )
+    itens = list(notificacoes.order_by('-criada_em', '-id')[:limite + 1])
+    proximo = codificar_cursor(itens[limite - 1]) if len(itens) > limite else None
+    return itens[:limite], proximo
+
+
+def notificacoes_desde(usuario_id, desde_id, limite=TAMANHO_MAXIMO_PAGINA):
+    """Notificações criadas depois da de id desde_id (polling incremental), da mais antiga para a mais nova"""
+    return list(
+        Notification.objects.filter(usuario_id=usuario_id, id__gt=desde_id).order_by('id')[:limite]
+    )
+
+
+def serializar_notificacao(notificacao):
+    return {
+        'id': notificacao.id,
+        'titulo': notificacao.titulo,
+        'mensagem': notificacao.mensagem,
+        'tipo': notificacao.tipo,
+        'lida': notificacao.lida,
+        'criada_em': notificacao.criada_em.isoformat(),
+    }
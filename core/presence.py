@@ -0,0 +1,162 @@
+"""
+Registro de presença das conexões WebSocket
+
+Os consumers registram cada conexão ao conectar, renovam no heartbeat do
+navegador (no máximo uma vez a cada terço do TTL) e removem ao desconectar.
+Tudo fica no cache do Django, sem escrita no banco e sem leitura-e-escrita de
+estruturas compartilhadas:
+
+- uma chave por canal, criada com cache.add: quem a cria é a conexão nova,
+  quem a encontra é a renovação;
+- um contador por grupo e um por usuário, somados e descontados com
+  cache.incr/decr (atômicos no Redis e no LocMemCache; no cache em disco, que
+  faz leitura-e-escrita, as somas passam por uma trava de arquivo).
+
+Cada renovação estende o TTL das chaves (cache.touch). Conexões que somem sem
+desconectar (processo derrubado) deixam de contar quando o TTL vence; enquanto
+outra conexão do mesmo grupo renovar, o contador fica acima do real, o que só
+faz um evento ir para um grupo vazio.
+
+O cache precisa ser compartilhado entre os processos: o servidor ASGI grava a
+presença e comandos como enviar_lembretes e enviar_campanha a consultam. Com
+um cache local (LocMemCache) cada processo veria só as próprias conexões; a
+verificação core.E001 (core/checks.py) impede iniciar assim quando a camada de
+canais é compartilhada.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+TTL_PADRAO = 90  # segundos: três heartbeats do navegador (a cada 30s)
+
+TAMANHO_CONSULTA = 500  # chaves por cache.get_many ao listar usuários
+
+
+def ttl_presenca():
+    return getattr(settings, 'PRESENCA_TTL', TTL_PADRAO)
+
+
+def _chave_canal(canal):
+    return f'presenca:canal:{canal}'
+
+
+def _chave_grupo(grupo):
+    return f'presenca:grupo:{grupo}'
+
+
+def _chave_usuario(usuario_id):
+    return f'presenca:usuario:{usuario_id}'
+
+
+def _chave_desde(usuario_id):
+    return f'presenca:desde:{usuario_id}'
+
+
+@contextmanager
+def _trava():
+    """Serializa as somas entre os processos da máquina quando o cache é em disco"""
+    if not isinstance(caches['default'], FileBasedCache):
+        yield
+        return
+    import fcntl
+
+    diretorio = settings.CACHES['default']['LOCATION']
+    os.makedirs(diretorio, exist_ok=True)
+    with open(os.path.join(diretorio, 'presenca.lock'), 'a') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _somar(chaves, delta):
+    ttl = ttl_presenca()
+    with _trava():
+        for chave in chaves:
+            if delta > 0:
+                cache.add(chave, 0, ttl)
+            try:
+                cache.incr(chave, delta)
+            except ValueError:
+                # Venceu entre o add e o incr; um desconto sem contador não recria nada
+                if delta > 0:
+                    cache.set(chave, delta, ttl)
+                continue
+            cache.touch(chave, ttl)
+
+
+def registrar_conexao(usuario_id, grupos, canal):
+    """Conta a conexão do canal nos grupos e no usuário; chamada de novo, só renova o TTL"""
+    ttl = ttl_presenca()
+    contadores = [_chave_grupo(grupo) for grupo in grupos] + [_chave_usuario(usuario_id)]
+    if cache.add(_chave_canal(canal), usuario_id, ttl):
+        cache.add(_chave_desde(usuario_id), time.time(), ttl)
+        _somar(contadores, 1)
+        return
+
+    cache.touch(_chave_canal(canal), ttl)
+    cache.touch(_chave_desde(usuario_id), ttl)
+    # Contador removido do cache antes do TTL (limite de memória) volta a contar esta conexão
+    vencidos = [chave for chave in contadores if not cache.touch(chave, ttl)]
+    if vencidos:
+        _somar(vencidos, 1)
+
+
+def remover_conexao(usuario_id, grupos, canal):
+    """Desconta a conexão; se ela já tinha vencido, os contadores vencem sozinhos"""
+    if cache.delete(_chave_canal(canal)):
+        _somar([_chave_grupo(grupo) for grupo in grupos] + [_chave_usuario(usuario_id)], -1)
+
+
+def grupo_online(grupo):
+    """Indica se há alguma conexão viva no grupo (ex.: client_<id>, admin_panel)"""
+    return (cache.get(_chave_grupo(grupo)) or 0) > 0
+
+
+def conectados(usuario_ids):
+    """Subconjunto de usuario_ids com alguma conexão viva"""
+    usuario_ids = list(usuario_ids)
+    online = set()
+    for inicio in range(0, len(usuario_ids), TAMANHO_CONSULTA):
+        lote = usuario_ids[inicio:inicio + TAMANHO_CONSULTA]
+        chaves = {_chave_usuario(usuario_id): usuario_id for usuario_id in lote}
+        online.update(chaves[chave] for chave, total in cache.get_many(chaves).items() if total > 0)
+    return online
+
+
+def usuarios_online(funcao=None):
+    """
+    {usuario_id: {'funcao', 'desde', 'conexoes'}} dos usuários conectados agora
+
+    Sem índice global no cache: percorre os usuários ativos (da função, se
+    informada) e consulta os contadores em lotes de TAMANHO_CONSULTA chaves.
+    """
+    from .models import User
+
+    usuarios = User.objects.filter(is_active=True)
+    if funcao is not None:
+        usuarios = usuarios.filter(funcao=funcao)
+
+    online = {}
+    agora = time.time()
+    candidatos = list(usuarios.values_list('id', 'funcao'))
+    for inicio in range(0, len(candidatos), TAMANHO_CONSULTA):
+        lote = dict(candidatos[inicio:inicio + TAMANHO_CONSULTA])
+        valores = cache.get_many(
+            [_chave_usuario(usuario_id) for usuario_id in lote] + [_chave_desde(usuario_id) for usuario_id in lote]
+        )
+        for usuario_id, funcao_usuario in lote.items():
+            conexoes = valores.get(_chave_usuario(usuario_id)) or 0
+            if conexoes > 0:
+                online[usuario_id] = {
+                    'funcao': funcao_usuario,
+                    'desde': valores.get(_chave_desde(usuario_id), agora),
+                    'conexoes': conexoes,
+                }
+    return online
@@ -0,0 +1,192 @@
+"""
+Variantes responsivas das imagens do site
+
+Cada imagem enviada para HeroBackground, HeroImage e GalleryImage ganha cópias
+redimensionadas (VARIANTES_LARGURAS, 480/960/1920 px) em WebP e, quando o
+Pillow tem suporte, AVIF, gravadas ao lado do original
+(hero/backgrounds/foto.jpg -> hero/backgrounds/foto.960w.webp). A lista fica
+no campo 'variantes' do modelo e vira <source srcset> nas páginas públicas:
+o navegador baixa só a largura de que precisa no formato mais leve que aceita.
+
+A conversão roda em um pool de processos (VARIANTES_PROCESSOS), disparado após
+o commit do salvamento: a requisição do admin não espera o Pillow. Até as
+variantes ficarem prontas a página usa o original. Imagens já existentes são
+convertidas pelo comando gerar_variantes. As variantes de uma imagem trocada
+saem do disco junto com o original, pela contagem de referências de
+core/media.py.
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+LARGURAS_PADRAO = (480, 960, 1920)
+PROCESSOS_PADRAO = 2
+
+# Qualidade por formato (AVIF rende o mesmo visual com qualidade nominal menor)
+QUALIDADE = {'avif': 55, 'webp': 80}
+TIPOS = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+_VARIANTE = re.compile(r'^(?P<raiz>.+)\.\d+w\.(avif|webp)$')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def formatos_disponiveis():
+    """Formatos gerados, do mais leve para o mais compatível"""
+    from PIL import features
+    return [formato for formato in ('avif', 'webp') if features.check(formato)]
+
+
+def larguras_configuradas():
+    return tuple(sorted(getattr(settings, 'VARIANTES_LARGURAS', LARGURAS_PADRAO)))
+
+
+def nome_variante(nome, largura, formato):
+    raiz, _ = os.path.splitext(nome)
+    return f'{raiz}.{largura}w.{formato}'
+
+
+def e_variante(arquivo, raiz=None):
+    """Se o nome de arquivo (sem diretório) é uma variante, de qualquer imagem ou da de 'raiz'"""
+    encontrado = _VARIANTE.match(arquivo)
+    return bool(encontrado) and (raiz is None or encontrado['raiz'] == raiz)
+
+
+def gerar_arquivos(raiz_midia, nome, larguras, formatos, sobrescrever=False):
+    """
+    Gera as variantes de uma imagem (executado nos processos do pool)
+
+    Larguras maiores que o original não são geradas; se o original for menor
+    que todas, ele mesmo vira a única largura. Com o storage por conteúdo o
+    mesmo arquivo pode ser usado por vários registros: variantes já presentes
+    no disco são reaproveitadas, salvo com 'sobrescrever'. Retorna
+    [{'largura', 'formato', 'nome'}] relativos ao MEDIA_ROOT.
+    """
+    from PIL import Image, ImageOps
+
+    variantes = []
+    with Image.open(os.path.join(raiz_midia, nome)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        alvos = [largura for largura in larguras if largura < original.width] or [original.width]
+
+        for largura in alvos:
+            reduzida = None
+            for formato in formatos:
+                destino = nome_variante(nome, largura, formato)
+                caminho = os.path.join(raiz_midia, destino)
+                if sobrescrever or not os.path.exists(caminho):
+                    if reduzida is None:
+                        altura = round(original.height * largura / original.width)
+                        reduzida = original if largura == original.width else original.resize((largura, altura), Image.LANCZOS)
+                    reduzida.save(caminho, formato.upper(), quality=QUALIDADE[formato])
+                variantes.append({'largura': largura, 'formato': formato, 'nome': destino})
+    return variantes
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: os processos não herdam as threads nem as conexões do servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'VARIANTES_PROCESSOS', PROCESSOS_PADRAO),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def campo_imagem(instancia):
+    return getattr(instancia, instancia.CAMPO_IMAGEM)
+
+
+def gerar_variantes(instancia, sobrescrever=False):
+    """Gera as variantes no processo atual e grava a lista no modelo (comando gerar_variantes)"""
+    arquivo = campo_imagem(instancia)
+    variantes = gerar_arquivos(
+        settings.MEDIA_ROOT, arquivo.name, larguras_configuradas(), formatos_disponiveis(), sobrescrever,
+    )
+    _gravar(type(instancia), instancia.pk, arquivo.name, variantes)
+    return variantes
+
+
+def agendar_variantes(instancia):
+    """Agenda a geração em segundo plano, depois do commit do salvamento"""
+    modelo, pk, nome = type(instancia), instancia.pk, campo_imagem(instancia).name
+
+    def enviar():
+        # Um processo morto quebra o pool (BrokenProcessPool) e um pool já
+        # encerrado recusa tarefas (RuntimeError): descarta e tenta uma vez
+        # com um pool novo; se falhar de novo, a imagem fica para o comando
+        # gerar_variantes
+        for _ in range(2):
+            try:
+                futuro = _obter_pool().submit(
+                    gerar_arquivos, str(settings.MEDIA_ROOT), nome, larguras_configuradas(), formatos_disponiveis(),
+                )
+                break
+            except (BrokenProcessPool, RuntimeError):
+                _descartar_pool()
+        else:
+            logger.error('Pool de variantes indisponível; %s não foi convertida', nome)
+            return
+        futuro.add_done_callback(lambda futuro: _concluir(modelo, pk, nome, futuro))
+
+    transaction.on_commit(enviar)
+
+
+def _concluir(modelo, pk, nome, futuro):
+    try:
+        variantes = futuro.result()
+    except FileNotFoundError:
+        return  # imagem trocada ou removida antes da conversão
+    except Exception:
+        logger.exception('Falha ao gerar as variantes de %s', nome)
+        return
+    try:
+        _gravar(modelo, pk, nome, variantes)
+    finally:
+        # O callback roda numa thread do pool, fora do ciclo de requisição
+        connections.close_all()
+
+
+def _gravar(modelo, pk, nome, variantes):
+    # Só grava se a imagem não foi trocada de novo enquanto convertia
+    modelo.objects.filter(pk=pk, **{modelo.CAMPO_IMAGEM: nome}).update(variantes=variantes)
+
+
+def fontes(variantes):
+    """
+    [{'tipo', 'srcset'}] para os <source> de um <picture>, do formato mais leve ao mais compatível
+    """
+    from django.core.files.storage import default_storage
+
+    por_formato = {}
+    for variante in sorted(variantes or [], key=lambda variante: variante['largura']):
+        por_formato.setdefault(variante['formato'], []).append(
+            f"{default_storage.url(variante['nome'])} {variante['largura']}w"
+        )
+    return [
+        {'tipo': TIPOS[formato], 'srcset': ', '.join(por_formato[formato])}
+        for formato in ('avif', 'webp') if formato in por_formato
+    ]
@@ -0,0 +1,114 @@
+"""
+Política de retenção das notificações
+
+Notificações lidas mais antigas que NOTIFICACOES_RETENCAO_DIAS saem da caixa
+de entrada, apagadas ou copiadas antes para NotificationArchive. A varredura
+anda por faixas de id de tamanho fixo, uma transação curta por faixa, para
+não segurar a trava de escrita do SQLite enquanto a aplicação grava; cada
+faixa começa na próxima candidata, então trechos sem nada a remover não
+custam uma consulta por faixa vazia.
+
+A remoção é um DELETE direto (QuerySet._raw_delete), sem carregar os objetos
+nem disparar o post_delete de core/signals.py: nenhuma tabela referencia
+Notification, e o contador de não lidas já é descontado por lote.
+
+Opcionalmente cada usuário mantém só as N notificações mais recentes; as
+excedentes saem em lotes de ids, inclusive as não lidas, e o contador de não
+lidas é descontado numa única atualização por lote (ver core/notifications.py).
+"""
+
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+from .notifications import descontar_nao_lidas
+
+RETENCAO_DIAS_PADRAO = 90
+TAMANHO_LOTE = 2000
+
+CAMPOS = ('id', 'usuario_id', 'titulo', 'mensagem', 'tipo', 'lida', 'criada_em')
+
+
+def retencao_dias():
+    return getattr(settings, 'NOTIFICACOES_RETENCAO_DIAS', RETENCAO_DIAS_PADRAO)
+
+
+def _remover(notificacoes, arquivar):
+    """Remove (e opcionalmente arquiva) as notificações do lote; retorna quantas saíram"""
+    with transaction.atomic():
+        linhas = list(notificacoes.select_for_update().values(*CAMPOS))
+        if not linhas:
+            return 0
+        ids = [linha['id'] for linha in linhas]
+
+        if arquivar:
+            NotificationArchive.objects.bulk_create(
+                [NotificationArchive(**linha) for linha in linhas],
+                ignore_conflicts=True,
+            )
+
+        descontar_nao_lidas(Counter(linha['usuario_id'] for linha in linhas if not linha['lida']))
+
+        removidas = Notification.objects.filter(id__in=ids)
+        removidas._raw_delete(removidas.db)
+    return len(ids)
+
+
+def remover_antigas(dias=None, arquivar=False, lote=TAMANHO_LOTE, pausa=0, relatorio=None):
+    """
+    Remove as notificações lidas criadas há mais de `dias`, em faixas de `lote` ids
+
+    relatorio(faixa, removidas, duracao) é chamado após cada faixa com remoções.
+    Retorna o total removido.
+    """
+    limite = timezone.now() - timedelta(days=retencao_dias() if dias is None else dias)
+    candidatas = Notification.objects.filter(lida=True, criada_em__lt=limite)
+
+    total = 0
+    inicio = candidatas.aggregate(inicio=Min('id'))['inicio']
+    while inicio is not None:
+        fim = inicio + lote
+        cronometro = time.monotonic()
+        removidas = _remover(candidatas.filter(id__gte=inicio, id__lt=fim), arquivar)
+        if removidas:
+            total += removidas
+            if relatorio is not None:
+                relatorio(f'ids {inicio}-{fim - 1}', removidas, time.monotonic() - cronometro)
+            if pausa:
+                time.sleep(pausa)
+        inicio = candidatas.filter(id__gte=fim).aggregate(inicio=Min('id'))['inicio']
+    return total
+
+
+def limitar_por_usuario(maximo, arquivar=False, lote=TAMANHO_LOTE, pausa=0, relatorio=None):
+    """
+    Mantém só as `maximo` notificações mais recentes de cada usuário
+
+    relatorio(descricao, removidas, duracao) é chamado após cada lote.
+    Retorna o total removido.
+    """
+    excedentes = (
+        Notification.objects.values('usuario').annotate(total=Count('id'))
+        .filter(total__gt=maximo).values_list('usuario', flat=True)
+    )
+    total = 0
+    for usuario_id in list(excedentes):
+        ids = sorted(
+            Notification.objects.filter(usuario_id=usuario_id)
+            .order_by('-criada_em', '-id').values_list('id', flat=True)[maximo:]
+        )
+        for posicao in range(0, len(ids), lote):
+            cronometro = time.monotonic()
+            removidas = _remover(Notification.objects.filter(id__in=ids[posicao:posicao + lote]), arquivar)
+            total += removidas
+            if relatorio is not None:
+                relatorio(f'usuário {usuario_id}', removidas, time.monotonic() - cronometro)
+            if pausa:
+                time.sleep(pausa)
+    return total
@@ -0,0 +1,185 @@
+"""
+Segmentação de clientes (RFM) e retenção por coorte
+
+Lê de uma só vez as tuplas (cliente, data, valor) dos serviços realizados e
+calcula com NumPy os scores de recência, frequência e valor de cada cliente
+e a retenção mensal de cada coorte. O segmento fica gravado em
+CustomerSegment, de modo que a listagem de clientes e a seleção de público
+de marketing filtram por uma coluna indexada em vez de consultar os
+agendamentos de cada cliente.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from appointments.models import Appointment
+from .models import User, CustomerSegment, CohortRetention
+
+TAMANHO_LOTE = 1000
+
+# Scores de 1 a 5 (quintis)
+FAIXAS_SCORE = 5
+
+# Regras avaliadas em ordem: (segmento, R mínimo, R máximo, F mínimo, F máximo)
+REGRAS_SEGMENTO = [
+    ('campeoes', 4, 5, 4, 5),
+    ('novos', 4, 5, 1, 1),
+    ('fieis', 3, 5, 3, 5),
+    ('promissores', 3, 5, 1, 2),
+    ('em_risco', 1, 2, 3, 5),
+    ('atencao', 3, 3, 1, 5),
+    ('hibernando', 2, 2, 1, 2),
+    ('perdidos', 1, 1, 1, 2),
+]
+
+
+def _scores(valores, maior_melhor=True):
+    """Score 1-5 pelo quintil de cada valor (empates recebem o mesmo score)"""
+    if not valores.size:
+        return valores.astype(np.int64)
+    ordenados = np.sort(valores)
+    # Posição média de cada valor entre os ordenados: empates ficam no mesmo quintil
+    posicao = (np.searchsorted(ordenados, valores, side='left') + np.searchsorted(ordenados, valores, side='right')) / 2
+    scores = np.minimum((posicao / len(valores) * FAIXAS_SCORE).astype(np.int64) + 1, FAIXAS_SCORE)
+    return scores if maior_melhor else FAIXAS_SCORE + 1 - scores
+
+
+def _segmentos(score_r, score_f):
+    segmentos = np.full(len(score_r), 'atencao', dtype=object)
+    definido = np.zeros(len(score_r), dtype=bool)
+    for segmento, r_min, r_max, f_min, f_max in REGRAS_SEGMENTO:
+        regra = (score_r >= r_min) & (score_r <= r_max) & (score_f >= f_min) & (score_f <= f_max) & ~definido
+        segmentos[regra] = segmento
+        definido |= regra
+    return segmentos
+
+
+def _indice_mes(datas):
+    """Meses corridos desde o ano 0 (para diferenças entre meses)"""
+    return np.fromiter((d.year * 12 + d.month - 1 for d in datas), dtype=np.int64, count=len(datas))
+
+
+def calcular_segmentos(referencia=None):
+    """
+    Recalcula o segmento de todos os clientes e a retenção por coorte.
+
+    Retorna um dicionário com a contagem de clientes por segmento.
+    """
+    referencia = referencia or timezone.localdate()
+
+    # Uma única leitura: serviços realizados (não cancelados) até a data de referência
+    linhas = list(
+        Appointment.objects.filter(
+            usuario__funcao='client',
+            data_agendamento__lte=referencia,
+        ).exclude(situacao='cancelled').values_list('usuario_id', 'data_agendamento', 'preco_total').order_by()
+    )
+    clientes_ids = list(User.objects.filter(funcao='client').values_list('id', flat=True))
+
+    total = len(linhas)
+    usuarios = np.fromiter((linha[0] for linha in linhas), dtype=np.int64, count=total)
+    dias = np.fromiter(((referencia - linha[1]).days for linha in linhas), dtype=np.int64, count=total)
+    meses = _indice_mes([linha[1] for linha in linhas])
+    valores = np.fromiter((float(linha[2]) for linha in linhas), dtype=np.float64, count=total)
+
+    ids, posicao = np.unique(usuarios, return_inverse=True)
+    quantidade = len(ids)
+
+    recencia = np.full(quantidade, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(recencia, posicao, dias)
+    frequencia = np.bincount(posicao, minlength=quantidade)
+    monetario = np.bincount(posicao, weights=valores, minlength=quantidade)
+    primeiro_mes = np.full(quantidade, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(primeiro_mes, posicao, meses)
+
+    score_r = _scores(recencia, maior_melhor=False)
+    score_f = _scores(frequencia.astype(np.float64))
+    score_m = _scores(monetario)
+    segmentos = _segmentos(score_r, score_f)
+
+    agora = timezone.now()
+    registros = []
+    for i, usuario_id in enumerate(ids.tolist()):
+        coorte_ano, coorte_mes = divmod(int(primeiro_mes[i]), 12)
+        registros.append(CustomerSegment(
+            usuario_id=usuario_id,
+            segmento=segmentos[i],
+            recencia_dias=int(recencia[i]),
+            frequencia=int(frequencia[i]),
+            valor_monetario=Decimal(str(round(float(monetario[i]), 2))),
+            score_recencia=int(score_r[i]),
+            score_frequencia=int(score_f[i]),
+            score_monetario=int(score_m[i]),
+            coorte=date(coorte_ano, coorte_mes + 1, 1),
+            ultimo_servico=referencia - timedelta(days=int(recencia[i])),
+            calculado_em=agora,
+        ))
+    com_compras = set(ids.tolist())
+    for usuario_id in clientes_ids:
+        if usuario_id not in com_compras:
+            registros.append(CustomerSegment(usuario_id=usuario_id, segmento='sem_compras', calculado_em=agora))
+
+    coortes = _retencao_coortes(posicao, meses, primeiro_mes, referencia, agora)
+
+    campos = [
+        'segmento', 'recencia_dias', 'frequencia', 'valor_monetario', 'score_recencia',
+        'score_frequencia', 'score_monetario', 'coorte', 'ultimo_servico', 'calculado_em',
+    ]
+    with transaction.atomic():
+        CustomerSegment.objects.exclude(usuario_id__in=clientes_ids).delete()
+        CustomerSegment.objects.bulk_create(
+            registros, batch_size=TAMANHO_LOTE,
+            update_conflicts=True, unique_fields=['usuario'], update_fields=campos,
+        )
+        CohortRetention.objects.all().delete()
+        CohortRetention.objects.bulk_create(coortes, batch_size=TAMANHO_LOTE)
+
+    contagem = {codigo: 0 for codigo, _ in CustomerSegment.SEGMENT_CHOICES}
+    for registro in registros:
+        contagem[registro.segmento] += 1
+    return contagem
+
+
+def _retencao_coortes(posicao, meses, primeiro_mes, referencia, agora):
+    """Percentual de cada coorte com serviço em cada mês desde a entrada"""
+    if not posicao.size:
+        return []
+    mes_referencia = referencia.year * 12 + referencia.month - 1
+    coorte_linha = primeiro_mes[posicao]
+    deslocamento = meses - coorte_linha
+
+    base = int(primeiro_mes.min())
+    total_coortes = mes_referencia - base + 1
+    # Pares (cliente, mês relativo) distintos: um cliente conta uma vez por mês
+    pares = np.unique(np.stack([posicao, deslocamento]), axis=1)
+    coorte_par = primeiro_mes[pares[0]] - base
+    ativos = np.zeros((total_coortes, total_coortes), dtype=np.int64)
+    np.add.at(ativos, (coorte_par, pares[1]), 1)
+    tamanhos = np.bincount(primeiro_mes - base, minlength=total_coortes)
+
+    coortes = []
+    for indice in np.flatnonzero(tamanhos):
+        meses_observados = total_coortes - indice
+        retencao = ativos[indice, :meses_observados] / tamanhos[indice] * 100
+        ano, mes = divmod(base + int(indice), 12)
+        coortes.append(CohortRetention(
+            coorte=date(ano, mes + 1, 1),
+            clientes=int(tamanhos[indice]),
+            retencao=np.round(retencao, 1).tolist(),
+            calculado_em=agora,
+        ))
+    return coortes
+
+
+def clientes_para_marketing(segmentos):
+    """Clientes ativos que aceitam marketing, filtrados pelos segmentos (coluna indexada)"""
+    return User.objects.filter(
+        funcao='client',
+        ativo=True,
+        aceita_marketing=True,
+        segmento__segmento__in=segmentos,
+    )
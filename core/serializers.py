@@ -114,12 +114,12 @@ class NotificationSerializer(serializers.ModelSerializer):
     """
     Serializer para notificações
     """
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
+    usuario_nome = serializers.CharField(source='usuario.full_name', read_only=True)
     
     class Meta:
         model = Notification
         fields = [
-            'id', 'title', 'message', 'type', 'is_read', 
-            'created_at', 'user', 'user_name'
+            'id', 'titulo', 'mensagem', 'tipo', 'lida',
+            'criada_em', 'usuario', 'usuario_nome'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['criada_em', 'usuario', 'lida']
@@ -0,0 +1,127 @@
+"""
+Sinais do app principal
+
+Mantém User.notificacoes_nao_lidas quando notificações são criadas, lidas ou
+removidas uma a uma (create/save/delete). Operações em lote usam as funções
+de core/notifications.py. Também agenda as variantes responsivas das imagens
+do site quando o arquivo muda (core/renditions.py) e mantém a contagem de
+referências dos arquivos de mídia de todos os modelos (core/media.py), e
+invalida o usuário em cache dos WebSockets quando ele ou a sessão mudam
+(core/websocket_admission.py).
+"""
+
+from django.contrib.sessions.models import Session
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .media import campos_de_arquivo, liberar, referenciar
+from .models import GalleryImage, HeroBackground, HeroImage, Notification, User
+from .notifications import ajustar_nao_lidas
+from .renditions import agendar_variantes
+from .websocket_admission import invalidar_sessao, invalidar_usuario
+
+
+@receiver(post_init, sender=Notification)
+def guardar_lida_original(sender, instance, **kwargs):
+    """Guarda o estado carregado para detectar mudanças de lida ao salvar"""
+    instance._lida_original = instance.__dict__.get('lida')
+
+
+@receiver(post_save, sender=Notification)
+def notificacao_salva(sender, instance, created, **kwargs):
+    if created:
+        if not instance.lida:
+            ajustar_nao_lidas(instance.usuario_id, 1)
+    elif instance._lida_original is not None and instance.lida != instance._lida_original:
+        ajustar_nao_lidas(instance.usuario_id, -1 if instance.lida else 1)
+    instance._lida_original = instance.lida
+
+
+@receiver(post_delete, sender=Notification)
+def notificacao_removida(sender, instance, **kwargs):
+    if instance._lida_original is False:
+        ajustar_nao_lidas(instance.usuario_id, -1)
+
+
+@receiver(post_init, sender=GalleryImage)
+@receiver(post_init, sender=HeroBackground)
+@receiver(post_init, sender=HeroImage)
+def guardar_imagem_original(sender, instance, **kwargs):
+    """Guarda o nome do arquivo carregado para detectar troca de imagem"""
+    valor = instance.__dict__.get(sender.CAMPO_IMAGEM)
+    instance._imagem_original = getattr(valor, 'name', valor)
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=HeroBackground)
+@receiver(post_save, sender=HeroImage)
+def imagem_salva(sender, instance, created, **kwargs):
+    arquivo = getattr(instance, sender.CAMPO_IMAGEM)
+    if arquivo and (created or arquivo.name != instance._imagem_original):
+        agendar_variantes(instance)
+    instance._imagem_original = arquivo.name
+
+
+def _nome_arquivo(valor):
+    return getattr(valor, 'name', valor) or None
+
+
+def guardar_arquivos_originais(sender, instance, **kwargs):
+    """Guarda os arquivos carregados (campos adiados ficam de fora)"""
+    instance._arquivos_originais = {
+        campo: _nome_arquivo(instance.__dict__[campo])
+        for campo in CAMPOS_DE_ARQUIVO[sender] if campo in instance.__dict__
+    }
+
+
+def marcar_envios(sender, instance, **kwargs):
+    """Campos com arquivo novo a gravar: a referência deles é somada pelo storage"""
+    instance._arquivos_enviados = {
+        campo for campo in CAMPOS_DE_ARQUIVO[sender]
+        if campo in instance.__dict__ and not getattr(getattr(instance, campo), '_committed', True)
+    }
+
+
+def arquivos_salvos(sender, instance, created, update_fields, **kwargs):
+    originais = instance._arquivos_originais
+    enviados = instance._arquivos_enviados
+    for campo in CAMPOS_DE_ARQUIVO[sender]:
+        if update_fields is not None and campo not in update_fields:
+            continue
+        if not created and campo not in originais:
+            continue
+        nome = _nome_arquivo(instance.__dict__.get(campo))
+        anterior = None if created else originais[campo]
+        # Reenviar o mesmo arquivo no mesmo registro também soma no storage
+        if nome != anterior or campo in enviados:
+            if nome and campo not in enviados:
+                referenciar(nome)
+            if anterior:
+                liberar(anterior)
+        originais[campo] = nome
+
+
+def arquivos_removidos(sender, instance, **kwargs):
+    for nome in instance._arquivos_originais.values():
+        if nome:
+            liberar(nome)
+
+
+CAMPOS_DE_ARQUIVO = campos_de_arquivo()
+
+for modelo in CAMPOS_DE_ARQUIVO:
+    post_init.connect(guardar_arquivos_originais, sender=modelo)
+    pre_save.connect(marcar_envios, sender=modelo)
+    post_save.connect(arquivos_salvos, sender=modelo)
+    post_delete.connect(arquivos_removidos, sender=modelo)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def usuario_alterado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=Session)
+def sessao_removida(sender, instance, **kwargs):
+    invalidar_sessao(instance.session_key)
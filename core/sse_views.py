@@ -0,0 +1,109 @@
+"""
+Fluxo de eventos do cliente via Server-Sent Events
+
+Alternativa somente de leitura ao ClientConsumer para as páginas do
+dashboard: uma resposta text/event-stream assíncrona alimentada pelos mesmos
+eventos do grupo client_<id> no channel layer. Cada conexão ociosa custa uma
+corrotina e a fila do canal, sem consumer, sem heartbeat do navegador e sem
+confirmações; o servidor manda um comentário a cada SSE_KEEPALIVE segundos
+para manter proxies abertos e renovar a presença.
+
+Os eventos levam 'id: <seq>', então o EventSource reconecta sozinho enviando
+Last-Event-ID e recebe só o que perdeu (log de core/websocket_log.py), ou
+'resync_required' quando o buffer já foi sobrescrito.
+"""
+
+import asyncio
+import json
+import random
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from .presence import registrar_conexao, remover_conexao, ttl_presenca
+from .websocket_events import TIPO_ENVELOPE
+from .websocket_log import eventos_desde, mensagem_resync, sequencia_atual
+
+KEEPALIVE_PADRAO = 25  # segundos
+
+# Espera (ms) sugerida ao EventSource antes de reconectar (sorteada até o dobro)
+RETRY_MS = 5000
+
+
+def _quadro(texto, seq=None):
+    """Evento SSE com o JSON já serializado (o mesmo texto enviado pelo WebSocket)"""
+    if seq is None:
+        return f'data: {texto}\n\n'
+    return f'id: {seq}\ndata: {texto}\n\n'
+
+
+def _ultima_sequencia(request):
+    """Sequência informada pelo EventSource (Last-Event-ID) ou pela primeira conexão (?last_seq=)"""
+    valor = request.headers.get('Last-Event-ID') or request.GET.get('last_seq')
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except ValueError:
+        return None
+
+
+async def _fluxo(user, ultima_vista):
+    grupo = f'client_{user.id}'
+    camada = get_channel_layer()
+    canal = await camada.new_channel()
+    keepalive = getattr(settings, 'SSE_KEEPALIVE', KEEPALIVE_PADRAO)
+
+    # Inscrição antes de ler o log: nada se perde entre o reenvio e os eventos ao vivo
+    await camada.group_add(grupo, canal)
+    await sync_to_async(registrar_conexao)(user.id, [grupo], canal)
+    try:
+        atual = await database_sync_to_async(sequencia_atual)(grupo)
+        yield f'retry: {random.randint(RETRY_MS, 2 * RETRY_MS)}\n\n'
+        yield _quadro(json.dumps({
+            'type': 'connection_established',
+            'message': 'Conectado ao sistema AutoV7',
+            'user_id': str(user.id),
+            'seq': atual,
+        }))
+
+        if ultima_vista is not None:
+            textos, atual = await database_sync_to_async(eventos_desde)(grupo, ultima_vista)
+            if textos is None:
+                yield _quadro(mensagem_resync(atual), atual)
+            else:
+                for texto in textos:
+                    yield _quadro(texto, json.loads(texto).get('seq'))
+
+        loop = asyncio.get_running_loop()
+        renovado_em = loop.time()
+        while True:
+            try:
+                mensagem = await asyncio.wait_for(camada.receive(canal), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+            else:
+                if mensagem.get('type') == TIPO_ENVELOPE:
+                    texto = mensagem['text']
+                    yield _quadro(texto, json.loads(texto).get('seq'))
+
+            if loop.time() - renovado_em >= ttl_presenca() / 3:
+                renovado_em = loop.time()
+                await sync_to_async(registrar_conexao)(user.id, [grupo], canal)
+    finally:
+        await camada.group_discard(grupo, canal)
+        await sync_to_async(remover_conexao)(user.id, [grupo], canal)
+
+
+@require_http_methods(["GET"])
+@login_required
+async def client_event_stream(request):
+    """Eventos do cliente logado em text/event-stream (reconexão com Last-Event-ID)"""
+    user = await request.auser()
+    response = StreamingHttpResponse(_fluxo(user, _ultima_sequencia(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: não acumular o fluxo
+    return response
@@ -0,0 +1,101 @@
+"""
+Armazenamento de mídia endereçado por conteúdo
+
+Cada arquivo enviado é gravado com o nome derivado do SHA-256 do conteúdo, em
+diretórios fragmentados pelos primeiros caracteres do hash, dentro do
+upload_to do campo:
+
+    hero/backgrounds/BACK_HERO1.jpg -> hero/backgrounds/3f/a2/3fa2…c9.jpg
+
+Reenviar o mesmo arquivo resolve para o mesmo nome e nada é gravado de novo
+(antes cada reenvio ganhava um sufixo aleatório e uma cópia inteira). Como um
+arquivo pode ser usado por vários registros, quem decide quando apagá-lo é a
+contagem de referências de core/media.py, não o storage.
+
+A referência do envio é somada aqui, antes de conferir se o arquivo já
+existe: com a contagem acima de zero a remoção depois do commit
+(media._apagar_se_livre) não apaga mais o arquivo, e se ela já estava em
+andamento a soma espera o fim dela e o arquivo é gravado de novo. O sinal
+post_save do registro não soma outra vez (core/signals.py).
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+TAMANHO_BLOCO = 1024 * 1024
+
+_NOME_POR_CONTEUDO = re.compile(r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{60}(\.[^/]*)?$')
+
+
+def nome_por_resumo(nome, resumo):
+    """Nome por conteúdo no mesmo diretório de 'nome', mantendo a extensão"""
+    extensao = posixpath.splitext(nome)[1].lower()
+    return posixpath.join(posixpath.dirname(nome), resumo[:2], resumo[2:4], resumo + extensao)
+
+
+def e_nome_por_conteudo(nome):
+    return bool(_NOME_POR_CONTEUDO.search(nome))
+
+
+def resumo_do_nome(nome):
+    """SHA-256 contido num nome por conteúdo, ou None para nomes antigos"""
+    if not e_nome_por_conteudo(nome):
+        return None
+    return posixpath.splitext(posixpath.basename(nome))[0]
+
+
+def resumo_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+@deconstructible(path='core.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage que nomeia os arquivos pelo SHA-256 do conteúdo"""
+
+    def get_available_name(self, name, max_length=None):
+        # O nome definitivo sai do conteúdo em _save; nome igual é conteúdo igual
+        return name
+
+    def _save(self, name, content):
+        from .media import referenciar
+
+        os.makedirs(self.location, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=self.location, prefix='.envio-')
+        try:
+            # Grava e calcula o hash na mesma leitura
+            resumo = hashlib.sha256()
+            with os.fdopen(descritor, 'wb') as arquivo:
+                for bloco in content.chunks():
+                    resumo.update(bloco)
+                    arquivo.write(bloco)
+
+            nome = nome_por_resumo(name, resumo.hexdigest())
+            caminho = self.path(nome)
+            referenciar(nome)
+            if os.path.exists(caminho):
+                return nome
+
+            diretorio = os.path.dirname(caminho)
+            if self.directory_permissions_mode is not None:
+                os.makedirs(diretorio, self.directory_permissions_mode, exist_ok=True)
+            else:
+                os.makedirs(diretorio, exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporario, self.file_permissions_mode)
+            # Dois envios simultâneos do mesmo conteúdo trocam bytes idênticos
+            os.replace(temporario, caminho)
+            temporario = None
+            return nome
+        finally:
+            if temporario is not None:
+                os.remove(temporario)
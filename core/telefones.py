@@ -0,0 +1,32 @@
+"""
+Normalização de telefones para E.164
+
+O cadastro aceita o telefone em formatos livres ((11) 99999-9999,
+11999999999, +55 11 99999-9999). O formato E.164 (+5511999999999) é gravado
+em User.telefone_e164 ao salvar, para que o envio de mensagens não limpe nem
+valide o número a cada uso.
+"""
+
+import re
+
+DDI_PADRAO = '55'
+
+_NAO_DIGITOS = re.compile(r'\D')
+
+
+def normalizar_telefone(telefone, ddi=DDI_PADRAO):
+    """Telefone em E.164 ('+5511999999999') ou None se não for um número válido"""
+    if not telefone:
+        return None
+    internacional = telefone.strip().startswith('+')
+    digitos = _NAO_DIGITOS.sub('', telefone)
+
+    if internacional:
+        return f'+{digitos}' if 8 <= len(digitos) <= 15 else None
+
+    digitos = digitos.lstrip('0')  # prefixo de operadora/tronco (0xx11...)
+    if len(digitos) in (10, 11):
+        return f'+{ddi}{digitos}'
+    if len(digitos) in (12, 13) and digitos.startswith(ddi):
+        return f'+{digitos}'
+    return None
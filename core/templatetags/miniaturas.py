@@ -0,0 +1,11 @@
+from django import template
+
+from core.thumbnails import url_miniatura
+
+register = template.Library()
+
+
+@register.filter
+def miniatura(arquivo, tamanho=150):
+    """URL da miniatura em cache de um arquivo de imagem: {{ produto.imagem|miniatura:64 }}"""
+    return url_miniatura(arquivo, int(tamanho))
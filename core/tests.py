@@ -1,3 +1,313 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .media import deduplicar
+from .models import GalleryImage, MediaBlob, Notification, NotificationArchive, User
+from .notifications import marcar_lidas, nao_lidas, recalcular_nao_lidas
+from .renditions import gerar_variantes
+from .retention import limitar_por_usuario, remover_antigas
+from .thumbnails import obter_miniatura
+
+
+def _jpeg(cor):
+    conteudo = io.BytesIO()
+    Image.new('RGB', (400, 300), cor).save(conteudo, 'JPEG')
+    return conteudo.getvalue()
+
+
+class MidiaTestCase(TestCase):
+    """Base com MEDIA_ROOT e cache de miniaturas temporários; variantes só quando o teste pede"""
+    
+    def setUp(self):
+        raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, raiz, ignore_errors=True)
+        self.media_root = os.path.join(raiz, 'media')
+        configuracao = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MINIATURAS_DIR=os.path.join(raiz, 'cache'),
+            VARIANTES_LARGURAS=[160],
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        agendar = mock.patch('core.signals.agendar_variantes')
+        agendar.start()
+        self.addCleanup(agendar.stop)
+    
+    def criar_imagem(self, conteudo, nome='foto.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return GalleryImage.objects.create(
+                titulo=nome, imagem=SimpleUploadedFile(nome, conteudo), texto_alternativo=nome,
+            )
+    
+    def apagar(self, instancia):
+        with self.captureOnCommitCallbacks(execute=True):
+            instancia.delete()
+    
+    def referencias(self, nome):
+        return MediaBlob.objects.filter(nome=nome).values_list('referencias', flat=True).first()
+
+
+class ContagemReferenciasTest(MidiaTestCase):
+    
+    def test_envios_identicos_compartilham_um_arquivo(self):
+        primeira = self.criar_imagem(_jpeg('red'), 'a.jpg')
+        segunda = self.criar_imagem(_jpeg('red'), 'outra.JPG')
+        
+        self.assertEqual(primeira.imagem.name, segunda.imagem.name)
+        self.assertEqual(self.referencias(primeira.imagem.name), 2)
+        self.assertEqual(MediaBlob.objects.count(), 1)
+    
+    def test_reenvio_no_mesmo_registro_nao_soma(self):
+        imagem = self.criar_imagem(_jpeg('red'))
+        imagem.imagem = SimpleUploadedFile('de-novo.jpg', _jpeg('red'))
+        with self.captureOnCommitCallbacks(execute=True):
+            imagem.save()
+        
+        self.assertEqual(self.referencias(imagem.imagem.name), 1)
+        self.assertTrue(default_storage.exists(imagem.imagem.name))
+    
+    def test_apagar_um_registro_mantem_o_arquivo(self):
+        primeira = self.criar_imagem(_jpeg('red'))
+        segunda = self.criar_imagem(_jpeg('red'))
+        
+        self.apagar(primeira)
+        
+        self.assertTrue(default_storage.exists(segunda.imagem.name))
+        self.assertEqual(self.referencias(segunda.imagem.name), 1)
+    
+    def test_apagar_o_ultimo_registro_remove_arquivo_variantes_e_miniaturas(self):
+        imagem = self.criar_imagem(_jpeg('red'))
+        nome = imagem.imagem.name
+        variantes = gerar_variantes(imagem)
+        miniatura, _ = obter_miniatura(nome, 64)
+        self.assertTrue(variantes)
+        self.assertTrue(os.path.exists(miniatura))
+        
+        self.apagar(imagem)
+        
+        self.assertFalse(default_storage.exists(nome))
+        for variante in variantes:
+            self.assertFalse(default_storage.exists(variante['nome']))
+        self.assertFalse(os.path.exists(miniatura))
+        self.assertFalse(MediaBlob.objects.filter(nome=nome).exists())
+    
+    def test_trocar_a_imagem_libera_a_anterior(self):
+        imagem = self.criar_imagem(_jpeg('red'))
+        anterior = imagem.imagem.name
+        imagem.imagem = SimpleUploadedFile('nova.jpg', _jpeg('blue'))
+        with self.captureOnCommitCallbacks(execute=True):
+            imagem.save()
+        
+        self.assertFalse(default_storage.exists(anterior))
+        self.assertEqual(self.referencias(imagem.imagem.name), 1)
+    
+    def test_envio_identico_antes_da_remocao_mantem_o_arquivo(self):
+        imagem = self.criar_imagem(_jpeg('red'))
+        nome = imagem.imagem.name
+        # A contagem zera e, antes do commit que apagaria o arquivo, chega o mesmo conteúdo
+        with self.captureOnCommitCallbacks(execute=True):
+            imagem.delete()
+            nova = GalleryImage.objects.create(
+                titulo='b', imagem=SimpleUploadedFile('b.jpg', _jpeg('red')), texto_alternativo='b',
+            )
+        
+        self.assertEqual(nova.imagem.name, nome)
+        self.assertTrue(default_storage.exists(nome))
+        self.assertEqual(self.referencias(nome), 1)
+
+
+class DeduplicarTest(MidiaTestCase):
+    
+    def gravar_legado(self, nome, conteudo):
+        caminho = os.path.join(self.media_root, nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+    
+    def test_simular_relata_sem_alterar_nada(self):
+        conteudo = _jpeg('green')
+        self.gravar_legado('gallery/original.jpg', conteudo)
+        self.gravar_legado('gallery/original_aB3dE9f.jpg', conteudo)
+        imagem = GalleryImage.objects.create(titulo='a', imagem='gallery/original.jpg', texto_alternativo='a')
+        arquivos = sorted(os.listdir(os.path.join(self.media_root, 'gallery')))
+        blobs = list(MediaBlob.objects.values_list('nome', 'referencias'))
+        
+        resultado = deduplicar(simular=True)
+        
+        self.assertEqual(resultado['movidos'], 1)
+        self.assertEqual(resultado['duplicados'], 1)
+        self.assertEqual(resultado['registros'], 0)
+        self.assertEqual(resultado['bytes'], len(conteudo))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'gallery'))), arquivos)
+        self.assertEqual(list(MediaBlob.objects.values_list('nome', 'referencias')), blobs)
+        imagem.refresh_from_db()
+        self.assertEqual(imagem.imagem.name, 'gallery/original.jpg')
+
+
+class ContadorNaoLidasTest(TestCase):
+    
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            username='cliente', email='cliente@exemplo.com', password='senha', funcao='client',
+        )
+        self.outro = User.objects.create_user(
+            username='outro', email='outro@exemplo.com', password='senha', funcao='client',
+        )
+    
+    def notificar(self, usuario=None, lida=False):
+        return Notification.objects.create(
+            usuario=usuario or self.usuario, titulo='Aviso', mensagem='Mensagem', lida=lida,
+        )
+    
+    def test_criar_soma_so_as_nao_lidas(self):
+        self.notificar()
+        self.notificar()
+        self.notificar(lida=True)
+        
+        self.assertEqual(nao_lidas(self.usuario.pk), 2)
+        self.assertEqual(nao_lidas(self.outro.pk), 0)
+    
+    def test_ler_e_desmarcar_pela_instancia(self):
+        notificacao = self.notificar()
+        notificacao.lida = True
+        notificacao.save()
+        self.assertEqual(nao_lidas(self.usuario.pk), 0)
+        
+        # Salvar de novo sem mudar lida não desconta outra vez
+        notificacao.save()
+        self.assertEqual(nao_lidas(self.usuario.pk), 0)
+        
+        notificacao.lida = False
+        notificacao.save()
+        self.assertEqual(nao_lidas(self.usuario.pk), 1)
+    
+    def test_marcar_lidas_em_lote(self):
+        primeira, segunda, _ = self.notificar(), self.notificar(), self.notificar()
+        self.notificar(usuario=self.outro)
+        
+        self.assertEqual(marcar_lidas(self.usuario.pk, [primeira.pk, segunda.pk]), 2)
+        self.assertEqual(nao_lidas(self.usuario.pk), 1)
+        
+        # Já lidas não entram na conta
+        self.assertEqual(marcar_lidas(self.usuario.pk), 1)
+        self.assertEqual(nao_lidas(self.usuario.pk), 0)
+        self.assertEqual(nao_lidas(self.outro.pk), 1)
+    
+    def test_apagar_desconta_so_as_nao_lidas(self):
+        nao_lida = self.notificar()
+        lida = self.notificar(lida=True)
+        self.notificar()
+        
+        lida.delete()
+        self.assertEqual(nao_lidas(self.usuario.pk), 2)
+        nao_lida.delete()
+        self.assertEqual(nao_lidas(self.usuario.pk), 1)
+    
+    def test_contador_nunca_fica_negativo(self):
+        notificacao = self.notificar()
+        User.objects.filter(pk=self.usuario.pk).update(notificacoes_nao_lidas=0)
+        
+        notificacao.delete()
+        
+        self.assertEqual(nao_lidas(self.usuario.pk), 0)
+    
+    def test_recalcular_corrige_alteracoes_fora_dos_sinais(self):
+        self.notificar()
+        self.notificar()
+        Notification.objects.filter(usuario=self.usuario).update(lida=True)
+        self.assertEqual(nao_lidas(self.usuario.pk), 2)
+        
+        self.assertEqual(recalcular_nao_lidas(), 1)
+        self.assertEqual(nao_lidas(self.usuario.pk), 0)
+    
+    def test_api_marca_e_informa_o_contador(self):
+        notificacao = self.notificar()
+        self.notificar()
+        self.client.force_login(self.usuario)
+        
+        resposta = self.client.post(reverse('notification-mark-as-read', args=[notificacao.pk]))
+        self.assertEqual(resposta.json()['unread'], 1)
+        
+        self.client.post(reverse('notification-mark-all-as-read'))
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).json(), {'unread': 0})
+
+
+class RetencaoNotificacoesTest(TestCase):
+    
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            username='cliente', email='cliente@exemplo.com', password='senha', funcao='client',
+        )
+        self.antiga = timezone.now() - timedelta(days=120)
+    
+    def notificar(self, lida=False, criada_em=None, **campos):
+        return Notification.objects.create(
+            usuario=self.usuario, titulo='Aviso', mensagem='Mensagem', lida=lida,
+            criada_em=criada_em or timezone.now(), **campos,
+        )
+    
+    def test_remove_so_as_lidas_antigas(self):
+        lida_antiga = self.notificar(lida=True, criada_em=self.antiga)
+        nao_lida_antiga = self.notificar(criada_em=self.antiga)
+        lida_recente = self.notificar(lida=True)
+        
+        self.assertEqual(remover_antigas(dias=90), 1)
+        
+        self.assertEqual(
+            set(Notification.objects.values_list('id', flat=True)), {nao_lida_antiga.pk, lida_recente.pk},
+        )
+        self.assertFalse(NotificationArchive.objects.filter(pk=lida_antiga.pk).exists())
+        self.assertEqual(nao_lidas(self.usuario.pk), 1)
+    
+    def test_arquivar_copia_antes_de_remover(self):
+        notificacao = self.notificar(lida=True, criada_em=self.antiga)
+        
+        self.assertEqual(remover_antigas(dias=90, arquivar=True), 1)
+        
+        arquivada = NotificationArchive.objects.get(pk=notificacao.pk)
+        self.assertEqual((arquivada.usuario_id, arquivada.titulo, arquivada.lida), (self.usuario.pk, 'Aviso', True))
+        self.assertFalse(Notification.objects.filter(pk=notificacao.pk).exists())
+    
+    def test_faixas_comecam_na_proxima_candidata(self):
+        primeira = self.notificar(lida=True, criada_em=self.antiga)
+        distante = self.notificar(id=primeira.pk + 10000, lida=True, criada_em=self.antiga)
+        faixas = []
+        
+        with CaptureQueriesContext(connection) as consultas:
+            total = remover_antigas(
+                dias=90, lote=10, relatorio=lambda faixa, removidas, duracao: faixas.append(faixa),
+            )
+        
+        self.assertEqual(total, 2)
+        # As mil faixas vazias entre as duas não geram consulta
+        self.assertLess(len(consultas), 20)
+        self.assertEqual(faixas, [f'ids {primeira.pk}-{primeira.pk + 9}', f'ids {distante.pk}-{distante.pk + 9}'])
+    
+    def test_limite_por_usuario_remove_as_excedentes_e_desconta_nao_lidas(self):
+        for dias in range(5):
+            self.notificar(criada_em=timezone.now() - timedelta(days=dias))
+        self.assertEqual(nao_lidas(self.usuario.pk), 5)
+        
+        self.assertEqual(limitar_por_usuario(2, lote=2), 3)
+        
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(nao_lidas(self.usuario.pk), 2)
+    
+    def test_comando_valida_parametros(self):
+        with self.assertRaises(CommandError):
+            call_command('limpar_notificacoes', lote=0, stdout=io.StringIO())
@@ -0,0 +1,30 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_http_methods
+
+from .thumbnails import obter_miniatura, tamanhos_permitidos
+
+UM_ANO = 365 * 24 * 60 * 60
+
+
+@require_http_methods(["GET", "HEAD"])
+def miniatura_view(request, tamanho, nome):
+    """
+    Miniatura WebP de um arquivo de mídia, gerada no primeiro pedido (core/thumbnails.py)
+    """
+    if tamanho not in tamanhos_permitidos():
+        raise Http404('Tamanho de miniatura não permitido')
+    try:
+        caminho, resumo = obter_miniatura(nome, tamanho)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('Imagem não encontrada')
+
+    etag = f'"{resumo[:16]}-{tamanho}"'
+    if request.headers.get('If-None-Match') == etag:
+        resposta = HttpResponseNotModified()
+    else:
+        resposta = FileResponse(open(caminho, 'rb'), content_type='image/webp')
+    resposta['ETag'] = etag
+    patch_cache_control(resposta, public=True, max_age=UM_ANO, immutable=True)
+    return resposta
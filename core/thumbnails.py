@@ -0,0 +1,107 @@
+"""
+Miniaturas sob demanda com cache em disco
+
+As prévias do admin mostravam o original inteiro reduzido por CSS (a lista de
+HeroBackground baixava dezenas de MB). A view de miniatura gera no primeiro
+pedido uma WebP que cabe num quadrado de lado fixo (MINIATURAS_TAMANHOS) e a
+guarda em MINIATURAS_DIR com a chave (hash do arquivo, tamanho); os pedidos
+seguintes só leem o arquivo pronto.
+
+O endereço é /miniaturas/<tamanho>/<nome do arquivo>. O storage nunca regrava
+um nome (core/storage.py nomeia pelo conteúdo e os nomes antigos eram
+únicos), então a resposta vai com cache de um ano e 'immutable'. Nos templates:
+{% load miniaturas %} e {{ produto.imagem|miniatura:150 }}.
+"""
+
+import functools
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .storage import resumo_arquivo, resumo_do_nome
+
+TAMANHOS_PADRAO = (64, 150, 320)
+QUALIDADE = 80
+
+
+def tamanhos_permitidos():
+    return tuple(getattr(settings, 'MINIATURAS_TAMANHOS', TAMANHOS_PADRAO))
+
+
+def diretorio_cache():
+    return str(getattr(settings, 'MINIATURAS_DIR', os.path.join(settings.BASE_DIR, 'cache', 'miniaturas')))
+
+
+def url_miniatura(arquivo, tamanho):
+    """URL da miniatura de um arquivo (FieldFile ou nome); '' sem arquivo"""
+    nome = getattr(arquivo, 'name', arquivo)
+    if not nome:
+        return ''
+    return reverse('miniatura', args=[tamanho, nome])
+
+
+@functools.lru_cache(maxsize=1024)
+def _resumo_legado(caminho, modificado_ns, tamanho):
+    # Nomes antigos não trazem o hash: calcula uma vez por versão do arquivo
+    return resumo_arquivo(caminho)
+
+
+def _caminho_cache(resumo, tamanho):
+    return os.path.join(diretorio_cache(), resumo[:2], f'{resumo}.{tamanho}.webp')
+
+
+def obter_miniatura(nome, tamanho):
+    """
+    (caminho da miniatura, hash do original), gerando a miniatura se ainda não existe
+
+    FileNotFoundError se o original não existe; SuspiciousFileOperation para
+    nomes fora do MEDIA_ROOT; OSError do Pillow se não for uma imagem.
+    """
+    original = default_storage.path(nome)
+    resumo = resumo_do_nome(nome)
+    if resumo is None:
+        estado = os.stat(original)
+        resumo = _resumo_legado(original, estado.st_mtime_ns, estado.st_size)
+
+    destino = _caminho_cache(resumo, tamanho)
+    if not os.path.exists(destino):
+        _gerar(original, destino, tamanho)
+    return destino, resumo
+
+
+def _gerar(original, destino, tamanho):
+    from PIL import Image, ImageOps
+
+    diretorio = os.path.dirname(destino)
+    os.makedirs(diretorio, exist_ok=True)
+    with Image.open(original) as imagem:
+        # JPEG: decodifica já reduzido (1/2, 1/4, 1/8) em vez da foto inteira
+        imagem.draft('RGB', (tamanho, tamanho))
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ('RGB', 'RGBA'):
+            imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() else 'RGB')
+        imagem.thumbnail((tamanho, tamanho), Image.LANCZOS)
+
+        descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.gerando-')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                imagem.save(arquivo, 'WEBP', quality=QUALIDADE)
+            os.replace(temporario, destino)
+        except BaseException:
+            os.remove(temporario)
+            raise
+
+
+def remover_miniaturas(nome):
+    """Apaga as miniaturas em cache de um arquivo por conteúdo (chamado ao apagar o arquivo)"""
+    resumo = resumo_do_nome(nome)
+    if resumo is None:
+        return
+    for tamanho in tamanhos_permitidos():
+        try:
+            os.remove(_caminho_cache(resumo, tamanho))
+        except FileNotFoundError:
+            pass
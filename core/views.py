@@ -1,11 +1,13 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from .models import Notification
+from .notifications import marcar_lidas, nao_lidas, notificacoes_desde
 from .serializers import (
     UserSerializer, UserProfileSerializer, LoginSerializer, 
     RegisterSerializer, NotificationSerializer
@@ -36,6 +38,16 @@ class UserViewSet(viewsets.ModelViewSet):
         return UserSerializer
 
 
+class NotificationPagination(CursorPagination):
+    """
+    Paginação por chave (criada_em, id): usa o índice da caixa de entrada, sem OFFSET
+    """
+    ordering = ('-criada_em', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class NotificationViewSet(viewsets.ModelViewSet):
     """
     ViewSet para notificações
@@ -43,15 +55,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
     
     def get_queryset(self):
         user = self.request.user
-        if user.is_authenticated:
-            return Notification.objects.filter(user=user)
-        return Notification.objects.none()
+        if not user.is_authenticated:
+            return Notification.objects.none()
+        notifications = Notification.objects.filter(usuario=user)
+        if self.request.query_params.get('lida') in ('0', 'false'):
+            notifications = notifications.filter(lida=False)
+        return notifications
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(usuario=self.request.user)
     
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
@@ -59,17 +75,39 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Marca uma notificação como lida
         """
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
-        return Response({'status': 'marked as read'})
+        marcar_lidas(request.user.pk, [notification.pk])
+        return Response({'status': 'marked as read', 'unread': nao_lidas(request.user.pk)})
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         """
         Marca todas as notificações como lidas
         """
-        self.get_queryset().update(is_read=True)
-        return Response({'status': 'all marked as read'})
+        marcar_lidas(request.user.pk)
+        return Response({'status': 'all marked as read', 'unread': 0})
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """
+        Total de não lidas (contador mantido no usuário, sem COUNT)
+        """
+        return Response({'unread': nao_lidas(request.user.pk)})
+    
+    @action(detail=False, methods=['get'])
+    def since(self, request):
+        """
+        Notificações criadas depois do id informado em ?id= (polling incremental)
+        """
+        try:
+            since_id = int(request.query_params.get('id', 0))
+        except ValueError:
+            return Response({'error': 'id inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        notifications = notificacoes_desde(request.user.pk, since_id)
+        return Response({
+            'results': self.get_serializer(notifications, many=True).data,
+            'last_id': notifications[-1].id if notifications else since_id,
+            'unread': nao_lidas(request.user.pk),
+        })
 
 
 class AuthViewSet(viewsets.ViewSet):
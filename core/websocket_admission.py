@@ -0,0 +1,166 @@
+"""
+Controle de admissão das conexões WebSocket
+
+Depois de reiniciar o daphne todas as abas abertas reconectam ao mesmo tempo,
+e cada conexão consultava sessão e usuário no banco. Duas proteções:
+
+- AdmissionControlMiddleware: balde de fichas por processo
+  (WEBSOCKET_ADMISSAO_TAXA conexões/s, rajada de WEBSOCKET_ADMISSAO_RAJADA).
+  Sem ficha, a conexão é aceita só para receber {'type': 'retry_later',
+  'retry_after': ms} e fechada com CODIGO_SOBRECARGA, antes de qualquer
+  acesso ao banco. O retry_after é sorteado numa faixa que cresce com o
+  número de recusas recentes, espalhando a tempestade no tempo.
+- CachedAuthMiddleware: resolve sessão -> usuário uma vez e guarda o usuário
+  no cache por WEBSOCKET_SESSAO_CACHE_TTL segundos; reconexões da mesma
+  sessão não consultam o banco, e conexões simultâneas da mesma sessão (várias
+  abas) compartilham uma única consulta. Cada entrada leva a versão do
+  usuário no cache: salvar ou apagar o User (is_active, funcao, senha) troca a
+  versão e invalida todas as sessões dele de uma vez, e apagar a sessão
+  (logout, clearsessions) remove a entrada (ver core/signals.py e
+  core/middleware.py). QuerySet.update() não passa pelos sinais e só vale
+  após o TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from channels.auth import AuthMiddleware, get_user
+from channels.sessions import CookieMiddleware, SessionMiddleware
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+
+# Código de fechamento para "servidor ocupado, tente de novo em retry_after ms"
+CODIGO_SOBRECARGA = 4429
+
+TAXA_PADRAO = 20      # conexões admitidas por segundo, por processo
+RAJADA_PADRAO = 40    # fichas acumuladas no máximo
+SESSAO_CACHE_TTL_PADRAO = 60
+
+# Recusas contadas nesta janela (s) para dimensionar o espalhamento
+JANELA_RECUSAS = 10
+ESPERA_MINIMA = 1.0   # segundos
+
+# chave da sessão -> consulta ao banco em andamento (compartilhada pelas conexões simultâneas)
+_consultas = {}
+
+
+class BaldeDeFichas:
+    """Balde de fichas: cada conexão retira uma; a taxa repõe continuamente"""
+
+    def __init__(self, taxa, rajada):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.fichas = float(rajada)
+        self.atualizado_em = time.monotonic()
+        self.recusas = deque()
+
+    def _repor(self, agora):
+        self.fichas = min(self.rajada, self.fichas + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+
+    def retirar(self):
+        agora = time.monotonic()
+        self._repor(agora)
+        if self.fichas >= 1:
+            self.fichas -= 1
+            return True
+        self.recusas.append(agora)
+        while self.recusas and self.recusas[0] < agora - JANELA_RECUSAS:
+            self.recusas.popleft()
+        return False
+
+    def espera_sugerida(self):
+        """Segundos até tentar de novo: faixa proporcional às recusas recentes, com sorteio"""
+        faixa = max(ESPERA_MINIMA, len(self.recusas) / self.taxa)
+        return ESPERA_MINIMA + random.uniform(0, faixa)
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI que limita a taxa de novas conexões WebSocket do processo
+    """
+
+    def __init__(self, inner, taxa=None, rajada=None):
+        self.inner = inner
+        self.balde = BaldeDeFichas(
+            taxa or getattr(settings, 'WEBSOCKET_ADMISSAO_TAXA', TAXA_PADRAO),
+            rajada or getattr(settings, 'WEBSOCKET_ADMISSAO_RAJADA', RAJADA_PADRAO),
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket' or self.balde.retirar():
+            return await self.inner(scope, receive, send)
+
+        mensagem = await receive()
+        if mensagem['type'] != 'websocket.connect':
+            return
+        retry_after = int(self.balde.espera_sugerida() * 1000)
+        # Fechar antes de aceitar chega ao navegador como 1006, sem código nem mensagem
+        await send({'type': 'websocket.accept'})
+        await send({'type': 'websocket.send', 'text': json.dumps({'type': 'retry_later', 'retry_after': retry_after})})
+        await send({'type': 'websocket.close', 'code': CODIGO_SOBRECARGA})
+
+
+def chave_sessao(session_key):
+    return 'ws_sessao:' + hashlib.sha256(session_key.encode()).hexdigest()
+
+
+def chave_usuario(usuario_id):
+    return f'ws_usuario:{usuario_id}'
+
+
+def invalidar_sessao(session_key):
+    if session_key:
+        cache.delete(chave_sessao(session_key))
+
+
+def invalidar_usuario(usuario_id):
+    """Invalida o usuário em cache em todas as sessões dele (troca de versão)"""
+    cache.delete(chave_usuario(usuario_id))
+
+
+class CachedAuthMiddleware(AuthMiddleware):
+    """AuthMiddleware que guarda no cache o usuário de cada sessão por alguns segundos"""
+
+    async def resolve_scope(self, scope):
+        session_key = scope['session'].session_key
+        if not session_key:
+            return await super().resolve_scope(scope)
+
+        chave = chave_sessao(session_key)
+        user = None
+        entrada = await sync_to_async(cache.get)(chave)
+        if entrada is not None:
+            user, versao = entrada
+            if await sync_to_async(cache.get)(chave_usuario(user.pk)) != versao:
+                user = None
+        if user is None:
+            consulta = _consultas.get(chave)
+            if consulta is None:
+                consulta = _consultas[chave] = asyncio.ensure_future(self.load_user(scope, chave))
+                consulta.add_done_callback(lambda _: _consultas.pop(chave, None))
+            user = await asyncio.shield(consulta)
+        scope['user']._wrapped = user
+
+    async def load_user(self, scope, chave):
+        ttl = getattr(settings, 'WEBSOCKET_SESSAO_CACHE_TTL', SESSAO_CACHE_TTL_PADRAO)
+        # Versão lida antes do usuário: uma alteração durante a consulta invalida a entrada gravada
+        usuario_id = await sync_to_async(scope['session'].get)(SESSION_KEY)
+        versao = None
+        if usuario_id is not None:
+            versao = await sync_to_async(cache.get_or_set)(chave_usuario(usuario_id), uuid.uuid4().hex, ttl)
+        user = await get_user(scope)
+        if user.is_authenticated and versao is not None and str(user.pk) == str(usuario_id):
+            await sync_to_async(cache.set)(chave, (user, versao), ttl)
+        return user
+
+
+def CachedAuthMiddlewareStack(inner):
+    return CookieMiddleware(SessionMiddleware(CachedAuthMiddleware(inner)))
@@ -0,0 +1,196 @@
+"""
+Filas de saída limitadas por conexão WebSocket
+
+O ASGI não informa quanto o servidor ainda tem para escrever no socket de cada
+navegador: sem limite, um cliente lento acumula quadros na memória do daphne.
+Cada conexão passa a ter uma fila de saída com tamanho máximo
+(settings.WEBSOCKET_FILA_SAIDA_MAXIMA) esvaziada por uma tarefa própria, e o
+navegador confirma os quadros recebidos ({'type': 'ack', 'received': N}).
+Desde a conexão, no máximo WEBSOCKET_JANELA_ENVIO quadros ficam sem
+confirmação; o resto espera na fila. Um cliente que nunca confirma recebe só a
+primeira janela e depois é tratado como lento (descarte ou desconexão).
+
+Eventos marcados como substituíveis (ex.: stats_update) ocupam uma única
+posição na fila: o mais novo substitui o anterior ainda não enviado. Quando a
+fila enche, a conexão descarta o evento mais antigo ou é encerrada com
+CODIGO_FILA_EXCEDIDA (o navegador reconecta e recupera o que perdeu pelo
+'resume'), conforme o consumer.
+"""
+
+import asyncio
+import itertools
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+FILA_SAIDA_MAXIMA_PADRAO = 100
+JANELA_ENVIO_PADRAO = 32
+
+# Código de fechamento quando a fila de saída de uma conexão transborda
+CODIGO_FILA_EXCEDIDA = 4008
+
+# Política ao transbordar: descartar o evento mais antigo ou encerrar a conexão
+DESCARTAR = 'descartar'
+DESCONECTAR = 'desconectar'
+
+# Filas das conexões ativas deste processo e contadores acumulados (métricas)
+_filas = weakref.WeakSet()
+_contadores = {
+    'enfileirados': 0,
+    'coalescidos': 0,
+    'descartados': 0,
+    'desconectados': 0,
+    'maior_profundidade': 0,
+}
+
+
+class FilaSaida:
+    """
+    Fila de textos a enviar para uma conexão, com limite e substituição por chave
+    """
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.itens = OrderedDict()
+        self._ordem = itertools.count()
+        self.aguardando_confirmacao = 0
+        _filas.add(self)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def colocar(self, texto, chave=None):
+        """
+        Enfileira o texto; retorna False se a fila estiver cheia (nada é alterado)
+
+        Com chave, um item pendente com a mesma chave é substituído e vai para o fim.
+        """
+        if chave is not None and ('chave', chave) in self.itens:
+            del self.itens[('chave', chave)]
+            self.itens[('chave', chave)] = texto
+            _contadores['coalescidos'] += 1
+            return True
+        if len(self.itens) >= self.maximo:
+            return False
+
+        self.itens[('chave', chave) if chave is not None else ('ordem', next(self._ordem))] = texto
+        _contadores['enfileirados'] += 1
+        _contadores['maior_profundidade'] = max(_contadores['maior_profundidade'], len(self.itens))
+        return True
+
+    def descartar_mais_antigo(self):
+        self.itens.popitem(last=False)
+        _contadores['descartados'] += 1
+
+    def retirar(self):
+        return self.itens.popitem(last=False)[1]
+
+    def limpar(self):
+        self.itens.clear()
+        _filas.discard(self)
+
+
+def registrar_desconexao():
+    _contadores['desconectados'] += 1
+
+
+def metricas_filas():
+    """Profundidade atual das filas de saída deste processo e contadores acumulados"""
+    filas = list(_filas)
+    profundidades = [len(fila) for fila in filas]
+    return {
+        'conexoes': len(filas),
+        'profundidade_total': sum(profundidades),
+        'profundidade_maxima': max(profundidades, default=0),
+        'conexoes_com_fila': sum(1 for profundidade in profundidades if profundidade),
+        'aguardando_confirmacao': sum(fila.aguardando_confirmacao for fila in filas),
+        'limite_por_conexao': fila_saida_maxima(),
+        'janela_envio': janela_envio(),
+        **_contadores,
+    }
+
+
+def fila_saida_maxima():
+    return getattr(settings, 'WEBSOCKET_FILA_SAIDA_MAXIMA', FILA_SAIDA_MAXIMA_PADRAO)
+
+
+def janela_envio():
+    return getattr(settings, 'WEBSOCKET_JANELA_ENVIO', JANELA_ENVIO_PADRAO)
+
+
+class OutboundQueueMixin:
+    """
+    Envio dos eventos do channel layer por uma fila de saída limitada
+
+    outbound_overflow define o que fazer quando a fila enche: DESCARTAR (o
+    evento mais antigo sai) ou DESCONECTAR (fecha com CODIGO_FILA_EXCEDIDA).
+    """
+
+    outbound_overflow = DESCARTAR
+
+    async def websocket_connect(self, message):
+        self.outbound = FilaSaida(fila_saida_maxima())
+        self.outbound_window = janela_envio()
+        self.outbound_wakeup = asyncio.Event()
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.outbound_closed = False
+        self.outbound_task = asyncio.create_task(self.drain_outbound())
+        await super().websocket_connect(message)
+
+    async def websocket_disconnect(self, message):
+        try:
+            await super().websocket_disconnect(message)
+        finally:
+            self.stop_outbound()
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        # Todo quadro conta para a janela, inclusive os enviados fora da fila (pong, resume)
+        self.frames_sent += 1
+        self.outbound.aguardando_confirmacao = self.frames_sent - self.frames_acked
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+    async def queue_outbound(self, text, key=None):
+        if self.outbound_closed:
+            return
+        if not self.outbound.colocar(text, key):
+            if self.outbound_overflow == DESCONECTAR:
+                await self.close_overflowed()
+                return
+            self.outbound.descartar_mais_antigo()
+            self.outbound.colocar(text, key)
+        self.outbound_wakeup.set()
+
+    def acknowledge(self, data):
+        """Confirmação do navegador: total de quadros recebidos nesta conexão"""
+        try:
+            received = int(data.get('received'))
+        except (TypeError, ValueError):
+            return
+        self.frames_acked = max(self.frames_acked, min(received, self.frames_sent))
+        self.outbound.aguardando_confirmacao = self.frames_sent - self.frames_acked
+        self.outbound_wakeup.set()
+
+    def outbound_window_open(self):
+        return self.frames_sent - self.frames_acked < self.outbound_window
+
+    async def drain_outbound(self):
+        while True:
+            while self.outbound and self.outbound_window_open():
+                await self.send(text_data=self.outbound.retirar())
+            self.outbound_wakeup.clear()
+            await self.outbound_wakeup.wait()
+
+    async def close_overflowed(self):
+        self.outbound_closed = True
+        registrar_desconexao()
+        self.stop_outbound()
+        await self.close(code=CODIGO_FILA_EXCEDIDA)
+
+    def stop_outbound(self):
+        task = getattr(self, 'outbound_task', None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        if hasattr(self, 'outbound'):
+            self.outbound.limpar()
@@ -0,0 +1,198 @@
+"""
+Despachante de eventos WebSocket fora do caminho da requisição
+
+Os utilitários de websocket_utils não chamam mais o channel layer dentro da
+requisição: o evento é registrado em transaction.on_commit (nada é enviado
+se a transação for desfeita) e, após o commit, entregue por uma tarefa
+asyncio em segundo plano que envia em lote tudo o que estiver na fila.
+
+A tarefa roda no event loop do servidor ASGI quando a requisição veio dele
+(mesmo loop dos consumers, necessário para o InMemoryChannelLayer) e, fora
+dele (WSGI, comandos de gerenciamento), em um loop próprio numa thread
+daemon. Um disjuntor (circuit breaker) descarta eventos por alguns segundos
+quando o channel layer falha seguidamente, em vez de acumular atrasos.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from asgiref.sync import SyncToAsync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Eventos aguardando entrega por loop; acima disso novos eventos são descartados
+TAMANHO_FILA = 10000
+
+# Máximo de group_send disparados juntos em um lote
+TAMANHO_LOTE = 100
+
+# Disjuntor: falhas seguidas para abrir e segundos até tentar novamente
+FALHAS_PARA_ABRIR = 5
+SEGUNDOS_ABERTO = 30
+
+
+class CircuitBreaker:
+    """
+    Disjuntor simples: abre após falhas consecutivas e libera uma nova
+    tentativa (meio-aberto) depois do tempo de espera.
+    """
+
+    def __init__(self, falhas_para_abrir=FALHAS_PARA_ABRIR, segundos_aberto=SEGUNDOS_ABERTO):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.segundos_aberto = segundos_aberto
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self):
+        return time.monotonic() < self._aberto_ate
+
+    def permite(self):
+        """Indica se o envio deve ser tentado agora"""
+        return not self.aberto
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self._aberto_ate = 0.0
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self._falhas >= self.falhas_para_abrir:
+                self._aberto_ate = time.monotonic() + self.segundos_aberto
+                logger.warning(
+                    'Channel layer indisponível após %s falhas; eventos descartados por %ss',
+                    self._falhas, self.segundos_aberto,
+                )
+
+
+class EventDispatcher:
+    """
+    Entrega eventos do channel layer depois do commit, em lote e em segundo plano
+    """
+
+    def __init__(self, tamanho_fila=TAMANHO_FILA, tamanho_lote=TAMANHO_LOTE, disjuntor=None):
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+        self.disjuntor = disjuntor or CircuitBreaker()
+        self.enviados = 0
+        self.descartados = 0
+        self._filas = {}
+        self._tarefas = {}
+        self._lock = threading.Lock()
+        self._loop_reserva = None
+
+    def enviar(self, grupo, mensagem):
+        """Agenda um group_send para depois do commit da transação corrente"""
+        transaction.on_commit(lambda: self._enfileirar(grupo, mensagem))
+
+    def _enfileirar(self, grupo, mensagem):
+        if not self.disjuntor.permite():
+            self.descartados += 1
+            return
+        loop = self._loop_destino()
+        loop.call_soon_threadsafe(self._colocar_na_fila, loop, grupo, mensagem)
+
+    def _loop_destino(self):
+        """Loop do servidor ASGI que atende esta thread, ou o loop reserva"""
+        loop = getattr(SyncToAsync.threadlocal, 'main_event_loop', None)
+        pid = getattr(SyncToAsync.threadlocal, 'main_event_loop_pid', None)
+        if loop is not None and pid == os.getpid() and loop.is_running():
+            return loop
+        return self._obter_loop_reserva()
+
+    def _obter_loop_reserva(self):
+        with self._lock:
+            if self._loop_reserva is None or self._loop_reserva.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name='websocket-dispatcher', daemon=True
+                ).start()
+                self._loop_reserva = loop
+            return self._loop_reserva
+
+    def _colocar_na_fila(self, loop, grupo, mensagem):
+        """Executado dentro do loop de destino"""
+        fila = self._filas.get(loop)
+        if fila is None:
+            # Esquece filas de loops já encerrados (ex.: loops temporários de async_to_sync)
+            for encerrado in [outro for outro in self._filas if outro.is_closed()]:
+                self._filas.pop(encerrado, None)
+                self._tarefas.pop(encerrado, None)
+            fila = self._filas[loop] = asyncio.Queue(maxsize=self.tamanho_fila)
+            self._tarefas[loop] = loop.create_task(self._entregar(fila))
+        try:
+            fila.put_nowait((grupo, mensagem))
+        except asyncio.QueueFull:
+            self.descartados += 1
+            logger.warning('Fila de eventos WebSocket cheia; evento para %s descartado', grupo)
+
+    async def _entregar(self, fila):
+        """Consome a fila enviando juntos todos os eventos já enfileirados"""
+        camada = get_channel_layer()
+        while True:
+            lote = [await fila.get()]
+            while len(lote) < self.tamanho_lote and not fila.empty():
+                lote.append(fila.get_nowait())
+
+            try:
+                if camada is None or not self.disjuntor.permite():
+                    self.descartados += len(lote)
+                    continue
+                resultados = await asyncio.gather(
+                    *(camada.group_send(grupo, mensagem) for grupo, mensagem in lote),
+                    return_exceptions=True,
+                )
+                falhas = [resultado for resultado in resultados if isinstance(resultado, Exception)]
+                self.enviados += len(lote) - len(falhas)
+                self.descartados += len(falhas)
+                if falhas:
+                    logger.warning('Falha ao enviar %s de %s eventos WebSocket: %r', len(falhas), len(lote), falhas[0])
+                    self.disjuntor.registrar_falha()
+                else:
+                    self.disjuntor.registrar_sucesso()
+            finally:
+                for _ in lote:
+                    fila.task_done()
+
+    def aguardar_entrega(self, timeout=5):
+        """
+        Espera o loop reserva esvaziar a fila (comandos de gerenciamento e
+        scripts que encerram logo após enviar eventos).
+        """
+        loop = self._loop_reserva
+        if loop is None or loop.is_closed():
+            return True
+        try:
+            asyncio.run_coroutine_threadsafe(self.esvaziar(), loop).result(timeout)
+            return True
+        except FuturesTimeoutError:
+            return False
+
+    async def esvaziar(self):
+        """Espera a entrega dos eventos enfileirados no loop corrente (antes de encerrá-lo)"""
+        # Deixa rodar os call_soon_threadsafe já agendados, para a fila já ter recebido os eventos
+        await asyncio.sleep(0)
+        fila = self._filas.get(asyncio.get_running_loop())
+        if fila is not None:
+            await fila.join()
+
+
+dispatcher = EventDispatcher()
+
+# Não perde eventos enviados pouco antes do processo terminar
+atexit.register(dispatcher.aguardar_entrega, 2)
+
+
+def enviar_evento(grupo, mensagem):
+    """Envia uma mensagem ao grupo do channel layer após o commit, sem bloquear a requisição"""
+    dispatcher.enviar(grupo, mensagem)
@@ -0,0 +1,90 @@
+"""
+Registro de eventos WebSocket e envelope pré-serializado
+
+Cada tipo de evento enviado aos navegadores é registrado uma única vez com
+os campos que compõem a mensagem. O JSON é gerado no remetente, uma vez por
+evento, e viaja pronto pelo channel layer no envelope {'type': 'ws.forward',
+'text': ...}; os consumers apenas repassam o texto a cada conexão, sem
+reconstruir nem reserializar a mensagem. Eventos substituíveis (só o mais
+recente interessa, ex.: stats_update) levam 'coalesce' no envelope para ocupar
+uma única posição na fila de saída da conexão (ver websocket_backpressure).
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Tipo da mensagem no channel layer (tratado por ForwardEventMixin.ws_forward)
+TIPO_ENVELOPE = 'ws.forward'
+
+# tipo -> (campos, valores padrão dos campos opcionais)
+EVENTOS = {}
+
+# Tipos em que um evento novo substitui o anterior ainda não enviado
+COALESCIVEIS = set()
+
+
+def registrar_evento(tipo, campos, padroes=None, coalescer=False):
+    """Registra um tipo de evento com seus campos (e padrões dos opcionais)"""
+    EVENTOS[tipo] = (tuple(campos), dict(padroes or {}))
+    if coalescer:
+        COALESCIVEIS.add(tipo)
+    else:
+        COALESCIVEIS.discard(tipo)
+
+
+def serializar_evento(tipo, dados, seq=None):
+    """Monta e serializa a mensagem do evento para o navegador (com 'seq' nos fluxos individuais)"""
+    try:
+        campos, padroes = EVENTOS[tipo]
+    except KeyError:
+        raise ValueError(f'Evento WebSocket não registrado: {tipo}')
+
+    mensagem = {'type': tipo}
+    for campo in campos:
+        if campo in dados:
+            mensagem[campo] = dados[campo]
+        elif campo in padroes:
+            mensagem[campo] = padroes[campo]
+        else:
+            raise ValueError(f'Campo obrigatório ausente no evento {tipo}: {campo}')
+    if seq is not None:
+        mensagem['seq'] = seq
+    return json.dumps(mensagem, cls=DjangoJSONEncoder)
+
+
+def envelope(tipo, **dados):
+    """Mensagem do channel layer com o evento já serializado"""
+    mensagem = envelope_texto(serializar_evento(tipo, dados))
+    if tipo in COALESCIVEIS:
+        mensagem['coalesce'] = tipo
+    return mensagem
+
+
+def envelope_texto(texto):
+    """Envelope para um evento já serializado (ex.: reenviado do log de eventos)"""
+    return {'type': TIPO_ENVELOPE, 'text': texto}
+
+
+# Eventos do cliente
+registrar_evento('appointment_status_changed', ['appointment_id', 'new_status', 'status_display', 'message'])
+registrar_evento('appointment_confirmed', ['appointment_id', 'date', 'time', 'message'])
+registrar_evento('appointment_cancelled', ['appointment_id', 'reason', 'message'], {'reason': ''})
+registrar_evento('new_notification', ['notification_id', 'title', 'message', 'notification_type'])
+registrar_evento('reminder', ['appointment_id', 'message', 'time_until'])
+registrar_evento('campaign', ['campaign_id', 'title', 'message'])
+
+# Eventos do painel administrativo
+registrar_evento('new_appointment', [
+    'appointment_id', 'client_name', 'client_email', 'vehicle', 'service',
+    'date', 'time', 'total_price', 'created_at',
+])
+registrar_evento('appointment_cancelled_by_client', ['appointment_id', 'client_name', 'reason'], {'reason': 'Não informado'})
+registrar_evento('new_customer', ['customer_id', 'name', 'email', 'joined_at'])
+registrar_evento('new_vehicle', ['vehicle_id', 'owner_name', 'vehicle', 'plate'])
+registrar_evento('stats_update', ['stats'], coalescer=True)
+
+# Notificações gerais
+registrar_evento('notification', ['id', 'title', 'message', 'notification_type', 'created_at'])
+registrar_evento('alert', ['level', 'title', 'message'])
+registrar_evento('message', ['message', 'sender'], {'sender': 'Sistema'})
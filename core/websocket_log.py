@@ -0,0 +1,116 @@
+"""
+Log sequenciado de eventos WebSocket por usuário
+
+Cada evento enviado a um grupo individual (client_<id>, notifications_<id>)
+recebe o próximo número de sequência do grupo, que segue no JSON como 'seq',
+e é guardado já serializado em um buffer circular de tamanho fixo
+(RealtimeEvent). Ao reconectar, o navegador envia
+{'type': 'resume', 'last_seq': N} e recebe apenas os eventos posteriores a N;
+se parte deles já foi sobrescrita no buffer, recebe 'resync_required' e
+recarrega a página/lista por completo.
+
+A sequência e o evento são gravados na mesma transação do envio: se ela for
+desfeita, nem o número é consumido nem o evento é entregue. São duas
+consultas por evento: o UPDATE … RETURNING que soma e devolve a sequência
+(no PostgreSQL e no SQLite 3.35+; nos demais, UPDATE seguido de SELECT) e o
+INSERT … ON CONFLICT da posição no buffer.
+"""
+
+import json
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RealtimeStream, RealtimeEvent
+from .websocket_events import serializar_evento
+
+# Eventos guardados por grupo; reconexões mais atrasadas que isso recarregam tudo
+TAMANHO_BUFFER_EVENTOS = 200
+
+SQL_PROXIMA_SEQUENCIA = (
+    'UPDATE core_realtime_stream SET ultima_sequencia = ultima_sequencia + 1 '
+    'WHERE grupo = %s RETURNING id, ultima_sequencia'
+)
+
+
+def _suporta_update_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+
+
+def _proxima_sequencia(grupo):
+    """Soma 1 à sequência do grupo e retorna (fluxo_id, sequencia), ou None se o fluxo não existe"""
+    if not _suporta_update_returning():
+        if not RealtimeStream.objects.filter(grupo=grupo).update(ultima_sequencia=F('ultima_sequencia') + 1):
+            return None
+        return RealtimeStream.objects.filter(grupo=grupo).values_list('id', 'ultima_sequencia').get()
+
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_PROXIMA_SEQUENCIA, [grupo])
+        return cursor.fetchone()
+
+
+def registrar_evento_sequenciado(usuario_id, grupo, tipo, dados):
+    """
+    Atribui a sequência do grupo, grava o evento no buffer e retorna o texto JSON
+    """
+    with transaction.atomic():
+        proxima = _proxima_sequencia(grupo)
+        if proxima is None:
+            # Primeiro evento do grupo
+            RealtimeStream.objects.get_or_create(grupo=grupo, defaults={'usuario_id': usuario_id})
+            proxima = _proxima_sequencia(grupo)
+        fluxo_id, sequencia = proxima
+
+        texto = serializar_evento(tipo, dados, seq=sequencia)
+        RealtimeEvent.objects.bulk_create(
+            [RealtimeEvent(
+                fluxo_id=fluxo_id,
+                posicao=sequencia % TAMANHO_BUFFER_EVENTOS,
+                sequencia=sequencia,
+                texto=texto,
+                criado_em=timezone.now(),
+            )],
+            update_conflicts=True,
+            unique_fields=['fluxo', 'posicao'],
+            update_fields=['sequencia', 'texto', 'criado_em'],
+        )
+    return texto
+
+
+def sequencia_atual(grupo):
+    """Último número de sequência do grupo (0 se ainda não houve eventos)"""
+    return RealtimeStream.objects.filter(grupo=grupo).values_list('ultima_sequencia', flat=True).first() or 0
+
+
+def eventos_desde(grupo, ultima_vista):
+    """
+    Eventos do grupo posteriores a 'ultima_vista'.
+
+    Retorna (textos, sequencia_atual); textos é None quando os eventos perdidos
+    já saíram do buffer (ou a sequência informada é desconhecida) e o cliente
+    precisa recarregar tudo.
+    """
+    fluxo = RealtimeStream.objects.filter(grupo=grupo).values_list('id', 'ultima_sequencia').first()
+    if fluxo is None:
+        return ([] if ultima_vista == 0 else None), 0
+
+    fluxo_id, atual = fluxo
+    if ultima_vista > atual or ultima_vista < atual - TAMANHO_BUFFER_EVENTOS:
+        return None, atual
+    if ultima_vista == atual:
+        return [], atual
+
+    textos = list(
+        RealtimeEvent.objects.filter(fluxo_id=fluxo_id, sequencia__gt=ultima_vista)
+        .order_by('sequencia')
+        .values_list('texto', flat=True)
+    )
+    return textos, atual
+
+
+def mensagem_resync(atual):
+    """Aviso ao navegador de que os eventos perdidos não estão mais disponíveis"""
+    return json.dumps({'type': 'resync_required', 'seq': atual})
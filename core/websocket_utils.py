@@ -1,27 +1,55 @@
 """
 Utilitários WebSocket para enviar mensagens aos consumers
 
-Funções auxiliares para broadcasting de mensagens em tempo real
+Funções auxiliares para broadcasting de mensagens em tempo real. Cada evento é
+serializado uma única vez (ver websocket_events) e enviado após o commit da
+transação, em segundo plano (ver websocket_dispatcher). Eventos de grupos
+individuais recebem número de sequência e ficam no log de reenvio (ver
+websocket_log). Grupos sem nenhuma conexão viva no registro de presença (ver
+presence) não recebem o envio: os eventos individuais continuam no log e são
+entregues pelo 'resume' quando o usuário reconectar.
 """
 
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .presence import grupo_online
+from .websocket_dispatcher import enviar_evento
+from .websocket_events import envelope, envelope_texto
+from .websocket_log import registrar_evento_sequenciado
+
+
+def role_group_name(funcao):
+    """Grupo de notificações compartilhado por todos os usuários conectados de uma função"""
+    return f'notifications_role_{funcao}'
+
+
+def send_if_online(group, message):
+    """Envia ao grupo somente se houver alguma conexão viva nele"""
+    if grupo_online(group):
+        enviar_evento(group, message)
+
+
+def send_to_user(user_id, group, event_type, **data):
+    """
+    Envia um evento a um grupo individual do usuário, com número de sequência
+    
+    O evento fica no log do grupo para ser reenviado se o navegador reconectar
+    depois de perdê-lo; com o usuário offline, fica só no log.
+    """
+    text = registrar_evento_sequenciado(user_id, group, event_type, data)
+    send_if_online(group, envelope_texto(text))
 
 
 def notify_client_appointment_status_changed(user_id, appointment_id, new_status, status_display, message):
     """
     Notifica cliente sobre mudança de status de agendamento
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'client_{user_id}',
-        {
-            'type': 'appointment_status_changed',
-            'appointment_id': appointment_id,
-            'new_status': new_status,
-            'status_display': status_display,
-            'message': message
-        }
+        'appointment_status_changed',
+        appointment_id=appointment_id,
+        new_status=new_status,
+        status_display=status_display,
+        message=message
     )
 
 
@@ -29,16 +57,14 @@ def notify_client_appointment_confirmed(user_id, appointment_id, date, time, mes
     """
     Notifica cliente sobre confirmação de agendamento
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'client_{user_id}',
-        {
-            'type': 'appointment_confirmed',
-            'appointment_id': appointment_id,
-            'date': date,
-            'time': time,
-            'message': message
-        }
+        'appointment_confirmed',
+        appointment_id=appointment_id,
+        date=date,
+        time=time,
+        message=message
     )
 
 
@@ -46,15 +72,13 @@ def notify_client_appointment_cancelled(user_id, appointment_id, reason, message
     """
     Notifica cliente sobre cancelamento de agendamento
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'client_{user_id}',
-        {
-            'type': 'appointment_cancelled',
-            'appointment_id': appointment_id,
-            'reason': reason,
-            'message': message
-        }
+        'appointment_cancelled',
+        appointment_id=appointment_id,
+        reason=reason,
+        message=message
     )
 
 
@@ -62,16 +86,14 @@ def notify_client_new_notification(user_id, notification_id, title, message, not
     """
     Envia nova notificação para cliente
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'client_{user_id}',
-        {
-            'type': 'new_notification',
-            'notification_id': notification_id,
-            'title': title,
-            'message': message,
-            'notification_type': notification_type
-        }
+        'new_notification',
+        notification_id=notification_id,
+        title=title,
+        message=message,
+        notification_type=notification_type
     )
 
 
@@ -79,15 +101,13 @@ def notify_client_reminder(user_id, appointment_id, message, time_until):
     """
     Envia lembrete para cliente
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'client_{user_id}',
-        {
-            'type': 'reminder',
-            'appointment_id': appointment_id,
-            'message': message,
-            'time_until': time_until
-        }
+        'reminder',
+        appointment_id=appointment_id,
+        message=message,
+        time_until=time_until
     )
 
 
@@ -108,29 +128,28 @@ def notify_admin_new_appointment(appointment_data):
     - total_price
     - created_at
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_if_online(
         'admin_panel',
-        {
-            'type': 'new_appointment',
+        envelope(
+            'new_appointment',
             **appointment_data
-        }
+        )
     )
 
 
-def notify_admin_appointment_cancelled_by_client(appointment_id, client_name, reason=''):
+def notify_admin_appointment_cancelled_by_client(appointment_id, client_name, reason=None):
     """
-    Notifica admins sobre cancelamento pelo cliente
+    Notifica admins sobre cancelamento pelo cliente (sem motivo, vale o padrão do evento)
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    motivo = {} if reason is None else {'reason': reason}
+    send_if_online(
         'admin_panel',
-        {
-            'type': 'appointment_cancelled_by_client',
-            'appointment_id': appointment_id,
-            'client_name': client_name,
-            'reason': reason
-        }
+        envelope(
+            'appointment_cancelled_by_client',
+            appointment_id=appointment_id,
+            client_name=client_name,
+            **motivo
+        )
     )
 
 
@@ -138,16 +157,15 @@ def notify_admin_new_customer(customer_id, name, email, joined_at):
     """
     Notifica admins sobre novo cliente
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_if_online(
         'admin_panel',
-        {
-            'type': 'new_customer',
-            'customer_id': customer_id,
-            'name': name,
-            'email': email,
-            'joined_at': joined_at
-        }
+        envelope(
+            'new_customer',
+            customer_id=customer_id,
+            name=name,
+            email=email,
+            joined_at=joined_at
+        )
     )
 
 
@@ -155,16 +173,15 @@ def notify_admin_new_vehicle(vehicle_id, owner_name, vehicle, plate):
     """
     Notifica admins sobre novo veículo
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_if_online(
         'admin_panel',
-        {
-            'type': 'new_vehicle',
-            'vehicle_id': vehicle_id,
-            'owner_name': owner_name,
-            'vehicle': vehicle,
-            'plate': plate
-        }
+        envelope(
+            'new_vehicle',
+            vehicle_id=vehicle_id,
+            owner_name=owner_name,
+            vehicle=vehicle,
+            plate=plate
+        )
     )
 
 
@@ -180,13 +197,12 @@ def notify_admin_stats_update(stats):
     - total_revenue
     - etc.
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_if_online(
         'admin_panel',
-        {
-            'type': 'stats_update',
-            'stats': stats
-        }
+        envelope(
+            'stats_update',
+            stats=stats
+        )
     )
 
 
@@ -196,17 +212,15 @@ def send_notification(user_id, notification_id, title, message, notification_typ
     """
     Envia notificação geral para usuário
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'notifications_{user_id}',
-        {
-            'type': 'notification',
-            'id': notification_id,
-            'title': title,
-            'message': message,
-            'notification_type': notification_type,
-            'created_at': created_at
-        }
+        'notification',
+        id=notification_id,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        created_at=created_at
     )
 
 
@@ -216,15 +230,13 @@ def send_alert(user_id, level, title, message):
     
     level: 'info', 'warning', 'error', 'success'
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'notifications_{user_id}',
-        {
-            'type': 'alert',
-            'level': level,
-            'title': title,
-            'message': message
-        }
+        'alert',
+        level=level,
+        title=title,
+        message=message
     )
 
 
@@ -232,14 +244,29 @@ def send_system_message(user_id, message, sender='Sistema'):
     """
     Envia mensagem do sistema para usuário
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    send_to_user(
+        user_id,
         f'notifications_{user_id}',
-        {
-            'type': 'message',
-            'message': message,
-            'sender': sender
-        }
+        'message',
+        message=message,
+        sender=sender
+    )
+
+
+def send_alert_to_role(funcao, level, title, message):
+    """
+    Envia alerta a todos os usuários conectados de uma função (admin, employee, client)
+    
+    Um único group_send para o grupo da função, sem consultar o banco.
+    """
+    send_if_online(
+        role_group_name(funcao),
+        envelope(
+            'alert',
+            level=level,
+            title=title,
+            message=message
+        )
     )
 
 
@@ -247,8 +274,11 @@ def broadcast_alert_to_all_admins(level, title, message):
     """
     Envia alerta para todos os admins conectados
     """
-    from core.models import User
-    admins = User.objects.filter(funcao='admin')
-    
-    for admin in admins:
-        send_alert(admin.id, level, title, message)
+    send_alert_to_role('admin', level, title, message)
+
+
+def broadcast_alert_to_all_employees(level, title, message):
+    """
+    Envia alerta para todos os funcionários conectados
+    """
+    send_alert_to_role('employee', level, title, message)
@@ -1,6 +1,22 @@
-from django.contrib import admin
-from .models import ProductCategory, Supplier, Product, StockMovement, ProductImage, PurchaseOrder, PurchaseOrderItem
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.utils.html import format_html
+from .models import (
+    ProductCategory, Supplier, Product, StockMovement, ProductImage, PurchaseOrder, PurchaseOrderItem,
+    ServiceProductConsumption, InventorySnapshot,
+)
 from core.admin import admin_site
+from core.thumbnails import url_miniatura
+
+
+def image_preview(obj):
+    """Miniatura em cache da imagem (não baixa o original)"""
+    if obj.imagem:
+        return format_html(
+            '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
+            url_miniatura(obj.imagem, 150)
+        )
+    return "Sem imagem"
 
 
 class ProductImageInline(admin.TabularInline):
@@ -9,7 +25,12 @@ class ProductImageInline(admin.TabularInline):
     """
     model = ProductImage
     extra = 1
-    readonly_fields = ('criada_em',)
+    fields = ('imagem', 'image_preview', 'descricao', 'principal', 'criada_em')
+    readonly_fields = ('image_preview', 'criada_em')
+    
+    def image_preview(self, obj):
+        return image_preview(obj)
+    image_preview.short_description = "Preview"
 
 
 class StockMovementInline(admin.TabularInline):
@@ -22,6 +43,15 @@ class StockMovementInline(admin.TabularInline):
     fields = ('tipo', 'quantidade', 'motivo', 'usuario', 'criado_em')
 
 
+class ServiceProductConsumptionInline(admin.TabularInline):
+    """
+    Inline para consumo do produto por serviço
+    """
+    model = ServiceProductConsumption
+    extra = 0
+    autocomplete_fields = ('servico',)
+
+
 class PurchaseOrderItemInline(admin.TabularInline):
     """
     Inline para itens de ordem de compra
@@ -62,7 +92,7 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('nome', 'descricao', 'sku', 'codigo_barras')
     ordering = ('nome',)
     readonly_fields = ('criado_em', 'atualizado_em', 'is_low_stock', 'is_out_of_stock')
-    inlines = [ProductImageInline, StockMovementInline]
+    inlines = [ProductImageInline, ServiceProductConsumptionInline, StockMovementInline]
     
     fieldsets = (
         ('Informações do Produto', {
@@ -103,10 +133,14 @@ class ProductImageAdmin(admin.ModelAdmin):
     """
     Admin para imagens de produtos
     """
-    list_display = ('produto', 'descricao', 'principal', 'criada_em')
+    list_display = ('produto', 'image_preview', 'descricao', 'principal', 'criada_em')
     list_filter = ('principal', 'criada_em')
     search_fields = ('produto__nome', 'descricao')
     ordering = ('-criada_em',)
+    
+    def image_preview(self, obj):
+        return image_preview(obj)
+    image_preview.short_description = "Preview"
 
 
 class PurchaseOrderAdmin(admin.ModelAdmin):
@@ -119,6 +153,7 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
     ordering = ('-criado_em',)
     readonly_fields = ('criado_em', 'enviado_em', 'recebido_em')
     inlines = [PurchaseOrderItemInline]
+    actions = ['receber_pedidos']
     
     fieldsets = (
         ('Informações da Ordem', {
@@ -135,6 +170,15 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    @admin.action(description='Receber saldo pendente dos pedidos selecionados')
+    def receber_pedidos(self, request, queryset):
+        for pedido in queryset:
+            try:
+                movimentos = pedido.receber(usuario=request.user)
+                self.message_user(request, f'Pedido {pedido.numero_pedido}: {len(movimentos)} itens recebidos.')
+            except ValidationError as e:
+                self.message_user(request, f'Pedido {pedido.numero_pedido}: {" ".join(e.messages)}', messages.ERROR)
 
 
 class PurchaseOrderItemAdmin(admin.ModelAdmin):
@@ -147,6 +191,33 @@ class PurchaseOrderItemAdmin(admin.ModelAdmin):
     ordering = ('-ordem_compra__criado_em',)
 
 
+class ServiceProductConsumptionAdmin(admin.ModelAdmin):
+    """
+    Admin para consumo de produtos por serviço
+    """
+    list_display = ('servico', 'produto', 'quantidade')
+    list_filter = ('servico__categoria', 'produto__categoria')
+    search_fields = ('servico__nome', 'produto__nome')
+    ordering = ('servico__nome', 'produto__nome')
+
+
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    """
+    Admin para snapshots diários de estoque (somente leitura)
+    """
+    list_display = ('data', 'produto', 'quantidade', 'preco_custo', 'valor')
+    list_filter = ('data', 'produto__categoria')
+    search_fields = ('produto__nome',)
+    ordering = ('-data', 'produto__nome')
+    date_hierarchy = 'data'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Registra no site admin customizado
 admin_site.register(ProductCategory, ProductCategoryAdmin)
 admin_site.register(Supplier, SupplierAdmin)
@@ -154,4 +225,6 @@ admin_site.register(Product, ProductAdmin)
 admin_site.register(StockMovement, StockMovementAdmin)
 admin_site.register(ProductImage, ProductImageAdmin)
 admin_site.register(PurchaseOrder, PurchaseOrderAdmin)
-admin_site.register(PurchaseOrderItem, PurchaseOrderItemAdmin)
\ No newline at end of file
+admin_site.register(PurchaseOrderItem, PurchaseOrderItemAdmin)
+admin_site.register(ServiceProductConsumption, ServiceProductConsumptionAdmin)
+admin_site.register(InventorySnapshot, InventorySnapshotAdmin)
\ No newline at end of file
@@ -5,3 +5,7 @@ class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
     verbose_name = 'Controle de Estoque'
+    
+    def ready(self):
+        # Registra os receivers de invalidação de cache
+        from . import signals  # noqa: F401
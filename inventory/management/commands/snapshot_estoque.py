@@ -0,0 +1,41 @@
+"""
+Comando para gravar os snapshots diários de estoque
+
+Deve ser agendado (cron / agendador de tarefas) para rodar uma vez por dia,
+logo após a meia-noite. Execuções atrasadas preenchem todos os dias pendentes.
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.snapshots import gerar_snapshots, produtos_sem_custo
+
+
+class Command(BaseCommand):
+    help = 'Grava a posição de estoque ao final de cada dia pendente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ate', type=str, help='Último dia a fotografar (YYYY-MM-DD, padrão: ontem)')
+
+    def handle(self, *args, **options):
+        ate = None
+        if options.get('ate'):
+            try:
+                ate = datetime.strptime(options['ate'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida, use o formato YYYY-MM-DD')
+        
+        inicio = time.monotonic()
+        total = gerar_snapshots(ate=ate)
+        duracao = time.monotonic() - inicio
+        
+        if total:
+            self.stdout.write(self.style.SUCCESS(f'{total} snapshots gravados em {duracao:.2f}s'))
+            sem_custo = list(produtos_sem_custo().values_list('nome', flat=True))
+            if sem_custo:
+                self.stdout.write(self.style.WARNING(
+                    f'{len(sem_custo)} produtos sem preço de custo valorados em 0: {", ".join(sem_custo)}'
+                ))
+        else:
+            self.stdout.write(self.style.WARNING('Nenhum dia pendente'))
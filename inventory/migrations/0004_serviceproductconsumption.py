@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_alter_product_options_alter_productcategory_options_and_more'),
+        ('services', '0003_alter_service_options_alter_servicecategory_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceProductConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.DecimalField(decimal_places=3, max_digits=10, verbose_name='Quantidade por Serviço')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='inventory.product', verbose_name='Produto')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='services.service', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Consumo de Produto por Serviço',
+                'verbose_name_plural': 'Consumos de Produtos por Serviço',
+                'db_table': 'inventory_serviceproductconsumption',
+                'unique_together': {('servico', 'produto')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_serviceproductconsumption'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('quantidade', models.IntegerField(verbose_name='Quantidade')),
+                ('preco_custo', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Custo Unitário')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valor em Estoque')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque',
+                'verbose_name_plural': 'Snapshots de Estoque',
+                'db_table': 'inventory_inventorysnapshot',
+                'ordering': ['-data', 'produto'],
+                'indexes': [models.Index(fields=['data'], name='inventory_snapshot_data_idx')],
+                'unique_together': {('produto', 'data')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_inventorysnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorysnapshot',
+            name='preco_custo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Custo Unitário'),
+        ),
+    ]
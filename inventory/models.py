@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, When, F, Sum, Value
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
 from core.models import User
+from services.models import Service
 
 
 class ProductCategory(models.Model):
@@ -169,6 +172,92 @@ class PurchaseOrder(models.Model):
     
     def __str__(self):
         return f"Pedido {self.numero_pedido} - {self.fornecedor.nome}"
+    
+    def receber(self, quantidades=None, usuario=None):
+        """
+        Registra o recebimento dos itens do pedido.
+        
+        quantidades: {item_id: quantidade recebida agora}. Se omitido, recebe o
+        saldo pendente de todos os itens. O número de queries é constante
+        (independe da quantidade de itens): estoque atualizado em um único
+        UPDATE ... CASE, movimentações em um único bulk_create e valor total
+        recalculado por agregação, tudo na mesma transação.
+        """
+        if self.situacao == 'cancelled':
+            raise ValidationError('Não é possível receber um pedido cancelado.')
+        
+        with transaction.atomic():
+            itens = list(
+                self.items.select_related('produto').select_for_update()
+            )
+            if quantidades is None:
+                quantidades = {item.pk: item.quantidade - item.quantidade_recebida for item in itens}
+            else:
+                quantidades = {int(item_id): int(qtd) for item_id, qtd in quantidades.items()}
+            
+            itens_por_id = {item.pk: item for item in itens}
+            desconhecidos = set(quantidades) - set(itens_por_id)
+            if desconhecidos:
+                raise ValidationError(f'Itens não pertencem ao pedido: {sorted(desconhecidos)}')
+            
+            agora = timezone.now()
+            recebidos = []
+            movimentos = []
+            for item_id, qtd in quantidades.items():
+                item = itens_por_id[item_id]
+                if qtd < 0:
+                    raise ValidationError(f'Quantidade inválida para {item.produto.nome}.')
+                if item.quantidade_recebida + qtd > item.quantidade:
+                    raise ValidationError(
+                        f'Quantidade recebida de {item.produto.nome} excede o pedido '
+                        f'({item.quantidade_recebida + qtd} de {item.quantidade}).'
+                    )
+                if qtd == 0:
+                    continue
+                
+                item.quantidade_recebida += qtd
+                recebidos.append(item)
+                movimentos.append(StockMovement(
+                    produto_id=item.produto_id,
+                    tipo='entrada',
+                    quantidade=qtd,
+                    quantidade_anterior=item.produto.quantidade,
+                    nova_quantidade=item.produto.quantidade + qtd,
+                    motivo=f'Recebimento do pedido {self.numero_pedido}',
+                    usuario=usuario,
+                    documento_referencia=self.numero_pedido,
+                    criado_em=agora,
+                ))
+            
+            if recebidos:
+                # Estoque de todos os produtos em um único UPDATE ... CASE
+                Product.objects.filter(pk__in=[item.produto_id for item in recebidos]).update(
+                    quantidade=Case(
+                        *[When(pk=item.produto_id, then=F('quantidade') + Value(quantidades[item.pk]))
+                          for item in recebidos],
+                        default=F('quantidade'),
+                    ),
+                    atualizado_em=agora,
+                )
+                PurchaseOrderItem.objects.bulk_update(recebidos, ['quantidade_recebida'])
+                StockMovement.objects.bulk_create(movimentos)
+            
+            # Corrige preco_total de todos os itens e recalcula o total do pedido
+            self.items.update(preco_total=F('quantidade') * F('preco_unitario'))
+            self.valor_total = self.items.aggregate(total=Sum('preco_total'))['total'] or Decimal('0.00')
+            
+            campos = ['valor_total']
+            if all(item.quantidade_recebida >= item.quantidade for item in itens):
+                self.situacao = 'received'
+                self.recebido_em = agora
+                campos += ['situacao', 'recebido_em']
+            self.save(update_fields=campos)
+            
+            # update()/bulk_create() não disparam sinais: invalidar a projeção manualmente
+            from .projections import invalidar_projecao
+            transaction.on_commit(invalidar_projecao)
+        
+        return movimentos
 
 
 class PurchaseOrderItem(models.Model):
@@ -194,3 +283,48 @@ class PurchaseOrderItem(models.Model):
     def save(self, *args, **kwargs):
         self.preco_total = self.quantidade * self.preco_unitario
         super().save(*args, **kwargs)
+
+
+
+class ServiceProductConsumption(models.Model):
+    """
+    Consumo de produtos por execução de um serviço
+    """
+    servico = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='consumos', verbose_name='Serviço')
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='consumos', verbose_name='Produto')
+    quantidade = models.DecimalField(max_digits=10, decimal_places=3, verbose_name='Quantidade por Serviço')
+    
+    class Meta:
+        db_table = 'inventory_serviceproductconsumption'
+        verbose_name = 'Consumo de Produto por Serviço'
+        verbose_name_plural = 'Consumos de Produtos por Serviço'
+        unique_together = ['servico', 'produto']
+    
+    def __str__(self):
+        return f"{self.servico.nome} consome {self.quantidade} de {self.produto.nome}"
+
+
+class InventorySnapshot(models.Model):
+    """
+    Fotografia diária do estoque (posição ao final do dia)
+    """
+    produto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='snapshots', verbose_name='Produto')
+    data = models.DateField(verbose_name='Data')
+    quantidade = models.IntegerField(verbose_name='Quantidade')
+    # Sem preço de custo cadastrado fica nulo e o item entra no valor como 0
+    preco_custo = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Custo Unitário')
+    valor = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valor em Estoque')
+    criado_em = models.DateTimeField(default=timezone.now, verbose_name='Criado em')
+    
+    class Meta:
+        db_table = 'inventory_inventorysnapshot'
+        verbose_name = 'Snapshot de Estoque'
+        verbose_name_plural = 'Snapshots de Estoque'
+        ordering = ['-data', 'produto']
+        unique_together = ['produto', 'data']
+        indexes = [
+            models.Index(fields=['data'], name='inventory_snapshot_data_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.produto.nome} em {self.data}: {self.quantidade}"
@@ -0,0 +1,140 @@
+"""
+Projeção de estoque a partir da agenda futura
+
+Cruza os agendamentos dos próximos dias com o consumo de produtos de cada
+serviço (ServiceProductConsumption) para prever o saldo diário de cada produto
+e antecipar rupturas de estoque.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from appointments.models import AppointmentService
+
+# Mesma janela usada pelo calendário de agendamento do cliente
+JANELA_PROJECAO_DIAS = 30
+
+# Agendamentos que ainda vão consumir produtos
+SITUACOES_COM_CONSUMO = ['pending', 'confirmed', 'in_progress']
+
+CACHE_VERSAO_KEY = 'inventory:projecao:versao'
+CACHE_TIMEOUT = 60 * 60
+
+
+def invalidar_projecao():
+    """Invalida projeções em cache (chamado quando agenda ou estoque mudam)"""
+    try:
+        cache.incr(CACHE_VERSAO_KEY)
+    except ValueError:
+        cache.set(CACHE_VERSAO_KEY, 1, None)
+
+
+def _versao_atual():
+    versao = cache.get(CACHE_VERSAO_KEY)
+    if versao is None:
+        cache.add(CACHE_VERSAO_KEY, 1, None)
+        versao = cache.get(CACHE_VERSAO_KEY, 1)
+    return versao
+
+
+def calcular_projecao_estoque(dias=JANELA_PROJECAO_DIAS, inicio=None):
+    """
+    Retorna o saldo projetado dia a dia de cada produto consumido na janela.
+
+    O resultado fica em cache até a próxima alteração de agenda ou estoque.
+    """
+    inicio = inicio or timezone.localdate()
+    chave = f'inventory:projecao:{_versao_atual()}:{inicio.isoformat()}:{dias}'
+
+    projecao = cache.get(chave)
+    if projecao is None:
+        projecao = _calcular_projecao(inicio, dias)
+        cache.set(chave, projecao, CACHE_TIMEOUT)
+    return projecao
+
+
+def _calcular_projecao(inicio, dias):
+    fim = inicio + timedelta(days=dias - 1)
+
+    # Uma única consulta agregada: consumo por (dia, produto), já com o saldo atual
+    linhas = list(
+        AppointmentService.objects.filter(
+            agendamento__data_agendamento__range=(inicio, fim),
+            agendamento__situacao__in=SITUACOES_COM_CONSUMO,
+            servico__consumos__produto__ativo=True,
+        ).values(
+            'agendamento__data_agendamento',
+            'servico__consumos__produto_id',
+            'servico__consumos__produto__nome',
+            'servico__consumos__produto__quantidade',
+            'servico__consumos__produto__quantidade_minima',
+        ).annotate(
+            total=Sum('servico__consumos__quantidade')
+        ).order_by()
+    )
+
+    datas = [inicio + timedelta(days=i) for i in range(dias)]
+    projecao = {
+        'inicio': inicio.isoformat(),
+        'dias': [d.isoformat() for d in datas],
+        'produtos': [],
+        'rupturas': [],
+    }
+    if not linhas:
+        return projecao
+
+    # Metadados por produto (ordem estável por id)
+    produtos = {}
+    for linha in linhas:
+        produtos.setdefault(linha['servico__consumos__produto_id'], linha)
+    ids = sorted(produtos)
+    posicao = {produto_id: i for i, produto_id in enumerate(ids)}
+
+    # Matriz produtos x dias com o consumo previsto
+    linhas_idx = np.fromiter(
+        (posicao[l['servico__consumos__produto_id']] for l in linhas), dtype=np.intp, count=len(linhas)
+    )
+    colunas_idx = np.fromiter(
+        ((l['agendamento__data_agendamento'] - inicio).days for l in linhas), dtype=np.intp, count=len(linhas)
+    )
+    valores = np.fromiter((float(l['total']) for l in linhas), dtype=np.float64, count=len(linhas))
+    consumo = np.zeros((len(ids), dias), dtype=np.float64)
+    np.add.at(consumo, (linhas_idx, colunas_idx), valores)
+
+    estoque = np.array(
+        [produtos[i]['servico__consumos__produto__quantidade'] for i in ids], dtype=np.float64
+    )
+    minimo = np.array(
+        [produtos[i]['servico__consumos__produto__quantidade_minima'] for i in ids], dtype=np.float64
+    )
+    saldo = estoque[:, None] - np.cumsum(consumo, axis=1)
+
+    em_ruptura = saldo < 0
+    abaixo_minimo = saldo < minimo[:, None]
+    tem_ruptura = em_ruptura.any(axis=1)
+    tem_minimo = abaixo_minimo.any(axis=1)
+    dia_ruptura = em_ruptura.argmax(axis=1)
+    dia_minimo = abaixo_minimo.argmax(axis=1)
+
+    for i, produto_id in enumerate(ids):
+        meta = produtos[produto_id]
+        item = {
+            'id': produto_id,
+            'nome': meta['servico__consumos__produto__nome'],
+            'estoque_atual': int(estoque[i]),
+            'quantidade_minima': int(minimo[i]),
+            'consumo_previsto': round(float(consumo[i].sum()), 3),
+            'saldo_projetado': np.round(saldo[i], 3).tolist(),
+            'ruptura_em': datas[dia_ruptura[i]].isoformat() if tem_ruptura[i] else None,
+            'abaixo_minimo_em': datas[dia_minimo[i]].isoformat() if tem_minimo[i] else None,
+        }
+        projecao['produtos'].append(item)
+        if item['ruptura_em']:
+            projecao['rupturas'].append(item)
+
+    projecao['rupturas'].sort(key=lambda item: item['ruptura_em'])
+    return projecao
@@ -0,0 +1,22 @@
+"""
+Sinais do app de estoque
+
+Mantém os caches derivados (projeção de estoque) coerentes com a agenda e o estoque.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from appointments.models import Appointment, AppointmentService
+from .models import Product, StockMovement, ServiceProductConsumption
+from .projections import invalidar_projecao
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=AppointmentService)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=StockMovement)
+@receiver([post_save, post_delete], sender=ServiceProductConsumption)
+def invalidar_projecao_estoque(sender, **kwargs):
+    """Agenda ou estoque mudou: a projeção em cache deixa de valer"""
+    invalidar_projecao()
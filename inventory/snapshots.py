@@ -0,0 +1,137 @@
+"""
+Snapshots diários de estoque
+
+Grava a posição de cada produto ao final do dia a partir do snapshot anterior
+somado às movimentações do dia, para que consultas históricas de valor do
+estoque leiam apenas a tabela de snapshots em vez de reprocessar todas as
+movimentações.
+
+O valor usa só o preço de custo: produtos sem custo cadastrado ficam com
+preco_custo nulo e valor 0 (o preço de venda inflaria o estoque), e as
+consultas informam quantos itens em estoque ficaram sem custo em cada dia.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Product, StockMovement, InventorySnapshot
+
+TAMANHO_LOTE = 1000
+
+
+def gerar_snapshots(ate=None):
+    """
+    Gera os snapshots pendentes até a data informada (padrão: ontem).
+
+    Retorna a quantidade de linhas inseridas.
+    """
+    ate = ate or timezone.localdate() - timedelta(days=1)
+    ultima = InventorySnapshot.objects.aggregate(ultima=Max('data'))['ultima']
+    if ultima and ultima >= ate:
+        return 0
+
+    # Primeira execução: começa pelo próprio dia 'ate', reconstituído a partir do estoque atual
+    inicio = ultima + timedelta(days=1) if ultima else ate
+    total_dias = (ate - inicio).days + 1
+
+    produtos = list(Product.objects.values_list('id', 'quantidade', 'preco_custo'))
+    if not produtos:
+        return 0
+    posicao = {produto[0]: i for i, produto in enumerate(produtos)}
+
+    # Saldo líquido por (produto, dia) desde o início; o que for posterior a 'ate'
+    # só serve para reconstituir a posição de produtos ainda sem snapshot
+    movimentos = np.zeros((len(produtos), total_dias), dtype=np.int64)
+    posteriores = np.zeros(len(produtos), dtype=np.int64)
+    deltas = (
+        StockMovement.objects.filter(criado_em__date__gte=inicio)
+        .annotate(dia=TruncDate('criado_em'))
+        .values('produto_id', 'dia')
+        .annotate(delta=Sum(F('nova_quantidade') - F('quantidade_anterior')))
+        .order_by()
+    )
+    for linha in deltas:
+        i = posicao.get(linha['produto_id'])
+        if i is None:
+            continue
+        coluna = (linha['dia'] - inicio).days
+        if coluna < total_dias:
+            movimentos[i, coluna] += linha['delta']
+        else:
+            posteriores[i] += linha['delta']
+
+    # Posição ao final do dia anterior ao início
+    atuais = np.array([produto[1] for produto in produtos], dtype=np.int64)
+    base = atuais - movimentos.sum(axis=1) - posteriores
+    if ultima:
+        anteriores = InventorySnapshot.objects.filter(data=ultima).values_list('produto_id', 'quantidade')
+        for produto_id, quantidade in anteriores:
+            i = posicao.get(produto_id)
+            if i is not None:
+                base[i] = quantidade
+
+    saldos = base[:, None] + np.cumsum(movimentos, axis=1)
+
+    agora = timezone.now()
+    snapshots = []
+    for i, (produto_id, _, preco_custo) in enumerate(produtos):
+        for coluna in range(total_dias):
+            quantidade = int(saldos[i, coluna])
+            snapshots.append(InventorySnapshot(
+                produto_id=produto_id,
+                data=inicio + timedelta(days=coluna),
+                quantidade=quantidade,
+                preco_custo=preco_custo,
+                valor=preco_custo * quantidade if preco_custo is not None else 0,
+                criado_em=agora,
+            ))
+
+    with transaction.atomic():
+        InventorySnapshot.objects.bulk_create(snapshots, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+    return len(snapshots)
+
+
+def produtos_sem_custo():
+    """Produtos sem preço de custo: entram nos snapshots com valor 0"""
+    return Product.objects.filter(preco_custo__isnull=True)
+
+
+def _totais():
+    # sem_custo vem antes: depois da anotação 'quantidade', o filtro leria a soma e não o campo
+    return {
+        'sem_custo': Count('id', filter=Q(preco_custo__isnull=True, quantidade__gt=0)),
+        'valor': Sum('valor'),
+        'quantidade': Sum('quantidade'),
+    }
+
+
+def valor_estoque_por_dia(inicio, fim):
+    """Valor, quantidade e itens sem custo (valorados em 0) do estoque ao final de cada dia do intervalo"""
+    return list(
+        InventorySnapshot.objects.filter(data__range=(inicio, fim))
+        .values('data')
+        .annotate(**_totais())
+        .order_by('data')
+    )
+
+
+def valor_estoque_fim_de_mes(inicio, fim):
+    """Valor, quantidade e itens sem custo do estoque no último dia de cada mês do intervalo"""
+    ultimos_dias = []
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        ultimos_dias.append(date(ano, mes, calendar.monthrange(ano, mes)[1]))
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+    return list(
+        InventorySnapshot.objects.filter(data__in=ultimos_dias)
+        .values('data')
+        .annotate(**_totais())
+        .order_by('data')
+    )
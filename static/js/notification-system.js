@@ -8,6 +8,8 @@ class NotificationSystem {
         this.notifications = [];
         this.container = null;
         this.soundEnabled = true;
+        this.lastNotificationId = null;  // maior id já recebido do servidor (polling incremental)
+        this.serverUnread = null;        // contador de não lidas mantido pelo servidor
         this.init();
     }
 
@@ -262,7 +264,9 @@ class NotificationSystem {
     }
 
     updateBadge() {
-        const unreadCount = this.notifications.filter(n => !n.read).length;
+        // Não lidas do servidor vêm do contador; avisos locais (toasts) somam à parte
+        const localUnread = this.notifications.filter(n => !n.read && (this.serverUnread === null || !n.serverId)).length;
+        const unreadCount = (this.serverUnread || 0) + localUnread;
         const badges = document.querySelectorAll('.notification-badge');
         
         badges.forEach(badge => {
@@ -280,6 +284,10 @@ class NotificationSystem {
         document.getElementById('notification-center').classList.remove('translate-x-full');
         
         // Mark visible notifications as read
+        const serverIds = this.notifications.filter(n => !n.read && n.serverId).map(n => n.serverId);
+        if (serverIds.length > 0) {
+            this.markServerRead(serverIds);
+        }
         this.notifications.forEach(notification => {
             if (!notification.read) {
                 notification.read = true;
@@ -319,6 +327,7 @@ class NotificationSystem {
     }
 
     markAllAsRead() {
+        this.markServerRead(null);
         this.notifications.forEach(notification => {
             notification.read = true;
         });
@@ -341,32 +350,88 @@ class NotificationSystem {
     }
 
     startRealTimeUpdates() {
-        // Simulate real-time notifications
+        // Carga inicial sem toasts; depois só o que chegou desde o último id
+        this.checkForUpdates();
         setInterval(() => {
             this.checkForUpdates();
         }, 30000); // Check every 30 seconds
     }
 
     checkForUpdates() {
-        // This would typically fetch from your API
-        fetch('/admin-panel/api/notifications/')
-            .then(response => response.json())
+        const initial = this.lastNotificationId === null;
+        const url = initial
+            ? '/admin-panel/api/notifications/'
+            : `/admin-panel/api/notifications/?since=${this.lastNotificationId}`;
+
+        fetch(url, { credentials: 'same-origin' })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
             .then(data => {
-                data.notifications?.forEach(notification => {
-                    // Only show if it's newer than our last notification
-                    if (!this.notifications.find(n => n.id === notification.id)) {
-                        this.show(notification.message, notification.type, {
-                            title: notification.title,
-                            important: notification.important
-                        });
+                const items = data.notifications || [];
+                // A primeira página vem da mais nova para a mais antiga; o delta, ao contrário
+                (initial ? items.slice().reverse() : items).forEach(item => {
+                    if (!this.notifications.find(n => n.serverId === item.id)) {
+                        this.addServerNotification(item, !initial && !item.lida);
                     }
                 });
+                this.lastNotificationId = Math.max(this.lastNotificationId || 0, data.last_id || 0);
+                this.serverUnread = data.unread;
+                this.updateNotificationCenter();
+                this.updateBadge();
             })
             .catch(error => {
                 console.error('Error checking for notifications:', error);
             });
     }
 
+    addServerNotification(item, toast) {
+        const notification = {
+            id: `server_${item.id}`,
+            serverId: item.id,
+            title: item.titulo,
+            message: item.mensagem,
+            type: item.tipo === 'system' ? 'system' : 'info',
+            timestamp: new Date(item.criada_em),
+            read: item.lida,
+            important: false,
+            persistent: false,
+            actions: []
+        };
+        this.notifications.unshift(notification);
+        if (toast) {
+            this.createToast(notification);
+            if (this.soundEnabled) {
+                this.playNotificationSound(notification.type);
+            }
+        }
+    }
+
+    markServerRead(ids) {
+        if (this.serverUnread === null) return;
+
+        fetch('/admin-panel/api/notifications/lidas/', {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCookie('csrftoken')
+            },
+            body: JSON.stringify(ids === null ? {} : { ids })
+        })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(data => {
+                this.serverUnread = data.unread;
+                this.updateBadge();
+            })
+            .catch(error => {
+                console.error('Error marking notifications as read:', error);
+            });
+    }
+
+    getCookie(name) {
+        const match = document.cookie.split(';').map(c => c.trim()).find(c => c.startsWith(name + '='));
+        return match ? decodeURIComponent(match.substring(name.length + 1)) : null;
+    }
+
     playNotificationSound(type) {
         if (!this.soundEnabled) return;
         
@@ -45,6 +45,8 @@ class AutoV7WebSocketAdmin {
     onOpen(event) {
         console.log('[ADMIN] WebSocket conectado com sucesso!');
         this.reconnectAttempts = 0;
+        this.framesReceived = 0;  // quadros recebidos nesta conexão
+        this.framesAcked = 0;
         this.showConnectionStatus('connected');
         this.startHeartbeat();
         this.dispatchCustomEvent('admin:websocket:connected');
@@ -52,6 +54,7 @@ class AutoV7WebSocketAdmin {
     
     onMessage(event) {
         try {
+            this.countFrame();
             const data = JSON.parse(event.data);
             console.log('[ADMIN] Mensagem recebida:', data);
             this.handleMessage(data);
@@ -68,8 +71,16 @@ class AutoV7WebSocketAdmin {
     onClose(event) {
         console.log('[ADMIN] WebSocket desconectado:', event.code, event.reason);
         this.stopHeartbeat();
+        clearTimeout(this.ackTimeout);
+        this.ackTimeout = null;
         this.showConnectionStatus('disconnected');
         
+        // Servidor limitando reconexões (ex.: após reiniciar): esperar o tempo indicado
+        if (event.code === 4429) {
+            this.scheduleRetryAfter();
+            return;
+        }
+        
         if (!this.isIntentionalClose) {
             this.scheduleReconnect();
         }
@@ -103,6 +114,11 @@ class AutoV7WebSocketAdmin {
                 this.handleStatsUpdate(data);
                 break;
                 
+            case 'retry_later':
+                // Servidor ocupado: a conexão será fechada com 4429
+                this.retryAfter = data.retry_after;
+                break;
+                
             case 'pong':
                 break;
                 
@@ -391,6 +407,30 @@ class AutoV7WebSocketAdmin {
         return this.soundEnabled;
     }
     
+    // Confirmação dos quadros recebidos: o servidor só envia mais quando o navegador acompanha
+    countFrame() {
+        this.framesReceived++;
+        if (this.framesReceived - this.framesAcked >= 16) {
+            this.sendAck();
+        } else if (!this.ackTimeout) {
+            this.ackTimeout = setTimeout(() => this.sendAck(), 250);
+        }
+    }
+    
+    sendAck() {
+        if (this.ackTimeout) {
+            clearTimeout(this.ackTimeout);
+            this.ackTimeout = null;
+        }
+        if (this.socket && this.socket.readyState === WebSocket.OPEN && this.framesReceived > this.framesAcked) {
+            this.socket.send(JSON.stringify({
+                type: 'ack',
+                received: this.framesReceived
+            }));
+            this.framesAcked = this.framesReceived;
+        }
+    }
+    
     // Heartbeat
     startHeartbeat() {
         this.heartbeatInterval = setInterval(() => {
@@ -410,6 +450,22 @@ class AutoV7WebSocketAdmin {
         }
     }
     
+    // Espera indicada pelo servidor em 'retry_later' (não conta como falha)
+    scheduleRetryAfter() {
+        const delay = this.retryAfter || this.jitter(this.reconnectDelay);
+        this.retryAfter = null;
+        console.log(`[ADMIN] Servidor ocupado, reconectando em ${Math.round(delay / 1000)}s`);
+        
+        setTimeout(() => {
+            this.connect();
+        }, delay);
+    }
+    
+    // Entre 50% e 150% do atraso, para as abas não reconectarem ao mesmo tempo
+    jitter(delay) {
+        return delay * (0.5 + Math.random());
+    }
+    
     // Reconexão
     scheduleReconnect() {
         if (this.reconnectAttempts >= this.maxReconnectAttempts) {
@@ -419,11 +475,12 @@ class AutoV7WebSocketAdmin {
         }
         
         this.reconnectAttempts++;
-        console.log(`[ADMIN] Reconectando em ${this.reconnectDelay/1000}s... (${this.reconnectAttempts}/${this.maxReconnectAttempts})`);
+        const delay = this.jitter(this.reconnectDelay);
+        console.log(`[ADMIN] Reconectando em ${Math.round(delay / 1000)}s... (${this.reconnectAttempts}/${this.maxReconnectAttempts})`);
         
         setTimeout(() => {
             this.connect();
-        }, this.reconnectDelay);
+        }, delay);
     }
     
     send(data) {
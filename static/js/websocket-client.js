@@ -13,6 +13,16 @@ class AutoV7WebSocketClient {
         this.heartbeatInterval = null;
         this.isIntentionalClose = false;
         
+        // Última sequência recebida sem lacunas (null até a primeira conexão)
+        this.lastSeq = null;
+        // Sequências já recebidas acima de lastSeq (chegaram fora de ordem)
+        this.receivedSeqs = new Set();
+        
+        // Após falhas seguidas do WebSocket, recebe os eventos por Server-Sent Events
+        this.transport = 'websocket';
+        this.eventSource = null;
+        this.sseFallbackAttempts = 2;
+        
         this.init();
     }
     
@@ -22,6 +32,11 @@ class AutoV7WebSocketClient {
     }
     
     connect() {
+        if (typeof WebSocket === 'undefined') {
+            this.connectEventStream();
+            return;
+        }
+        
         // Determinar protocolo (ws ou wss)
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
         const wsUrl = `${protocol}//${window.location.host}/ws/client/${this.userId}/`;
@@ -45,6 +60,8 @@ class AutoV7WebSocketClient {
     onOpen(event) {
         console.log('WebSocket conectado com sucesso!');
         this.reconnectAttempts = 0;
+        this.framesReceived = 0;  // quadros recebidos nesta conexão
+        this.framesAcked = 0;
         this.showConnectionStatus('connected');
         
         // Iniciar heartbeat
@@ -56,9 +73,17 @@ class AutoV7WebSocketClient {
     
     onMessage(event) {
         try {
+            if (this.transport === 'websocket') {
+                this.countFrame();
+            }
             const data = JSON.parse(event.data);
             console.log('Mensagem recebida:', data);
             
+            // Ignorar eventos já recebidos (reenviados após reconexão)
+            if (this.isDuplicate(data)) {
+                return;
+            }
+            
             // Processar mensagem baseado no tipo
             this.handleMessage(data);
             
@@ -75,8 +100,16 @@ class AutoV7WebSocketClient {
     onClose(event) {
         console.log('WebSocket desconectado:', event.code, event.reason);
         this.stopHeartbeat();
+        clearTimeout(this.ackTimeout);
+        this.ackTimeout = null;
         this.showConnectionStatus('disconnected');
         
+        // Servidor limitando reconexões (ex.: após reiniciar): esperar o tempo indicado
+        if (event.code === 4429) {
+            this.scheduleRetryAfter();
+            return;
+        }
+        
         // Tentar reconectar se não foi intencional
         if (!this.isIntentionalClose) {
             this.scheduleReconnect();
@@ -111,6 +144,19 @@ class AutoV7WebSocketClient {
                 this.handleReminder(data);
                 break;
                 
+            case 'campaign':
+                this.handleCampaign(data);
+                break;
+                
+            case 'resync_required':
+                this.handleResyncRequired(data);
+                break;
+                
+            case 'retry_later':
+                // Servidor ocupado: a conexão será fechada com 4429
+                this.retryAfter = data.retry_after;
+                break;
+                
             case 'pong':
                 // Resposta ao ping
                 break;
@@ -123,6 +169,50 @@ class AutoV7WebSocketClient {
     handleConnectionEstablished(data) {
         console.log('Conexão estabelecida:', data.message);
         this.showNotification('success', 'Conectado', 'Você está conectado ao sistema em tempo real!');
+        
+        if (this.lastSeq === null) {
+            // Primeira conexão: a partir daqui os eventos chegam ao vivo
+            this.lastSeq = data.seq || 0;
+        } else if (this.transport === 'websocket') {
+            // Reconexão: pedir somente os eventos perdidos enquanto estava offline
+            // (no SSE o servidor já reenvia a partir do Last-Event-ID)
+            console.log('Retomando eventos a partir da sequência', this.lastSeq);
+            this.send({
+                type: 'resume',
+                last_seq: this.lastSeq
+            });
+        }
+    }
+    
+    isDuplicate(data) {
+        // Somente eventos do fluxo individual trazem 'seq'
+        if (typeof data.seq !== 'number' || data.type === 'connection_established' || data.type === 'resync_required') {
+            return false;
+        }
+        if (this.lastSeq === null) {
+            return false;
+        }
+        if (data.seq <= this.lastSeq || this.receivedSeqs.has(data.seq)) {
+            return true;
+        }
+        
+        this.receivedSeqs.add(data.seq);
+        while (this.receivedSeqs.has(this.lastSeq + 1)) {
+            this.lastSeq++;
+            this.receivedSeqs.delete(this.lastSeq);
+        }
+        return false;
+    }
+    
+    handleResyncRequired(data) {
+        // Os eventos perdidos já saíram do buffer do servidor: recarregar tudo
+        console.warn('Eventos perdidos não estão mais disponíveis, recarregando dados');
+        this.lastSeq = data.seq;
+        this.receivedSeqs.clear();
+        
+        this.refreshAppointmentList();
+        
+        this.dispatchCustomEvent('websocket:resync', data);
     }
     
     handleAppointmentStatusChanged(data) {
@@ -172,6 +262,17 @@ class AutoV7WebSocketClient {
         this.dispatchCustomEvent('notification:new', data);
     }
     
+    handleCampaign(data) {
+        const { title, message } = data;
+        
+        this.showNotification('info', title, message);
+        
+        // A campanha também chega à caixa de entrada como notificação não lida
+        this.updateNotificationBadge();
+        
+        this.dispatchCustomEvent('notification:campaign', data);
+    }
+    
     handleReminder(data) {
         const { appointment_id, message, time_until } = data;
         
@@ -196,11 +297,15 @@ class AutoV7WebSocketClient {
         // Recarregar lista de agendamentos sem refresh da página
         const appointmentList = document.querySelector('#appointment-list');
         if (appointmentList) {
-            // Fazer requisição AJAX para buscar lista atualizada
-            fetch('/dashboard/appointments/list/')
+            // Buscar a página de agendamentos (mantendo o filtro atual) e trocar só a lista
+            fetch(`/dashboard/appointments/${window.location.search}`, { credentials: 'same-origin' })
                 .then(response => response.text())
                 .then(html => {
-                    appointmentList.innerHTML = html;
+                    const page = new DOMParser().parseFromString(html, 'text/html');
+                    const updatedList = page.querySelector('#appointment-list');
+                    if (updatedList) {
+                        appointmentList.innerHTML = updatedList.innerHTML;
+                    }
                 })
                 .catch(error => console.error('Erro ao atualizar lista:', error));
         }
@@ -278,6 +383,30 @@ class AutoV7WebSocketClient {
         }
     }
     
+    // Confirmação dos quadros recebidos: o servidor só envia mais quando o navegador acompanha
+    countFrame() {
+        this.framesReceived++;
+        if (this.framesReceived - this.framesAcked >= 16) {
+            this.sendAck();
+        } else if (!this.ackTimeout) {
+            this.ackTimeout = setTimeout(() => this.sendAck(), 250);
+        }
+    }
+    
+    sendAck() {
+        if (this.ackTimeout) {
+            clearTimeout(this.ackTimeout);
+            this.ackTimeout = null;
+        }
+        if (this.socket && this.socket.readyState === WebSocket.OPEN && this.framesReceived > this.framesAcked) {
+            this.socket.send(JSON.stringify({
+                type: 'ack',
+                received: this.framesReceived
+            }));
+            this.framesAcked = this.framesReceived;
+        }
+    }
+    
     // Heartbeat para manter conexão viva
     startHeartbeat() {
         this.heartbeatInterval = setInterval(() => {
@@ -297,8 +426,29 @@ class AutoV7WebSocketClient {
         }
     }
     
+    // Espera indicada pelo servidor em 'retry_later' (não conta como falha)
+    scheduleRetryAfter() {
+        const delay = this.retryAfter || this.jitter(this.reconnectDelay);
+        this.retryAfter = null;
+        console.log(`Servidor ocupado, reconectando em ${Math.round(delay / 1000)}s`);
+        
+        setTimeout(() => {
+            this.connect();
+        }, delay);
+    }
+    
+    // Entre 50% e 150% do atraso, para as abas não reconectarem ao mesmo tempo
+    jitter(delay) {
+        return delay * (0.5 + Math.random());
+    }
+    
     // Reconexão automática
     scheduleReconnect() {
+        if (this.reconnectAttempts >= this.sseFallbackAttempts && typeof EventSource !== 'undefined') {
+            this.connectEventStream();
+            return;
+        }
+        
         if (this.reconnectAttempts >= this.maxReconnectAttempts) {
             console.error('Máximo de tentativas de reconexão atingido');
             this.showNotification('error', 'Erro de Conexão', 'Não foi possível conectar ao servidor. Por favor, recarregue a página.');
@@ -306,11 +456,28 @@ class AutoV7WebSocketClient {
         }
         
         this.reconnectAttempts++;
-        console.log(`Tentando reconectar em ${this.reconnectDelay/1000}s... (tentativa ${this.reconnectAttempts}/${this.maxReconnectAttempts})`);
+        const delay = this.jitter(this.reconnectDelay);
+        console.log(`Tentando reconectar em ${Math.round(delay / 1000)}s... (tentativa ${this.reconnectAttempts}/${this.maxReconnectAttempts})`);
         
         setTimeout(() => {
             this.connect();
-        }, this.reconnectDelay);
+        }, delay);
+    }
+    
+    // Alternativa leve ao WebSocket: Server-Sent Events, somente recebimento
+    connectEventStream() {
+        const params = this.lastSeq !== null ? `?last_seq=${this.lastSeq}` : '';
+        console.log('Recebendo eventos via Server-Sent Events');
+        
+        this.transport = 'sse';
+        this.stopHeartbeat();
+        // O EventSource reconecta sozinho enviando Last-Event-ID
+        this.eventSource = new EventSource(`/dashboard/eventos/${params}`);
+        this.eventSource.onopen = () => this.showConnectionStatus('connected');
+        this.eventSource.onmessage = (event) => this.onMessage(event);
+        this.eventSource.onerror = () => {
+            this.showConnectionStatus(this.eventSource.readyState === EventSource.CLOSED ? 'disconnected' : 'error');
+        };
     }
     
     // Enviar mensagem
@@ -331,7 +498,7 @@ class AutoV7WebSocketClient {
     setupEventListeners() {
         // Reconectar quando a aba volta ao foco
         document.addEventListener('visibilitychange', () => {
-            if (!document.hidden && this.socket.readyState !== WebSocket.OPEN) {
+            if (!document.hidden && this.transport === 'websocket' && this.socket.readyState !== WebSocket.OPEN) {
                 console.log('Aba voltou ao foco, reconectando...');
                 this.connect();
             }
@@ -342,6 +509,9 @@ class AutoV7WebSocketClient {
     disconnect() {
         this.isIntentionalClose = true;
         this.stopHeartbeat();
+        if (this.eventSource) {
+            this.eventSource.close();
+        }
         if (this.socket) {
             this.socket.close();
         }
@@ -1,6 +1,18 @@
 from django.contrib import admin
+from django.utils.html import format_html
 from .models import Vehicle, VehicleImage
 from core.admin import admin_site
+from core.thumbnails import url_miniatura
+
+
+def image_preview(obj):
+    """Miniatura em cache da imagem (não baixa o original)"""
+    if obj.imagem:
+        return format_html(
+            '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
+            url_miniatura(obj.imagem, 150)
+        )
+    return "Sem imagem"
 
 
 class VehicleImageInline(admin.TabularInline):
@@ -9,7 +21,12 @@ class VehicleImageInline(admin.TabularInline):
     """
     model = VehicleImage
     extra = 1
-    readonly_fields = ('criada_em',)
+    fields = ('imagem', 'image_preview', 'descricao', 'principal', 'criada_em')
+    readonly_fields = ('image_preview', 'criada_em')
+    
+    def image_preview(self, obj):
+        return image_preview(obj)
+    image_preview.short_description = "Preview"
 
 
 class VehicleAdmin(admin.ModelAdmin):
@@ -41,10 +58,14 @@ class VehicleImageAdmin(admin.ModelAdmin):
     """
     Admin para imagens de veículos
     """
-    list_display = ('veiculo', 'descricao', 'principal', 'criada_em')
+    list_display = ('veiculo', 'image_preview', 'descricao', 'principal', 'criada_em')
     list_filter = ('principal', 'criada_em')
     search_fields = ('veiculo__placa', 'veiculo__marca', 'veiculo__modelo', 'descricao')
     ordering = ('-criada_em',)
+    
+    def image_preview(self, obj):
+        return image_preview(obj)
+    image_preview.short_description = "Preview"
 
 
 # Registra no site admin customizado